@@ -10,10 +10,13 @@ class CommentVoteInline(admin.TabularInline):
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ['id', 'author', 'post', 'parent', 'vote_score', 'is_deleted', 'created_at']
+    list_display = ['id', 'author', 'post', 'parent', 'vote_score', 'reply_count', 'is_deleted', 'created_at']
     list_filter = ['is_deleted', 'created_at']
     search_fields = ['content', 'author__username', 'post__title']
-    readonly_fields = ['vote_score', 'created_at', 'updated_at']
+    readonly_fields = [
+        'vote_score', 'ups', 'downs', 'wilson_lower_bound', 'controversy',
+        'path', 'depth', 'reply_count', 'descendant_count', 'created_at', 'updated_at',
+    ]
     inlines = [CommentVoteInline]
 
 
@@ -5,3 +5,6 @@ class CommentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.comments'
     verbose_name = 'Comments'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,52 @@
+"""
+Recomputation of the stored ``reply_count``/``descendant_count`` columns.
+
+The columns are kept incrementally by Comment.save(), soft_delete() and
+delete(). Bulk deletes and manual edits bypass those, so
+``recompute_comment_counts`` rebuilds them per post from the comments'
+materialized paths: one query per post and an O(n * depth) pass.
+"""
+from django.db import transaction
+
+from .models import Comment, path_ids
+
+COUNT_FIELDS = ['reply_count', 'descendant_count']
+
+
+def thread_counts(rows):
+    """
+    Return ``{comment_id: [reply_count, descendant_count]}`` for one post's
+    ``(id, parent_id, path, is_deleted)`` rows. Only live comments count.
+    """
+    counts = {row[0]: [0, 0] for row in rows}
+    for _, parent_id, path, is_deleted in rows:
+        if is_deleted:
+            continue
+        if parent_id in counts:
+            counts[parent_id][0] += 1
+        for ancestor_id in path_ids(path)[:-1]:
+            if ancestor_id in counts:
+                counts[ancestor_id][1] += 1
+    return counts
+
+
+def recompute_post(post_id):
+    """Repair the counts of one post's comments; return how many rows changed."""
+    with transaction.atomic():
+        comments = list(
+            Comment.objects.select_for_update().filter(post_id=post_id).order_by('id').only(
+                'id', 'parent_id', 'path', 'is_deleted', *COUNT_FIELDS
+            )
+        )
+        counts = thread_counts([
+            (comment.pk, comment.parent_id, comment.path, comment.is_deleted) for comment in comments
+        ])
+        changed = []
+        for comment in comments:
+            expected = counts[comment.pk]
+            if [comment.reply_count, comment.descendant_count] != expected:
+                comment.reply_count, comment.descendant_count = expected
+                changed.append(comment)
+        if changed:
+            Comment.objects.bulk_update(changed, COUNT_FIELDS, batch_size=1000)
+    return len(changed)
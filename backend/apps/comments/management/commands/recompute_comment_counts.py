@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from apps.comments import counts
+from apps.comments.models import Comment
+
+
+class Command(BaseCommand):
+    """
+    Rebuild Comment.reply_count and Comment.descendant_count.
+
+    The columns are maintained incrementally; run this after bulk deletes
+    or imports, or from a scheduler as a safety net. Each post is repaired
+    in its own transaction.
+    """
+
+    help = 'Recompute stored reply and descendant counts of comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--post', type=int, action='append', dest='posts',
+            help='Only recompute this post (repeatable; default: every post with comments).'
+        )
+
+    def handle(self, *args, **options):
+        post_ids = options['posts'] or (
+            Comment.objects.order_by('post_id').values_list('post_id', flat=True).distinct()
+        )
+        posts = fixed = 0
+        for post_id in post_ids:
+            fixed += counts.recompute_post(post_id)
+            posts += 1
+        self.stdout.write(self.style.SUCCESS(f'Checked {posts} posts, fixed {fixed} comments.'))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    from apps.comments.models import PATH_SEGMENT_WIDTH, path_segment
+    Comment = apps.get_model('comments', 'Comment')
+    # A parent always has a lower id than its replies, so one pass per post
+    # in id order sees every parent before its children
+    rows = Comment.objects.order_by('post_id', 'id').values_list('id', 'post_id', 'parent_id')
+    current_post, paths, batch = None, {}, []
+    for comment_id, post_id, parent_id in rows.iterator(chunk_size=2000):
+        if post_id != current_post:
+            current_post, paths = post_id, {}
+        parent_path = paths.get(parent_id, '') if parent_id else ''
+        path = parent_path + path_segment(comment_id)
+        paths[comment_id] = path
+        batch.append(Comment(id=comment_id, path=path, depth=len(path) // PATH_SEGMENT_WIDTH - 1))
+        if len(batch) >= 1000:
+            Comment.objects.bulk_update(batch, ['path', 'depth'])
+            batch = []
+    if batch:
+        Comment.objects.bulk_update(batch, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_comment_vote_counts'),
+        ('posts', '0008_post_vote_counts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comments_co_post_id_adad8a_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
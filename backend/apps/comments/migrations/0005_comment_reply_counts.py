@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:52
+
+from django.db import migrations, models
+
+
+def backfill_counts(apps, schema_editor):
+    from apps.comments.counts import thread_counts
+    Comment = apps.get_model('comments', 'Comment')
+    post_ids = Comment.objects.order_by('post_id').values_list('post_id', flat=True).distinct()
+    for post_id in post_ids.iterator():
+        rows = list(
+            Comment.objects.filter(post_id=post_id).values_list('id', 'parent_id', 'path', 'is_deleted')
+        )
+        batch = [
+            Comment(id=comment_id, reply_count=replies, descendant_count=descendants)
+            for comment_id, (replies, descendants) in thread_counts(rows).items()
+            if replies or descendants
+        ]
+        Comment.objects.bulk_update(batch, ['reply_count', 'descendant_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0004_comment_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='descendant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,78 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
+from apps.core import response_cache, versioning
+from apps.votes import scoring
+
+
+PATH_SEGMENT_WIDTH = 8
+PATH_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(comment_id):
+    """Fixed-width base-36 path segment for ``comment_id``."""
+    digits = ''
+    while comment_id:
+        comment_id, digit = divmod(comment_id, 36)
+        digits = PATH_DIGITS[digit] + digits
+    return digits.rjust(PATH_SEGMENT_WIDTH, '0')
+
+
+def path_ids(path):
+    """Ids along ``path``, from the top-level comment down to the comment itself."""
+    return [
+        int(path[start:start + PATH_SEGMENT_WIDTH], 36)
+        for start in range(0, len(path), PATH_SEGMENT_WIDTH)
+    ]
+
+
+def subtree_end(path):
+    """
+    Exclusive upper bound of the subtree at ``path``: the same path with the
+    last segment's id plus one. Paths only use digits and lowercase letters,
+    which sort the same under the C and common locale collations.
+    """
+    return path[:-PATH_SEGMENT_WIDTH] + path_segment(int(path[-PATH_SEGMENT_WIDTH:], 36) + 1)
+
+
+class CommentQuerySet(models.QuerySet):
+    
+    def delete(self):
+        """
+        Delete the comments with their subtrees (the parent FK cascades) and
+        take the live comments removed off the surviving ancestors' reply and
+        descendant counts and off each post's comment_count, with one F()
+        update per ancestor set and per post instead of recounting.
+        """
+        from apps.posts.models import Post
+        
+        with transaction.atomic():
+            comments = list(self.select_for_update().order_by('pk').only(
+                'id', 'post_id', 'parent_id', 'path', 'is_deleted', 'descendant_count'
+            ))
+            paths = {(comment.post_id, comment.path) for comment in comments}
+            removed = defaultdict(int)
+            for comment in comments:
+                ancestors = path_ids(comment.path)[:-1]
+                if any(
+                    (comment.post_id, comment.path[:depth * PATH_SEGMENT_WIDTH]) in paths
+                    for depth in range(1, len(ancestors) + 1)
+                ):
+                    # Inside another deleted subtree, already counted there
+                    continue
+                live = comment.descendant_count + (0 if comment.is_deleted else 1)
+                comment.adjust_ancestor_counts(0 if comment.is_deleted else -1, -live)
+                removed[comment.post_id] += live
+            result = super().delete()
+            for post in Post.objects.filter(pk__in=removed).select_related('community'):
+                if removed[post.pk]:
+                    post.adjust_comment_count(-removed[post.pk])
+            for post_id in sorted({comment.post_id for comment in comments}):
+                versioning.bump(versioning.thread_key(post_id))
+                response_cache.invalidate(response_cache.thread_scope(post_id))
+        return result
 
 
 class Comment(models.Model):
@@ -7,8 +80,11 @@ class Comment(models.Model):
     Threaded comment model with voting.
     
     N+1 OPTIMIZATION:
-    Comments are fetched using prefetch_related for nested replies
-    to avoid triggering 50 queries for 50 comments.
+    Every comment stores a materialized ``path``: its parent's path plus a
+    fixed-width segment of its own id. Ordering a post's comments by
+    ``(post, path)`` lists the thread depth-first at any depth, and a
+    subtree is the index range ``[path, subtree_end(path))`` - one range
+    query instead of one prefetch per level.
     """
     
     content = models.TextField(max_length=10000)
@@ -32,18 +108,40 @@ class Comment(models.Model):
     )
     
     vote_score = models.IntegerField(default=0, db_index=True)
+    # Vote counters kept by the vote views, and the scores derived from them
+    ups = models.PositiveIntegerField(default=0, editable=False)
+    downs = models.PositiveIntegerField(default=0, editable=False)
+    wilson_lower_bound = models.FloatField(default=0, editable=False)
+    controversy = models.FloatField(default=0, editable=False)
     is_deleted = models.BooleanField(default=False)
+    # Materialized path (see class docstring) and nesting depth, 0 for top level
+    path = models.TextField(default='', editable=False)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+    # Live (not deleted) direct replies and descendants, kept by save(),
+    # soft_delete() and delete(); repaired by recompute_comment_counts
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+    descendant_count = models.PositiveIntegerField(default=0, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CommentQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['post', 'parent', '-vote_score']),
+            # Thread sorts "best" and "controversial" (see ranking.THREAD_ORDERINGS)
+            models.Index(fields=['post', 'parent', '-wilson_lower_bound', '-created_at']),
+            models.Index(fields=['post', 'parent', '-controversy', '-created_at']),
             models.Index(fields=['post', '-created_at']),
+            # Whole threads and subtrees in display order (see subtree())
+            models.Index(fields=['post', 'path']),
         ]
     
+    # Stored columns derived from ups/downs by set_vote_ranks()
+    VOTE_RANK_FIELDS = ['wilson_lower_bound', 'controversy']
+    
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title[:30]}"
     
@@ -51,16 +149,76 @@ class Comment(models.Model):
         is_new = self.pk is None
         super().save(*args, **kwargs)
         if is_new:
-            self.post.update_comment_count()
+            self.set_path()
+            if not self.is_deleted:
+                self.adjust_ancestor_counts(1, 1)
+                self.post.adjust_comment_count(1)
+        versioning.bump(versioning.thread_key(self.post_id))
+        response_cache.invalidate(response_cache.thread_scope(self.post_id))
     
     def delete(self, *args, **kwargs):
-        post = self.post
-        super().delete(*args, **kwargs)
-        post.update_comment_count()
+        # Same bookkeeping as a bulk delete (see CommentQuerySet.delete)
+        return Comment.objects.filter(pk=self.pk).delete()
+    
+    def set_path(self):
+        """Store the path and depth of a freshly inserted comment (needs its id)."""
+        if self.parent_id:
+            parent = self.parent
+            self.path = parent.path + path_segment(self.pk)
+            self.depth = parent.depth + 1
+        else:
+            self.path = path_segment(self.pk)
+            self.depth = 0
+        Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+    
+    def adjust_ancestor_counts(self, replies, descendants):
+        """Add ``replies`` to the parent's reply_count and ``descendants`` to every ancestor's."""
+        if self.parent_id and replies:
+            Comment.objects.filter(pk=self.parent_id).update(
+                reply_count=models.F('reply_count') + replies
+            )
+        ancestors = path_ids(self.path)[:-1]
+        if ancestors and descendants:
+            Comment.objects.filter(pk__in=ancestors).update(
+                descendant_count=models.F('descendant_count') + descendants
+            )
+    
+    def soft_delete(self):
+        """
+        Blank the comment but keep its place in the thread.
+        Returns False if it was already deleted.
+        """
+        updated = Comment.objects.filter(pk=self.pk, is_deleted=False).update(
+            is_deleted=True, content='[deleted]', updated_at=timezone.now()
+        )
+        if not updated:
+            return False
+        self.is_deleted = True
+        self.content = '[deleted]'
+        self.adjust_ancestor_counts(-1, -1)
+        self.post.adjust_comment_count(-1)
+        versioning.bump(versioning.thread_key(self.post_id))
+        response_cache.invalidate(response_cache.thread_scope(self.post_id))
+        return True
+    
+    def subtree(self, include_self=False):
+        """This comment's descendants (and itself) in depth-first display order."""
+        lower = {'path__gte' if include_self else 'path__gt': self.path}
+        return Comment.objects.filter(
+            post_id=self.post_id, path__lt=subtree_end(self.path), **lower
+        ).order_by('path')
+    
+    def set_vote_ranks(self):
+        """Recompute the Wilson bound and controversy from the vote counters."""
+        self.wilson_lower_bound = scoring.wilson_lower_bound(self.ups, self.downs)
+        self.controversy = scoring.controversy(self.ups, self.downs)
     
-    @property
-    def reply_count(self):
-        return self.replies.count()
+    def update_vote_ranks(self):
+        """Recompute and store the vote-derived ranks (see VOTE_RANK_FIELDS)."""
+        self.set_vote_ranks()
+        Comment.objects.filter(pk=self.pk).update(
+            **{field: getattr(self, field) for field in self.VOTE_RANK_FIELDS}
+        )
 
 
 class CommentVote(models.Model):
@@ -0,0 +1,14 @@
+from apps.core.pagination import KeysetPagination
+
+
+class ThreadWindowPagination(KeysetPagination):
+    """
+    Keyset pages over thread rows (dicts from ``tree.thread_rows()``).
+
+    Cursors use the same positions as the ``more_replies`` cursors of
+    tree.ThreadSerializer, so a truncated comment's cursor opens the page
+    right after its last reply shown.
+    """
+
+    def get_position(self, obj):
+        return [obj[field] for field, _ in self.ordering]
@@ -0,0 +1,37 @@
+"""
+Thread sort modes.
+
+"best" ranks by the stored Wilson lower bound and "controversial" by the
+stored controversy score (see apps.votes.scoring); both are maintained by
+the vote views from the ups/downs counters. Each ordering is backed by a
+``(post, parent, <score>, -created_at)`` index on Comment, so a thread
+page is an index range scan instead of an aggregation over votes.
+
+``keyset_ordering()`` adds the id tie-breaker used by thread windows and
+their continuation cursors (see apps.comments.tree).
+"""
+
+THREAD_ORDERINGS = {
+    'best': ('-wilson_lower_bound', '-created_at'),
+    'top': ('-vote_score', '-created_at'),
+    'controversial': ('-controversy', '-created_at'),
+    'new': ('-created_at',),
+    'old': ('created_at',),
+}
+
+
+
+def get_sort(value, default='best'):
+    """Return ``value`` if it names a thread sort, else ``default``."""
+    return value if value in THREAD_ORDERINGS else default
+
+
+def keyset_ordering(sort):
+    """
+    ``THREAD_ORDERINGS[sort]`` with the id tie-breaker KeysetPagination
+    appends, so thread windows and their continuation cursors agree on the
+    order of comments with equal scores.
+    """
+    ordering = list(THREAD_ORDERINGS[sort])
+    ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+    return ordering
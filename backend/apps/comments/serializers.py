@@ -1,45 +1,31 @@
 from rest_framework import serializers
+from apps.core.serializers import SparseFieldsetsMixin
+from apps.votes.maps import UserVoteMixin, VoteMapListSerializer
 from .models import Comment, CommentVote
 
 
-class CommentSerializer(serializers.ModelSerializer):
-    """Serializer for comments with nested replies."""
+class CommentSerializer(SparseFieldsetsMixin, UserVoteMixin, serializers.ModelSerializer):
+    """
+    Serializer for a single comment. Responses with nested replies are
+    built as bounded windows by tree.ThreadSerializer, with the same keys.
+    """
+    
+    vote_model = CommentVote
+    vote_target = 'comment'
     
     author = serializers.StringRelatedField(read_only=True)
     author_id = serializers.IntegerField(source='author.id', read_only=True)
-    replies = serializers.SerializerMethodField()
     user_vote = serializers.SerializerMethodField()
-    reply_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Comment
         fields = [
             'id', 'content', 'author', 'author_id', 'post', 'parent',
-            'vote_score', 'user_vote', 'is_deleted', 'reply_count',
-            'replies', 'created_at', 'updated_at'
+            'vote_score', 'ups', 'downs', 'user_vote', 'is_deleted', 'reply_count',
+            'descendant_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'author', 'vote_score', 'is_deleted', 'created_at', 'updated_at']
-    
-    def get_replies(self, obj):
-        """Recursively serialize replies (limited depth)."""
-        if obj.replies.exists():
-            # Limit depth to prevent infinite recursion
-            depth = self.context.get('depth', 0)
-            if depth < 3:  # Max 3 levels deep
-                context = {**self.context, 'depth': depth + 1}
-                return CommentSerializer(
-                    obj.replies.filter(is_deleted=False),
-                    many=True,
-                    context=context
-                ).data
-        return []
-    
-    def get_user_vote(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            vote = obj.votes.filter(user=request.user).first()
-            return vote.vote_type if vote else None
-        return None
+        list_serializer_class = VoteMapListSerializer
 
 
 class CommentCreateSerializer(serializers.ModelSerializer):
@@ -61,26 +47,23 @@ class CommentCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class CommentListSerializer(serializers.ModelSerializer):
+class CommentListSerializer(SparseFieldsetsMixin, UserVoteMixin, serializers.ModelSerializer):
     """Lightweight serializer for comment lists (no nested replies)."""
     
+    vote_model = CommentVote
+    vote_target = 'comment'
+    
     author = serializers.StringRelatedField(read_only=True)
     user_vote = serializers.SerializerMethodField()
-    reply_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Comment
         fields = [
             'id', 'content', 'author', 'post', 'parent',
-            'vote_score', 'user_vote', 'reply_count', 'created_at'
+            'vote_score', 'ups', 'downs', 'user_vote', 'reply_count', 'descendant_count',
+            'created_at'
         ]
-    
-    def get_user_vote(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            vote = obj.votes.filter(user=request.user).first()
-            return vote.vote_type if vote else None
-        return None
+        list_serializer_class = VoteMapListSerializer
 
 
 class VoteSerializer(serializers.Serializer):
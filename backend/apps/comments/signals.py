@@ -0,0 +1,18 @@
+"""
+Comment bookkeeping for deleted users.
+
+A user's comments would otherwise cascade straight from the user row,
+skipping ``CommentQuerySet.delete`` and leaving their posts' comment_count
+and their ancestors' reply and descendant counts too high. Comments on the
+user's own posts go with those posts, so only the rest are deleted here.
+"""
+from django.conf import settings
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import Comment
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    Comment.objects.filter(author=instance).exclude(post__author=instance).delete()
@@ -0,0 +1,325 @@
+import importlib
+from io import StringIO
+
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.communities.models import Community
+from apps.posts.models import Post
+from apps.users.models import User
+from .models import PATH_SEGMENT_WIDTH, Comment, CommentVote, path_ids, path_segment, subtree_end
+
+
+class CascadeDeleteTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='pw')
+            for name in ('alice', 'bob', 'carol')
+        ]
+        community = Community.objects.create(name='Python', slug='python', creator=self.alice)
+        self.post = Post.objects.create(title='Hello', author=self.alice, community=community)
+
+    def comment(self, author, parent=None, post=None):
+        return Comment.objects.create(content='Hi', author=author, post=post or self.post, parent=parent)
+
+    def test_deleting_a_user_keeps_counts_on_surviving_posts(self):
+        by_bob = self.comment(self.bob)
+        self.comment(self.carol, parent=by_bob)
+        by_carol = self.comment(self.carol)
+        self.comment(self.bob, parent=by_carol)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 4)
+
+        self.bob.delete()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        by_carol.refresh_from_db()
+        self.assertEqual((by_carol.reply_count, by_carol.descendant_count), (0, 0))
+
+    def test_deleting_a_user_removes_their_posts_with_every_comment(self):
+        own = Post.objects.create(title='Mine', author=self.bob, community=self.post.community)
+        self.comment(self.bob, post=own)
+        self.comment(self.carol, post=own)
+        self.comment(self.bob)
+
+        self.bob.delete()
+
+        self.assertFalse(Post.objects.filter(pk=own.pk).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+
+@override_settings(THREAD_CHILD_LIMIT=2, THREAD_MAX_DEPTH=2, THREAD_NODE_BUDGET=6)
+class ThreadWindowTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        self.post = Post.objects.create(title='Hello', author=self.user, community=community)
+        self.root = self.comment()
+        # Five replies to the root, oldest first; the first has a chain of three below it
+        self.replies = [self.comment(self.root) for _ in range(5)]
+        self.chain = [self.replies[0]]
+        for _ in range(3):
+            self.chain.append(self.comment(self.chain[-1]))
+
+    def comment(self, parent=None):
+        return Comment.objects.create(content='Hi', author=self.user, post=self.post, parent=parent)
+
+    def assert_window(self, node):
+        self.assertEqual(node['id'], self.root.pk)
+        self.assertEqual(node['reply_count'], 5)
+        # Child limit: two replies shown, three left for /children/
+        self.assertEqual([reply['id'] for reply in node['replies']], [r.pk for r in self.replies[:2]])
+        self.assertEqual(node['more_replies']['count'], 3)
+        # Depth limit: the chain stops two levels below the root
+        first = node['replies'][0]
+        self.assertEqual([reply['id'] for reply in first['replies']], [self.chain[1].pk])
+        self.assertEqual(first['replies'][0]['replies'], [])
+        self.assertEqual(first['replies'][0]['more_replies'], {'count': 1, 'cursor': None})
+        return node['more_replies']['cursor']
+
+    def test_thread_endpoints_return_the_same_bounded_window(self):
+        params = {'sort': 'old'}
+        thread = self.client.get(f'/api/comments/post/{self.post.pk}/', params).data['results'][0]
+        listed = self.client.get('/api/comments/', {**params, 'post': self.post.pk}).data['results'][0]
+        detail = self.client.get(f'/api/comments/{self.root.pk}/', params).data
+        for node in (thread, listed, detail):
+            self.assert_window(node)
+        self.assertEqual(thread, listed)
+        self.assertEqual(thread, detail)
+
+    @override_settings(THREAD_NODE_BUDGET=5)
+    def test_node_budget_caps_the_window(self):
+        self.comment(self.replies[1])
+        self.comment(self.replies[1])
+        node = self.client.get(f'/api/comments/{self.root.pk}/', {'sort': 'old'}).data
+        loaded = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            loaded.append(current['id'])
+            stack.extend(current['replies'])
+        # The root counts towards the budget; the second reply only gets
+        # what is left of it
+        self.assertEqual(len(loaded), 5)
+        second = node['replies'][1]
+        self.assertEqual(len(second['replies']), 1)
+        self.assertEqual(second['more_replies']['count'], 1)
+
+    def test_children_continues_after_the_window(self):
+        cursor = self.assert_window(
+            self.client.get(f'/api/comments/{self.root.pk}/', {'sort': 'old'}).data
+        )
+        url = f'/api/comments/{self.root.pk}/children/'
+        response = self.client.get(url, {'sort': 'old', 'cursor': cursor, 'page_size': 2})
+        self.assertEqual([reply['id'] for reply in response.data['results']], [r.pk for r in self.replies[2:4]])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([reply['id'] for reply in response.data['results']], [self.replies[4].pk])
+        self.assertIsNone(response.data['next'])
+
+    def test_deleted_comment_is_not_listed(self):
+        self.replies[0].soft_delete()
+        self.assertEqual(self.client.get(f'/api/comments/{self.replies[0].pk}/').status_code, 404)
+        node = self.client.get(f'/api/comments/{self.root.pk}/', {'sort': 'old'}).data
+        self.assertNotIn(self.replies[0].pk, [reply['id'] for reply in node['replies']])
+
+    def test_update_returns_the_window(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(f'/api/comments/{self.root.pk}/?sort=old', {'content': 'Edited'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content'], 'Edited')
+        self.assert_window(response.data)
+
+
+class CommentPathTests(TestCase):
+    """Materialized paths list threads depth-first and bound subtrees."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        self.post = Post.objects.create(title='Hello', author=self.user, community=community)
+        other = Post.objects.create(title='Other', author=self.user, community=community)
+        # Replies are created interleaved, so id order is not display order
+        self.a = self.comment()
+        self.b = self.comment()
+        self.a1 = self.comment(self.a)
+        self.b1 = self.comment(self.b)
+        self.a2 = self.comment(self.a)
+        self.a1x = self.comment(self.a1)
+        self.comment(post=other)
+
+    def comment(self, parent=None, post=None):
+        return Comment.objects.create(content='Hi', author=self.user, post=post or self.post, parent=parent)
+
+    def thread(self):
+        return list(Comment.objects.filter(post=self.post).order_by('path'))
+
+    def test_segments_sort_like_ids(self):
+        ids = [1, 9, 35, 36, 1000, 36 ** 5]
+        segments = [path_segment(i) for i in ids]
+        self.assertEqual(sorted(segments), segments)
+        self.assertTrue(all(len(segment) == PATH_SEGMENT_WIDTH for segment in segments))
+        self.assertEqual(path_ids(''.join(segments)), ids)
+        self.assertEqual(subtree_end(path_segment(35)), path_segment(36))
+
+    def test_paths_and_depths(self):
+        self.a1x.refresh_from_db()
+        self.assertEqual(path_ids(self.a1x.path), [self.a.pk, self.a1.pk, self.a1x.pk])
+        self.assertEqual(self.a1x.depth, 2)
+
+    def test_thread_is_depth_first(self):
+        self.assertEqual(self.thread(), [self.a, self.a1, self.a1x, self.a2, self.b, self.b1])
+
+    def test_subtree_order_and_bounds(self):
+        self.a.refresh_from_db()
+        self.assertEqual(list(self.a.subtree()), [self.a1, self.a1x, self.a2])
+        self.assertEqual(list(self.a.subtree(include_self=True)), [self.a, self.a1, self.a1x, self.a2])
+        self.a1x.refresh_from_db()
+        self.assertEqual(list(self.a1x.subtree()), [])
+
+    def test_migration_backfills_paths(self):
+        expected = list(Comment.objects.order_by('pk').values_list('path', 'depth'))
+        Comment.objects.update(path='', depth=0)
+        migration = importlib.import_module('apps.comments.migrations.0004_comment_path')
+        migration.backfill_paths(django_apps, None)
+        self.assertEqual(list(Comment.objects.order_by('pk').values_list('path', 'depth')), expected)
+        self.assertEqual(self.thread(), [self.a, self.a1, self.a1x, self.a2, self.b, self.b1])
+
+
+@override_settings(THREAD_MAX_DEPTH=3)
+class ThreadQueryCountTests(APITestCase):
+    """A thread page costs one query per reply level, whatever the thread's size."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        self.small = Post.objects.create(title='Small', author=self.user, community=community)
+        self.large = Post.objects.create(title='Large', author=self.user, community=community)
+        # Both threads reach the depth limit; the large one is wide at every level
+        self.chain(self.small, None, 5)
+        for _ in range(4):
+            root = self.comment(self.large)
+            for _ in range(3):
+                self.chain(self.large, root, 4)
+        for comment in Comment.objects.filter(post=self.large)[:20]:
+            CommentVote.objects.create(user=self.user, comment=comment, vote_type='up')
+        # A real token: credentialed requests bypass the anonymous response cache
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def comment(self, post, parent=None):
+        return Comment.objects.create(content='Hi', author=self.user, post=post, parent=parent)
+
+    def chain(self, post, parent, length):
+        for _ in range(length):
+            parent = self.comment(post, parent)
+
+    def thread(self, post):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/comments/post/{post.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data, [q['sql'] for q in queries]
+
+    def depth(self, nodes):
+        return max((1 + self.depth(node['replies']) for node in nodes), default=0)
+
+    def test_query_count_does_not_depend_on_thread_size(self):
+        small, small_queries = self.thread(self.small)
+        large, large_queries = self.thread(self.large)
+        self.assertEqual(self.depth(small['results']), 4)
+        self.assertEqual(self.depth(large['results']), 4)
+        self.assertEqual(len(small_queries), len(large_queries))
+        levels = [sql for sql in large_queries if 'ROW_NUMBER()' in sql]
+        self.assertEqual(len(levels), 3)
+
+    def test_votes_are_loaded_once_for_the_window(self):
+        data, queries = self.thread(self.large)
+        votes = [sql for sql in queries if CommentVote._meta.db_table in sql]
+        self.assertEqual(len(votes), 1)
+        voted = set(CommentVote.objects.values_list('comment_id', flat=True))
+        stack = list(data['results'])
+        while stack:
+            node = stack.pop()
+            self.assertEqual(node['user_vote'], 'up' if node['id'] in voted else None)
+            stack.extend(node['replies'])
+
+
+class ReplyCountTests(TestCase):
+    """reply_count/descendant_count follow creates and deletes, and can be rebuilt."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        self.post = Post.objects.create(title='Hello', author=self.user, community=community)
+        self.root = self.comment()
+        self.a = self.comment(self.root)
+        self.a1 = self.comment(self.a)
+        self.a2 = self.comment(self.a)
+        self.b = self.comment(self.root)
+
+    def comment(self, parent=None):
+        return Comment.objects.create(content='Hi', author=self.user, post=self.post, parent=parent)
+
+    def counts(self):
+        self.post.refresh_from_db()
+        return self.post.comment_count, {
+            comment.pk: (comment.reply_count, comment.descendant_count)
+            for comment in Comment.objects.filter(post=self.post)
+        }
+
+    def test_create(self):
+        self.assertEqual(self.counts(), (5, {
+            self.root.pk: (2, 4), self.a.pk: (2, 2), self.a1.pk: (0, 0),
+            self.a2.pk: (0, 0), self.b.pk: (0, 0),
+        }))
+
+    def test_soft_delete_counts_once(self):
+        self.assertTrue(self.a1.soft_delete())
+        self.assertFalse(Comment.objects.get(pk=self.a1.pk).soft_delete())
+        comment_count, counts = self.counts()
+        self.assertEqual(comment_count, 4)
+        self.assertEqual(counts[self.root.pk], (2, 3))
+        self.assertEqual(counts[self.a.pk], (1, 1))
+
+    def test_delete_removes_the_live_subtree(self):
+        self.a1.soft_delete()
+        self.a.delete()
+        self.assertEqual(self.counts(), (2, {self.root.pk: (1, 1), self.b.pk: (0, 0)}))
+
+    def test_bulk_delete_of_nested_comments_counts_each_once(self):
+        Comment.objects.filter(pk__in=[self.a.pk, self.a2.pk, self.b.pk]).delete()
+        self.assertEqual(self.counts(), (1, {self.root.pk: (0, 0)}))
+
+    def test_recompute_command_repairs_drift(self):
+        expected = self.counts()
+        Comment.objects.filter(pk=self.root.pk).update(reply_count=9, descendant_count=0)
+        Comment.objects.filter(pk=self.a1.pk).update(descendant_count=3)
+        out = StringIO()
+        call_command('recompute_comment_counts', '--post', str(self.post.pk), stdout=out)
+        self.assertIn('Checked 1 posts, fixed 2 comments.', out.getvalue())
+        self.assertEqual(self.counts(), expected)
+        out = StringIO()
+        call_command('recompute_comment_counts', stdout=out)
+        self.assertIn('fixed 0 comments.', out.getvalue())
+
+    def test_migration_backfills_counts(self):
+        expected = self.counts()
+        Comment.objects.update(reply_count=0, descendant_count=0)
+        migration = importlib.import_module('apps.comments.migrations.0005_comment_reply_counts')
+        migration.backfill_counts(django_apps, None)
+        self.assertEqual(self.counts(), expected)
@@ -0,0 +1,200 @@
+"""
+Bounded reply windows for thread responses.
+
+``load_window()`` and ``ThreadSerializer`` serve every endpoint that returns
+comments with their replies (PostCommentsView, CommentListCreateView,
+CommentDetailView and CommentChildrenView) as bounded windows instead of
+whole subtrees. Below a page of comments, replies are loaded breadth
+first, one ``values()`` query per level, taking at most
+``THREAD_CHILD_LIMIT`` replies per comment (the first ones in the
+requested sort, picked with a ``ROW_NUMBER()`` window over each sibling
+list), at most ``THREAD_MAX_DEPTH`` levels and at most
+``THREAD_NODE_BUDGET`` comments in all. Each comment whose replies were cut
+short gets a ``more_replies`` continuation: the number of replies left out
+and a keyset cursor after the last one shown, which
+/api/comments/<pk>/children/ continues from. The size of a response and
+the number of queries behind it therefore do not depend on how large or
+deep the thread is.
+
+Replies of a deleted comment are not shown: only live comments are loaded,
+and a level only expands the comments loaded on the level above.
+"""
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from apps.core.pagination import encode_cursor, parse_ordering
+from .models import Comment
+from .ranking import keyset_ordering
+
+# Columns read by thread window queries, and the response keys built from them
+THREAD_COLUMNS = [
+    'id', 'content', 'author_id', 'author__username', 'post_id', 'parent_id',
+    'vote_score', 'ups', 'downs', 'wilson_lower_bound', 'controversy',
+    'is_deleted', 'reply_count', 'descendant_count', 'created_at', 'updated_at',
+]
+THREAD_FIELDS = [
+    'id', 'content', 'author', 'author_id', 'post', 'parent',
+    'vote_score', 'ups', 'downs', 'user_vote', 'is_deleted', 'reply_count',
+    'descendant_count', 'replies', 'more_replies', 'created_at', 'updated_at',
+]
+
+
+def get_child_limit():
+    return getattr(settings, 'THREAD_CHILD_LIMIT', 10)
+
+
+def get_max_depth():
+    return getattr(settings, 'THREAD_MAX_DEPTH', 10)
+
+
+def get_node_budget():
+    return getattr(settings, 'THREAD_NODE_BUDGET', 500)
+
+
+def thread_rows(queryset, sort):
+    """``queryset`` as thread rows (dicts) in ``sort`` order, id tie-broken."""
+    return queryset.filter(is_deleted=False).order_by(*keyset_ordering(sort)).values(*THREAD_COLUMNS)
+
+
+def _order_by(ordering):
+    return [
+        F(field[1:]).desc() if field.startswith('-') else F(field).asc()
+        for field in ordering
+    ]
+
+
+def load_window(parents, sort, budget):
+    """
+    Load the reply window below ``parents`` (thread rows already shown).
+
+    Returns a ``{comment_id: [reply rows]}`` map holding every loaded
+    comment, replies in ``sort`` order. Levels are filled breadth first in
+    display order until ``budget`` replies are loaded; each level is one
+    query bounded by the child limit times the number of parents expanded.
+    """
+    child_limit = get_child_limit()
+    ordering = keyset_ordering(sort)
+    children = {row['id']: [] for row in parents}
+    frontier = list(parents)
+    for _ in range(get_max_depth()):
+        # Share what is left of the budget out to the level's parents in
+        # display order; the stored reply_count says how many they can use
+        wanted = {}
+        for row in frontier:
+            if budget <= 0:
+                break
+            if row['reply_count'] > 0:
+                wanted[row['id']] = min(row['reply_count'], child_limit, budget)
+                budget -= wanted[row['id']]
+        if not wanted:
+            break
+
+        rows = (
+            Comment.objects.filter(parent_id__in=wanted, is_deleted=False)
+            .annotate(sibling_rank=Window(
+                RowNumber(), partition_by=[F('parent_id')], order_by=_order_by(ordering)
+            ))
+            .filter(sibling_rank__lte=max(wanted.values()))
+            .order_by('sibling_rank')
+            .values(*THREAD_COLUMNS)
+        )
+        for row in rows:
+            siblings = children[row['parent_id']]
+            if len(siblings) < wanted[row['parent_id']]:
+                siblings.append(row)
+                children[row['id']] = []
+        # Stored counts ahead of the rows (a reply deleted meanwhile) hand
+        # their unused share back
+        budget += sum(count - len(children[parent_id]) for parent_id, count in wanted.items())
+        frontier = [reply for row in frontier for reply in children[row['id']]]
+    return children
+
+
+class ThreadSerializer:
+    """
+    Builds the nested ``CommentSerializer`` JSON from ``load_window()`` rows
+    without model instances or per-node serializer objects.
+
+    Output keys and formats match CommentSerializer, including sparse
+    fieldsets and ``user_vote`` (loaded for the whole window with one
+    query), plus ``more_replies``: ``None``, or ``{'count', 'cursor'}`` for
+    a comment with replies left out of the window. ``cursor`` is ``None``
+    when none of its replies were loaded.
+    """
+
+    def __init__(self, context, sort='best'):
+        from rest_framework import serializers
+        from apps.core.serializers import get_sparse_fieldset
+
+        self.request = context.get('request')
+        fields, omit = get_sparse_fieldset(self.request)
+        self.fields = [
+            name for name in THREAD_FIELDS
+            if (fields is None or name in fields) and not (omit and name in omit)
+        ]
+        self.datetime_field = serializers.DateTimeField()
+        self.ordering = parse_ordering(keyset_ordering(sort))
+
+    def load_user_votes(self, rows):
+        from apps.votes.maps import load_vote_map
+        from .models import CommentVote
+
+        user = getattr(self.request, 'user', None)
+        if 'user_vote' not in self.fields or user is None or not user.is_authenticated:
+            return {}
+        return load_vote_map(CommentVote, 'comment', user, [row['id'] for row in rows])
+
+    def more_replies(self, row, replies):
+        count = row['reply_count'] - len(replies)
+        if count <= 0:
+            return None
+        cursor = None
+        if replies:
+            cursor = encode_cursor([replies[-1][field] for field, _ in self.ordering])
+        return {'count': count, 'cursor': cursor}
+
+    def to_dict(self, row, votes, replies):
+        values = {
+            'id': row['id'],
+            'content': row['content'],
+            'author': row['author__username'],
+            'author_id': row['author_id'],
+            'post': row['post_id'],
+            'parent': row['parent_id'],
+            'vote_score': row['vote_score'],
+            'ups': row['ups'],
+            'downs': row['downs'],
+            'user_vote': votes.get(row['id']),
+            'is_deleted': row['is_deleted'],
+            'reply_count': row['reply_count'],
+            'descendant_count': row['descendant_count'],
+            'replies': [],
+            'more_replies': self.more_replies(row, replies),
+            'created_at': self.datetime_field.to_representation(row['created_at']),
+            'updated_at': self.datetime_field.to_representation(row['updated_at']),
+        }
+        return {name: values[name] for name in self.fields}
+
+    def serialize(self, roots, children):
+        """Return the nested JSON for ``roots`` and their loaded replies."""
+        nodes = []
+        stack = list(roots)
+        while stack:
+            row = stack.pop()
+            nodes.append(row)
+            stack.extend(children[row['id']])
+        votes = self.load_user_votes(nodes)
+        output = {row['id']: self.to_dict(row, votes, children[row['id']]) for row in nodes}
+        if 'replies' in self.fields:
+            for row in nodes:
+                output[row['id']]['replies'] = [
+                    output[reply['id']] for reply in children[row['id']]
+                ]
+        return [output[row['id']] for row in roots]
+
+
+def render_window(context, rows, sort):
+    """Load the reply window below the thread ``rows`` and return their nested JSON."""
+    children = load_window(rows, sort, get_node_budget() - len(rows))
+    return ThreadSerializer(context, sort).serialize(rows, children)
@@ -1,77 +1,49 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from django.db import transaction
-from django.db.models import F, Prefetch
-from .models import Comment, CommentVote
+from apps.core import response_cache, versioning
+from apps.votes import buffer as vote_buffer, engine as vote_engine
+from .models import Comment
+from . import tree
+from .pagination import ThreadWindowPagination
+from .ranking import get_sort
 from .serializers import (
     CommentSerializer,
     CommentCreateSerializer,
-    CommentListSerializer,
     VoteSerializer,
 )
 
 
-def get_prefetched_comments_queryset(base_queryset):
+class CommentListCreateView(generics.ListCreateAPIView):
     """
-    Prefetch nested comments up to 3 levels deep to solve N+1 problem.
-    Instead of triggering 50 queries for 50 comments, this uses just a few queries.
+    List comments for a post or create a new comment.
+    Listed comments come with a bounded window of their replies, as on
+    PostCommentsView (see tree.load_window).
     """
-    # Level 1 replies
-    level1_prefetch = Prefetch(
-        'replies',
-        queryset=Comment.objects.filter(is_deleted=False).select_related('author')
-    )
-    
-    # Level 2 replies (replies to replies)
-    level2_prefetch = Prefetch(
-        'replies__replies',
-        queryset=Comment.objects.filter(is_deleted=False).select_related('author')
-    )
-    
-    # Level 3 replies (deepest level)
-    level3_prefetch = Prefetch(
-        'replies__replies__replies',
-        queryset=Comment.objects.filter(is_deleted=False).select_related('author')
-    )
-    
-    return base_queryset.prefetch_related(
-        level1_prefetch,
-        level2_prefetch,
-        level3_prefetch,
-        'votes',  # Prefetch votes for user_vote calculation
-        'replies__votes',
-        'replies__replies__votes',
-    )
-
-
-class CommentListCreateView(generics.ListCreateAPIView):
-    """List comments for a post or create a new comment."""
     
     def get_queryset(self):
-        queryset = Comment.objects.filter(is_deleted=False).select_related('author')
+        queryset = Comment.objects.filter(is_deleted=False)
         
         # Filter by post
         post_id = self.request.query_params.get('post')
         if post_id:
             queryset = queryset.filter(post_id=post_id, parent__isnull=True)
-        
-        # Sort option
-        sort = self.request.query_params.get('sort', 'best')
-        if sort == 'best':
-            queryset = queryset.order_by('-vote_score', '-created_at')
-        elif sort == 'new':
-            queryset = queryset.order_by('-created_at')
-        elif sort == 'old':
-            queryset = queryset.order_by('created_at')
-        elif sort == 'controversial':
-            queryset = queryset.order_by('-vote_score')
-        
-        # Apply N+1 optimization with prefetch
-        queryset = get_prefetched_comments_queryset(queryset)
-        
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        # Sort option: best, top, controversial, new or old
+        sort = get_sort(request.query_params.get('sort'))
+        queryset = tree.thread_rows(self.get_queryset(), sort)
+        
+        page = self.paginate_queryset(queryset)
+        roots = list(queryset[:tree.get_node_budget()]) if page is None else page
+        data = tree.render_window(self.get_serializer_context(), roots, sort)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+    
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return CommentCreateSerializer
@@ -84,7 +56,11 @@ class CommentListCreateView(generics.ListCreateAPIView):
 
 
 class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    """Get, update, or delete a comment."""
+    """
+    Get, update, or delete a comment.
+    The comment is returned with a bounded window of its replies (see
+    tree.load_window), also after an update.
+    """
     
     queryset = Comment.objects.filter(is_deleted=False)
     serializer_class = CommentSerializer
@@ -94,6 +70,15 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
     
+    def retrieve(self, request, *args, **kwargs):
+        sort = get_sort(request.query_params.get('sort'))
+        row = generics.get_object_or_404(tree.thread_rows(self.get_queryset(), sort), pk=self.kwargs['pk'])
+        return Response(tree.render_window(self.get_serializer_context(), [row], sort)[0])
+    
+    def update(self, request, *args, **kwargs):
+        super().update(request, *args, **kwargs)
+        return self.retrieve(request, *args, **kwargs)
+    
     def perform_update(self, serializer):
         if serializer.instance.author != self.request.user:
             from rest_framework.exceptions import PermissionDenied
@@ -105,9 +90,8 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You can only delete your own comments.")
         # Soft delete to preserve thread structure
-        instance.is_deleted = True
-        instance.content = "[deleted]"
-        instance.save()
+        with transaction.atomic():
+            instance.soft_delete()
 
 
 @api_view(['POST'])
@@ -115,7 +99,10 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
 def vote_comment(request, pk):
     """
     Upvote or downvote a comment with ATOMIC transaction to prevent race conditions.
-    Uses select_for_update to lock the vote row during the transaction.
+    The vote row and the score are written by the vote engine (see
+    apps.votes.engine): single-statement upserts with RETURNING on PostgreSQL.
+    With VOTE_WRITE_BEHIND the score change is buffered instead (see
+    apps.votes.buffer) and a provisional score is returned.
     """
     from apps.users.models import KarmaTransaction
     
@@ -125,127 +112,93 @@ def vote_comment(request, pk):
     
     vote_type = serializer.validated_data['vote_type']
     
-    # Use atomic transaction to prevent race conditions
-    with transaction.atomic():
-        try:
-            # Lock the comment row to prevent concurrent modifications
-            comment = Comment.objects.select_for_update().get(pk=pk, is_deleted=False)
-        except Comment.DoesNotExist:
-            return Response(
-                {'error': 'Comment not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Try to get existing vote with lock
-        existing_vote = CommentVote.objects.select_for_update().filter(
-            user=request.user, 
-            comment=comment
-        ).first()
-        
-        if existing_vote:
-            if existing_vote.vote_type == vote_type:
-                # Same vote - remove it (toggle off)
-                old_vote_type = existing_vote.vote_type
-                existing_vote.delete()
-                
-                # Update vote score atomically
-                if old_vote_type == 'up':
-                    Comment.objects.filter(pk=pk).update(vote_score=F('vote_score') - 1)
-                    KarmaTransaction.log_karma_change(
-                        user=comment.author,
-                        delta=-1,
-                        reason='comment_upvote_removed',
-                        comment=comment
-                    )
-                else:
-                    Comment.objects.filter(pk=pk).update(vote_score=F('vote_score') + 1)
-                    KarmaTransaction.log_karma_change(
-                        user=comment.author,
-                        delta=1,
-                        reason='comment_downvote_removed',
-                        comment=comment
-                    )
-                
-                comment.refresh_from_db()
-                return Response({'message': 'Vote removed', 'vote_score': comment.vote_score})
-            else:
-                # Different vote - update it (swing of 2)
-                old_vote_type = existing_vote.vote_type
-                existing_vote.vote_type = vote_type
-                existing_vote.save()
-                
-                if vote_type == 'up':  # Changed from down to up
-                    Comment.objects.filter(pk=pk).update(vote_score=F('vote_score') + 2)
-                    KarmaTransaction.log_karma_change(
-                        user=comment.author,
-                        delta=2,
-                        reason='comment_upvote',
-                        comment=comment
-                    )
-                else:  # Changed from up to down
-                    Comment.objects.filter(pk=pk).update(vote_score=F('vote_score') - 2)
-                    KarmaTransaction.log_karma_change(
-                        user=comment.author,
-                        delta=-2,
-                        reason='comment_downvote',
-                        comment=comment
-                    )
-                
-                comment.refresh_from_db()
-                return Response({'message': 'Vote updated', 'vote_score': comment.vote_score})
-        else:
-            # New vote - create with atomic update
-            CommentVote.objects.create(user=request.user, comment=comment, vote_type=vote_type)
+    try:
+        with transaction.atomic():
+            outcome = vote_engine.cast_vote('comment', request.user, pk, vote_type)
             
-            if vote_type == 'up':
-                Comment.objects.filter(pk=pk).update(vote_score=F('vote_score') + 1)
-                KarmaTransaction.log_karma_change(
-                    user=comment.author,
-                    delta=1,
-                    reason='comment_upvote',
-                    comment=comment
-                )
-            else:
-                Comment.objects.filter(pk=pk).update(vote_score=F('vote_score') - 1)
-                KarmaTransaction.log_karma_change(
-                    user=comment.author,
-                    delta=-1,
-                    reason='comment_downvote',
-                    comment=comment
-                )
+            if vote_buffer.is_enabled():
+                # Write-behind: the flusher applies score and karma
+                comment = Comment.objects.get(pk=pk, is_deleted=False)
+                vote_score = vote_buffer.record_vote('comment', comment, outcome)
+                return Response({'message': outcome.message, 'vote_score': vote_score, 'provisional': True})
             
-            comment.refresh_from_db()
-            return Response({'message': 'Vote recorded', 'vote_score': comment.vote_score})
+            # Update vote score atomically and log the author's karma change
+            comment = vote_engine.apply_score('comment', pk, outcome)
+            KarmaTransaction.log_karma_change(
+                user=comment.author_id,
+                delta=outcome.delta,
+                reason=outcome.reason,
+                comment=comment
+            )
+            
+            versioning.bump(versioning.thread_key(comment.post_id))
+            response_cache.invalidate(response_cache.thread_scope(comment.post_id))
+            return Response({'message': outcome.message, 'vote_score': comment.vote_score})
+    except Comment.DoesNotExist:
+        return Response(
+            {'error': 'Comment not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except vote_engine.VoteConflict:
+        return Response(
+            {'error': 'Vote already recorded'},
+            status=status.HTTP_409_CONFLICT
+        )
 
 
-class PostCommentsView(generics.ListAPIView):
+class PostCommentsView(response_cache.AnonymousResponseCacheMixin, versioning.ConditionalGetMixin, generics.ListAPIView):
     """
-    Get all top-level comments for a specific post.
-    Uses prefetch_related to solve N+1 problem - loading 50 nested comments
-    should NOT trigger 50 SQL queries.
+    Get a page of top-level comments for a specific post, with a bounded
+    window of their replies (see tree.load_window): one query per reply
+    level, however large or deep the thread is. Comments with replies left
+    out carry a ``more_replies`` cursor for CommentChildrenView.
+    Answers conditional GETs from the thread's version stamp; anonymous
+    pages are served from the shared response cache.
     """
     
     serializer_class = CommentSerializer
     permission_classes = [permissions.AllowAny]
     
-    def get_queryset(self):
-        post_id = self.kwargs.get('post_id')
-        sort = self.request.query_params.get('sort', 'best')
-        
-        queryset = Comment.objects.filter(
-            post_id=post_id,
-            parent__isnull=True,
-            is_deleted=False
-        ).select_related('author')
+    def get_version_key(self):
+        return versioning.thread_key(self.kwargs['post_id'])
+    
+    def get_response_cache_scopes(self, request, **kwargs):
+        return [response_cache.thread_scope(kwargs['post_id'])]
+    
+    def list(self, request, *args, **kwargs):
+        from apps.posts.models import Post
         
-        if sort == 'best':
-            queryset = queryset.order_by('-vote_score', '-created_at')
-        elif sort == 'new':
-            queryset = queryset.order_by('-created_at')
-        elif sort == 'old':
-            queryset = queryset.order_by('created_at')
+        if not Post.objects.filter(pk=self.kwargs['post_id']).exists():
+            raise NotFound('Post not found')
+        sort = get_sort(request.query_params.get('sort'))
+        queryset = tree.thread_rows(
+            Comment.objects.filter(post_id=self.kwargs['post_id'], parent__isnull=True), sort
+        )
         
-        # Apply N+1 optimization - prefetch all nested replies in one query
-        queryset = get_prefetched_comments_queryset(queryset)
+        page = self.paginate_queryset(queryset)
+        roots = list(queryset[:tree.get_node_budget()]) if page is None else page
+        data = tree.render_window(self.get_serializer_context(), roots, sort)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class CommentChildrenView(generics.ListAPIView):
+    """
+    Stream the replies of a comment in the requested sort, a keyset page at
+    a time, each reply with its own bounded window of replies.
+    ``?cursor=`` takes a ``more_replies`` cursor from a thread response (or
+    a ``next`` link from this view) and continues right after it.
+    """
+    
+    serializer_class = CommentSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = ThreadWindowPagination
+    
+    def list(self, request, *args, **kwargs):
+        parent = generics.get_object_or_404(Comment.objects.filter(is_deleted=False), pk=self.kwargs['pk'])
+        sort = get_sort(request.query_params.get('sort'))
         
-        return queryset
+        page = self.paginate_queryset(tree.thread_rows(Comment.objects.filter(parent=parent), sort))
+        data = tree.render_window(self.get_serializer_context(), page, sort)
+        return self.get_paginated_response(data)
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from apps.core import response_cache, versioning
 
 
 class Community(models.Model):
@@ -40,6 +41,21 @@ class Community(models.Model):
     def __str__(self):
         return f"c/{self.name}"
     
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        super().save(*args, **kwargs)
+        if not is_new:
+            versioning.bump(versioning.community_key(self.slug))
+    
+    def delete(self, *args, **kwargs):
+        slug = self.slug
+        result = super().delete(*args, **kwargs)
+        # Stale ETags for the community must revalidate to 404 rather than
+        # 304; its cascaded posts are handled by apps.posts.signals
+        transaction.on_commit(lambda: versioning.bump(versioning.community_key(slug)))
+        response_cache.invalidate(*response_cache.feed_scopes(slug))
+        return result
+    
     @property
     def member_count(self):
         return self.members.count()
@@ -57,3 +73,13 @@ class CommunityMembership(models.Model):
     
     def __str__(self):
         return f"{self.user.username} in {self.community.name}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        versioning.bump(versioning.community_key(self.community.slug))
+    
+    def delete(self, *args, **kwargs):
+        slug = self.community.slug
+        result = super().delete(*args, **kwargs)
+        versioning.bump(versioning.community_key(slug))
+        return result
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from apps.core.serializers import SparseFieldsetsMixin
 from .models import Community, CommunityMembership
 
 
-class CommunitySerializer(serializers.ModelSerializer):
+class CommunitySerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer for community data."""
     
     creator = serializers.StringRelatedField(read_only=True)
@@ -55,7 +56,7 @@ class CommunityCreateSerializer(serializers.ModelSerializer):
         return community
 
 
-class CommunityListSerializer(serializers.ModelSerializer):
+class CommunityListSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Lightweight serializer for community lists."""
     
     member_count = serializers.IntegerField(read_only=True)
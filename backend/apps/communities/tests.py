@@ -0,0 +1,29 @@
+from rest_framework.test import APITestCase
+
+from apps.posts.models import Post
+from apps.users.models import User
+from .models import Community
+
+
+class DeletedCommunityRevalidationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.user)
+
+    def test_stale_etag_revalidates_to_404(self):
+        post = Post.objects.create(title='Hello', author=self.user, community=self.community)
+        community_etag = self.client.get('/api/communities/python/')['ETag']
+        post_etag = self.client.get(f'/api/posts/{post.pk}/')['ETag']
+
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/api/communities/python/')
+        self.assertEqual(response.status_code, 204)
+        self.client.force_authenticate(None)
+
+        response = self.client.get('/api/communities/python/', HTTP_IF_NONE_MATCH=community_etag)
+        self.assertEqual(response.status_code, 404)
+        # Posts removed by the cascade revalidate to 404 as well
+        response = self.client.get(f'/api/posts/{post.pk}/', HTTP_IF_NONE_MATCH=post_etag)
+        self.assertEqual(response.status_code, 404)
@@ -8,4 +8,5 @@ urlpatterns = [
     path('<slug:slug>/', views.CommunityDetailView.as_view(), name='community-detail'),
     path('<slug:slug>/join/', views.join_community, name='join-community'),
     path('<slug:slug>/leave/', views.leave_community, name='leave-community'),
+    path('<slug:slug>/leaderboard/', views.community_leaderboard, name='community-leaderboard'),
 ]
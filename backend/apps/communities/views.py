@@ -1,6 +1,7 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from apps.core import versioning
 from .models import Community, CommunityMembership
 from .serializers import (
     CommunitySerializer,
@@ -25,8 +26,8 @@ class CommunityListCreateView(generics.ListCreateAPIView):
         return [permissions.AllowAny()]
 
 
-class CommunityDetailView(generics.RetrieveUpdateDestroyAPIView):
-    """Get, update, or delete a community."""
+class CommunityDetailView(versioning.ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    """Get, update, or delete a community. GETs honour ETag / If-Modified-Since."""
     
     queryset = Community.objects.all()
     serializer_class = CommunitySerializer
@@ -37,6 +38,9 @@ class CommunityDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
     
+    def get_version_key(self):
+        return versioning.community_key(self.kwargs['slug'])
+    
     def perform_update(self, serializer):
         # Only moderators can update
         if self.request.user not in serializer.instance.moderators.all():
@@ -92,3 +96,58 @@ def leave_community(request, slug):
     
     membership.delete()
     return Response({'message': f'Left c/{community.name}'})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def community_leaderboard(request, slug):
+    """
+    Top contributors in a community over ``?window=`` (``24h`` or ``7d``).
+    
+    Served from per-community hourly karma rollups plus the ledger's edge
+    hours (see users.karma), so it is exact to the second and its cost
+    follows the community's activity rather than the global ledger.
+    """
+    from django.utils import timezone
+    from apps.users.karma import COMMUNITY_WINDOWS, community_karma_totals
+    from apps.users.models import User
+    
+    try:
+        community = Community.objects.only('id', 'slug').get(slug=slug)
+    except Community.DoesNotExist:
+        return Response(
+            {'error': 'Community not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    window = request.query_params.get('window', '7d')
+    if window not in COMMUNITY_WINDOWS:
+        return Response(
+            {'error': f"window must be one of: {', '.join(COMMUNITY_WINDOWS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = int(request.query_params.get('limit', 10))
+    limit = min(limit, 100)
+    
+    totals = community_karma_totals(community.pk, COMMUNITY_WINDOWS[window])
+    top = sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    users = User.objects.only('id', 'username', 'avatar').in_bulk([user_id for user_id, _ in top])
+    
+    result = []
+    top = [entry for entry in top if entry[0] in users]
+    for rank, (user_id, karma) in enumerate(top, 1):
+        user = users[user_id]
+        result.append({
+            'rank': rank,
+            'user_id': user_id,
+            'username': user.username,
+            'avatar': user.avatar.url if user.avatar else None,
+            'karma': karma,
+        })
+    
+    return Response({
+        'community': community.slug,
+        'window': window,
+        'generated_at': timezone.now().isoformat(),
+        'leaderboard': result,
+    })
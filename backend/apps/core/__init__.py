@@ -0,0 +1,2 @@
+# Core App
+default_app_config = 'apps.core.apps.CoreConfig'
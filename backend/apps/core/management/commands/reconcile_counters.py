@@ -0,0 +1,90 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from apps.core.reconcile import COUNTERS, get_id_ranges, reconcile_range
+
+
+def _init_worker():
+    # Fresh processes (spawn) need Django set up; forked ones must not
+    # share the parent's database connections
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    """
+    Recompute denormalized counters from their source rows and fix drift.
+
+    Covers Post.vote_score/ups/downs, Post.comment_count,
+    Comment.vote_score/ups/downs and User.karma (see apps.core.reconcile).
+    Tables are streamed in primary key chunks, so it is safe to run on
+    large tables; --workers splits each table's id range across processes.
+    """
+
+    help = 'Recompute denormalized vote, comment and karma counters and fix rows that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--counter', action='append', choices=sorted(COUNTERS), dest='counters',
+            help='Counter to reconcile; repeat for several (default: all).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Rows compared per aggregate query (default: 2000).'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes to split each table across (default: 1).'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report drifted rows without changing them.'
+        )
+
+    def handle(self, *args, **options):
+        counters = options['counters'] or list(COUNTERS)
+        chunk_size = options['chunk_size']
+        workers = max(1, options['workers'])
+        dry_run = options['dry_run']
+        if workers > 1 and connection.vendor == 'sqlite':
+            # SQLite allows a single writer; parallel workers only contend
+            self.stdout.write(self.style.WARNING('SQLite database: ignoring --workers.'))
+            workers = 1
+
+        executor = None
+        if workers > 1:
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        try:
+            for name in counters:
+                ranges = get_id_ranges(name, workers)
+                if executor is None:
+                    reports = [reconcile_range(name, low, high, chunk_size, dry_run) for low, high in ranges]
+                else:
+                    futures = [
+                        executor.submit(reconcile_range, name, low, high, chunk_size, dry_run)
+                        for low, high in ranges
+                    ]
+                    reports = [future.result() for future in futures]
+                self.write_report(name, reports, dry_run)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def write_report(self, name, reports, dry_run):
+        scanned = sum(report['scanned'] for report in reports)
+        drifted = sum(report['drifted'] for report in reports)
+        fixed = sum(report['fixed'] for report in reports)
+        fields = ', '.join(COUNTERS[name].fields)
+        if dry_run:
+            summary = f'{name}: scanned {scanned}, drifted {drifted} (dry run)'
+        else:
+            summary = f'{name}: scanned {scanned}, drifted {drifted}, fixed {fixed}'
+        style = self.style.WARNING if drifted else self.style.SUCCESS
+        self.stdout.write(style(summary))
+        for report in reports:
+            for pk, stored, expected in report['samples']:
+                self.stdout.write(f'  pk={pk} ({fields}): stored {stored}, expected {expected}')
@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class VersionStamp(models.Model):
+    """
+    Change counter for a cacheable resource, e.g. ``post:12`` or ``thread:12``.
+    
+    Writes bump the stamp (see apps.core.versioning); conditional GETs compare
+    it with the client's ETag / If-Modified-Since using one primary key lookup.
+    """
+    
+    key = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=1)
+    modified_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.key} v{self.version}"
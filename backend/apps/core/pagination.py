@@ -0,0 +1,207 @@
+"""
+Keyset (cursor) pagination.
+
+PageNumberPagination runs a COUNT(*) over the filtered set and an OFFSET
+that grows with the page number, so deep pages get slower in a straight
+line. KeysetPagination instead remembers the ordering values of the last
+row it returned and asks for rows strictly "after" them, which the
+matching composite index answers with a range scan. Page 500 costs the
+same as page 1 and no count query is issued.
+
+The ordering is taken from the queryset itself and must end in a unique
+column; the primary key is appended as a tie-breaker when it is missing.
+"""
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    # Full-precision ISO strings: Django's JSON encoder drops microseconds,
+    # which would break equality on the tie-breaking comparison.
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(position, reverse=False):
+    """Encode a list of ordering values into an opaque URL-safe cursor."""
+    payload = {'p': [_encode_value(value) for value in position]}
+    if reverse:
+        payload['r'] = 1
+    data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into ``(position, reverse)``; raise ValueError if malformed."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        position = payload['p']
+    except (TypeError, KeyError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(position, list):
+        raise ValueError('Invalid cursor')
+    return position, bool(payload.get('r'))
+
+
+def parse_ordering(ordering):
+    """Turn ``['-vote_score', 'id']`` into ``[('vote_score', True), ('id', False)]``."""
+    return [
+        (field[1:], True) if field.startswith('-') else (field, False)
+        for field in ordering
+    ]
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """
+    Build the "strictly after ``position``" predicate for a parsed ordering.
+
+    Expands the row comparison ``(a, b, id) < (x, y, z)`` into
+    ``a < x OR (a = x AND b < y) OR (a = x AND b = y AND id < z)``, honouring
+    each column's direction, and leads with ``a <= x`` so the database can
+    turn the first column into an index range.
+    """
+    condition = Q()
+    equal = Q()
+    for (field, descending), value in zip(ordering, position):
+        if descending != reverse:
+            lookup = f'{field}__lt'
+        else:
+            lookup = f'{field}__gt'
+        condition |= equal & Q(**{lookup: value})
+        equal &= Q(**{field: value})
+    field, descending = ordering[0]
+    bound = f'{field}__lte' if descending != reverse else f'{field}__gte'
+    return Q(**{bound: position[0]}) & condition
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over a composite, uniquely tie-broken ordering."""
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset)
+        self.ordering = parse_ordering(ordering)
+        queryset = queryset.order_by(*ordering)
+
+        position, self.reverse = self.decode_cursor(request, queryset)
+        self.has_cursor = position is not None
+        if self.has_cursor:
+            queryset = queryset.filter(keyset_filter(self.ordering, position, self.reverse))
+        if self.reverse:
+            queryset = queryset.reverse()
+
+        # Fetch one extra row to learn whether another page exists
+        results = list(queryset[:self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+        return self.page
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        pk_name = queryset.model._meta.pk.name
+        last = ordering[-1].lstrip('-') if ordering else None
+        if last not in ('pk', pk_name):
+            descending = ordering[-1].startswith('-') if ordering else True
+            ordering.append(f'-{pk_name}' if descending else pk_name)
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request, queryset):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            position, reverse = decode_cursor(cursor)
+            if len(position) != len(self.ordering):
+                raise ValueError('Invalid cursor')
+            position = self.to_position(queryset, position)
+        except (ValidationError, TypeError, ValueError):
+            # Malformed or edited cursors are "no such page", never a 500
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_output_field(self, queryset, name):
+        """The model or annotation field behind the ordering column ``name``."""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        if name == 'pk':
+            return queryset.model._meta.pk
+        return queryset.model._meta.get_field(name)
+
+    def to_position(self, queryset, position):
+        """Convert decoded cursor values to the Python types of their columns."""
+        values = []
+        for (field, _), value in zip(self.ordering, position):
+            if value is None or isinstance(value, (bool, list, dict)):
+                raise ValueError('Invalid cursor')
+            values.append(self.get_output_field(queryset, field).to_python(value))
+        return values
+
+    def get_position(self, obj):
+        return [getattr(obj, field) for field, _ in self.ordering]
+
+    def get_next_link(self):
+        # Walking backwards always leaves rows after the page
+        if not self.page or not (self.has_more or self.reverse):
+            return None
+        cursor = encode_cursor(self.get_position(self.page[-1]))
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.page or not self.has_cursor:
+            return None
+        if self.reverse and not self.has_more:
+            return None
+        cursor = encode_cursor(self.get_position(self.page[0]), reverse=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,256 @@
+"""
+Reconciliation of denormalized counters against their source rows.
+
+Each ``Counter`` describes one set of stored columns and how to recompute
+them for a primary key range with grouped aggregates:
+
+- ``post_votes``: Post.vote_score/ups/downs from PostVote
+- ``post_comments``: Post.comment_count from live (not soft-deleted) Comments
+- ``comment_votes``: Comment.vote_score/ups/downs from CommentVote
+- ``user_karma``: User.karma from KarmaTransaction and KarmaDailySummary
+
+Deltas still waiting in the write-behind buffer (VoteDelta) are subtracted
+from the expected values, so in-flight votes are not reported as drift.
+
+Tables are walked in primary key order with ``.iterator()`` and compared
+chunk by chunk, so memory stays bounded by the chunk size. Rows that
+differ are locked, recomputed under the lock and written back with
+``bulk_update``. A concurrent vote either committed before the lock (and
+is counted) or waits for it (and applies its own change afterwards).
+"""
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def _vote_totals(vote_model, target, ids):
+    """``{object_id: (score, ups, downs)}`` from vote rows of ``ids``."""
+    rows = vote_model.objects.filter(**{f'{target}_id__in': ids}).values(f'{target}_id').annotate(
+        ups=Count('id', filter=Q(vote_type='up')),
+        downs=Count('id', filter=Q(vote_type='down')),
+    ).values_list(f'{target}_id', 'ups', 'downs')
+    return {object_id: (ups - downs, ups, downs) for object_id, ups, downs in rows}
+
+
+def _pending_totals(target, ids, fields):
+    """Write-behind deltas not yet applied to ``ids``, keyed by ``target`` id."""
+    from apps.votes.models import VoteDelta
+
+    totals = {f'total_{field}': Coalesce(Sum(field), Value(0)) for field in fields}
+    rows = VoteDelta.objects.filter(**{f'{target}_id__in': ids}).values(f'{target}_id').annotate(
+        **totals
+    ).values_list(f'{target}_id', *totals)
+    return {row[0]: row[1:] for row in rows}
+
+
+def _subtract(totals, pending, ids, width):
+    expected = {}
+    for object_id in ids:
+        values = totals.get(object_id, (0,) * width)
+        held = pending.get(object_id, (0,) * width)
+        expected[object_id] = tuple(value - delta for value, delta in zip(values, held))
+    return expected
+
+
+class Counter:
+    """A set of stored counter columns on ``model`` and how to recompute them."""
+
+    name = None
+    fields = ()
+
+    def get_model(self):
+        raise NotImplementedError
+
+    def expected(self, ids):
+        """Return ``{pk: tuple(values in self.fields order)}`` for ``ids``."""
+        raise NotImplementedError
+
+    def after_fix(self, objects):
+        """Refresh state derived from the fixed columns of ``objects``."""
+
+
+class PostVotesCounter(Counter):
+    name = 'post_votes'
+    fields = ('vote_score', 'ups', 'downs')
+
+    def get_model(self):
+        from apps.posts.models import Post
+        return Post
+
+    def expected(self, ids):
+        from apps.posts.models import PostVote
+        return _subtract(
+            _vote_totals(PostVote, 'post', ids),
+            _pending_totals('post', ids, ['delta', 'ups', 'downs']),
+            ids, 3,
+        )
+
+    def after_fix(self, objects):
+        from apps.posts import feed_index
+        from apps.posts.models import Post
+        for post in objects:
+            post.set_vote_ranks()
+        Post.objects.bulk_update(objects, Post.VOTE_RANK_FIELDS)
+        for post in objects:
+            feed_index.update_post(post, ['top', 'hot'])
+
+
+class PostCommentsCounter(Counter):
+    name = 'post_comments'
+    fields = ('comment_count',)
+
+    def get_model(self):
+        from apps.posts.models import Post
+        return Post
+
+    def expected(self, ids):
+        from apps.comments.models import Comment
+        rows = Comment.objects.filter(post_id__in=ids, is_deleted=False).values('post_id').annotate(
+            total=Count('id')
+        ).values_list('post_id', 'total')
+        counts = dict(rows)
+        return {post_id: (counts.get(post_id, 0),) for post_id in ids}
+
+    def after_fix(self, objects):
+        from apps.posts import feed_index
+        for post in objects:
+            feed_index.update_post(post, ['comment_count'])
+
+
+class CommentVotesCounter(Counter):
+    name = 'comment_votes'
+    fields = ('vote_score', 'ups', 'downs')
+
+    def get_model(self):
+        from apps.comments.models import Comment
+        return Comment
+
+    def expected(self, ids):
+        from apps.comments.models import CommentVote
+        return _subtract(
+            _vote_totals(CommentVote, 'comment', ids),
+            _pending_totals('comment', ids, ['delta', 'ups', 'downs']),
+            ids, 3,
+        )
+
+    def after_fix(self, objects):
+        from apps.comments.models import Comment
+        for comment in objects:
+            comment.set_vote_ranks()
+        Comment.objects.bulk_update(objects, Comment.VOTE_RANK_FIELDS)
+
+
+class UserKarmaCounter(Counter):
+    name = 'user_karma'
+    fields = ('karma',)
+
+    def get_model(self):
+        from apps.users.models import User
+        return User
+
+    def expected(self, ids):
+        from apps.users.models import KarmaDailySummary, KarmaTransaction
+        from apps.votes.models import VoteDelta
+        ledger = dict(
+            KarmaTransaction.objects.filter(user_id__in=ids).values('user_id').annotate(
+                total=Sum('delta')
+            ).values_list('user_id', 'total')
+        )
+        compacted = dict(
+            KarmaDailySummary.objects.filter(user_id__in=ids).values('user_id').annotate(
+                total=Sum('delta')
+            ).values_list('user_id', 'total')
+        )
+        pending = dict(
+            VoteDelta.objects.filter(author_id__in=ids).values('author_id').annotate(
+                total=Sum('delta')
+            ).values_list('author_id', 'total')
+        )
+        return {
+            user_id: (
+                (ledger.get(user_id) or 0) + (compacted.get(user_id) or 0) - (pending.get(user_id) or 0),
+            )
+            for user_id in ids
+        }
+
+    def after_fix(self, objects):
+        from apps.users import leaderboard
+        leaderboard.karma_changed([user.pk for user in objects], ['all_time'])
+
+
+COUNTERS = {
+    counter.name: counter
+    for counter in (PostVotesCounter(), PostCommentsCounter(), CommentVotesCounter(), UserKarmaCounter())
+}
+
+
+def get_id_ranges(counter_name, parts):
+    """Split the counter's table into ``parts`` contiguous ``[low, high)`` pk ranges."""
+    from django.db.models import Max, Min
+
+    model = COUNTERS[counter_name].get_model()
+    bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    low, high = bounds['low'], bounds['high'] + 1
+    step = max(1, -(-(high - low) // parts))
+    return [(start, min(start + step, high)) for start in range(low, high, step)]
+
+
+def _fix(counter, ids):
+    """Lock drifted rows, recompute them under the lock and write them back."""
+    model = counter.get_model()
+    with transaction.atomic():
+        objects = list(model.objects.select_for_update().filter(pk__in=ids).order_by('pk'))
+        expected = counter.expected([obj.pk for obj in objects])
+        fixed = []
+        for obj in objects:
+            values = expected[obj.pk]
+            if tuple(getattr(obj, field) for field in counter.fields) != values:
+                for field, value in zip(counter.fields, values):
+                    setattr(obj, field, value)
+                fixed.append(obj)
+        if fixed:
+            model.objects.bulk_update(fixed, counter.fields)
+            counter.after_fix(fixed)
+    return len(fixed)
+
+
+def _check(counter, chunk, dry_run, report, sample_size):
+    ids = [row[0] for row in chunk]
+    expected = counter.expected(ids)
+    drifted = []
+    for pk, *stored in chunk:
+        if tuple(stored) != expected[pk]:
+            drifted.append(pk)
+            if len(report['samples']) < sample_size:
+                report['samples'].append((pk, tuple(stored), expected[pk]))
+    report['scanned'] += len(chunk)
+    report['drifted'] += len(drifted)
+    if drifted and not dry_run:
+        report['fixed'] += _fix(counter, drifted)
+
+
+def reconcile_range(counter_name, low, high, chunk_size=2000, dry_run=False, sample_size=10):
+    """
+    Reconcile one counter over primary keys ``[low, high)``.
+
+    Returns a report dict: rows scanned, rows drifted, rows fixed and up to
+    ``sample_size`` ``(pk, stored, expected)`` samples. Module-level and
+    picklable so it can run in a worker process.
+    """
+    counter = COUNTERS[counter_name]
+    model = counter.get_model()
+    rows = model.objects.filter(pk__gte=low, pk__lt=high).order_by('pk').values_list(
+        'pk', *counter.fields
+    )
+    report = {'counter': counter_name, 'scanned': 0, 'drifted': 0, 'fixed': 0, 'samples': []}
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _check(counter, chunk, dry_run, report, sample_size)
+            chunk = []
+    if chunk:
+        _check(counter, chunk, dry_run, report, sample_size)
+    return report
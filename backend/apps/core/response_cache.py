@@ -0,0 +1,168 @@
+"""
+Shared response cache for anonymous GETs of hot pages (feeds, threads).
+
+Rendered JSON bytes are stored under a key built from the path, the
+normalized query string, the Accept header and the current *generation*
+of each scope the page depends on (``feed:all``, ``feed:<slug>``,
+``thread:<post_id>``). Writes call ``invalidate(scope)``, which bumps the
+generation, so every page of that scope moves to a new key at once.
+Nothing has to be enumerated or deleted.
+
+Stampede protection: each entry carries a soft expiry. The cache keeps it
+for ``RESPONSE_CACHE_GRACE`` seconds longer. The first request after the
+soft expiry takes a single-flight lock and re-renders the page. Others keep
+serving the stale copy until it is replaced. On a cold key, requests that
+lose the lock race wait briefly for the winner instead of all hitting the
+database.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+LOCK_TIMEOUT = 10
+WAIT_STEP = 0.05
+
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+STORED_HEADERS = ('ETag', 'Last-Modified', 'Vary')
+
+
+def get_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 30)
+
+
+def get_grace():
+    return getattr(settings, 'RESPONSE_CACHE_GRACE', 60)
+
+
+def get_wait():
+    return getattr(settings, 'RESPONSE_CACHE_WAIT', 2.0)
+
+
+def feed_scopes(community_slug):
+    """Scopes of the post feeds a post in ``community_slug`` appears in."""
+    return ['feed:all', f'feed:{community_slug}']
+
+
+def thread_scope(post_id):
+    return f'thread:{post_id}'
+
+
+def _generation_key(scope):
+    return f'response-gen:{scope}'
+
+
+def get_generations(scopes):
+    """Return the current generation of each scope, creating missing ones."""
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        if key not in found:
+            # Seed with a fresh value so a lost counter can never revive
+            # entries stored under an older generation
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        generations.append(found[key])
+    return generations
+
+
+def invalidate(*scopes):
+    """
+    Move every cached page of ``scopes`` to a new key once the surrounding
+    transaction commits, so a concurrent reader cannot cache the old rows
+    under the new generation.
+    """
+    def apply():
+        for scope in scopes:
+            key = _generation_key(scope)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), None)
+    transaction.on_commit(apply)
+
+
+def build_key(request, scopes):
+    query = sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        for value in values
+        if value != ''
+    )
+    generations = get_generations(scopes)
+    raw = repr((request.path, query, request.META.get('HTTP_ACCEPT', ''), generations))
+    digest = hashlib.md5(raw.encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'response:{digest}'
+
+
+def _to_response(entry):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    return response
+
+
+class AnonymousResponseCacheMixin:
+    """
+    View mixin caching rendered GET responses for anonymous clients.
+
+    Subclasses implement ``get_response_cache_scopes(request, **kwargs)``.
+    Requests with credentials or conditional headers always bypass the
+    cache, since their responses are per-user or already cheap.
+    """
+
+    def get_response_cache_scopes(self, request, **kwargs):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        if (
+            request.method != 'GET'
+            or 'HTTP_AUTHORIZATION' in request.META
+            or any(header in request.META for header in CONDITIONAL_HEADERS)
+        ):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = build_key(request, self.get_response_cache_scopes(request, **kwargs))
+        lock = f'{key}:lock'
+        entry = cache.get(key)
+        if entry is not None:
+            if entry['fresh_until'] > time.time() or not cache.add(lock, 1, LOCK_TIMEOUT):
+                # Fresh, or stale while another request refreshes it
+                return _to_response(entry)
+            return self._render_and_store(key, lock, request, *args, **kwargs)
+
+        if cache.add(lock, 1, LOCK_TIMEOUT):
+            return self._render_and_store(key, lock, request, *args, **kwargs)
+
+        # Cold key being rendered elsewhere: wait for it rather than piling on
+        deadline = time.monotonic() + get_wait()
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_STEP)
+            entry = cache.get(key)
+            if entry is not None:
+                return _to_response(entry)
+        return super().dispatch(request, *args, **kwargs)
+
+    def _render_and_store(self, key, lock, request, *args, **kwargs):
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            if response.status_code == 200:
+                entry = {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'headers': {
+                        header: response[header]
+                        for header in STORED_HEADERS if response.has_header(header)
+                    },
+                    'fresh_until': time.time() + get_timeout(),
+                }
+                cache.set(key, entry, get_timeout() + get_grace())
+            return response
+        finally:
+            cache.delete(lock)
@@ -0,0 +1,120 @@
+"""
+Sparse fieldsets: ``?fields=id,title`` and ``?omit=content`` on read requests.
+
+``SparseFieldsetsMixin`` trims a serializer's fields from the request in the
+serializer context, and ``SparseQuerysetMixin`` turns the surviving fields
+into a ``.only()`` column list so the database stops shipping columns the
+response would throw away.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _parse_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    return {field.strip() for field in value.split(',') if field.strip()}
+
+
+def get_sparse_fieldset(request):
+    """Return ``(fields, omit)`` requested on a read request, either may be None."""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None, None
+    return _parse_param(request, FIELDS_PARAM), _parse_param(request, OMIT_PARAM)
+
+
+class SparseFieldsetsMixin:
+    """
+    Serializer mixin that honours ``?fields=`` and ``?omit=`` on GET requests.
+
+    Unknown names are ignored. Only read requests are affected, so the same
+    serializer can still be used for writes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, omit = get_sparse_fieldset(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+        if omit:
+            for name in omit & set(self.fields):
+                self.fields.pop(name)
+
+
+def get_only_fields(serializer, model):
+    """
+    Return the model lookups the serializer's current fields read.
+
+    ``source='community.slug'`` becomes ``community__slug``; a bare relation
+    (e.g. a StringRelatedField) keeps the whole related row unless the
+    serializer narrows it with ``sparse_only = {'author': ['author__username']}``.
+    Method fields and other non-model sources only need the primary key.
+    """
+    hints = getattr(serializer, 'sparse_only', {})
+    lookups = {model._meta.pk.name}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in hints:
+            lookups.update(hints[name])
+            continue
+        if field.source == '*':
+            continue
+        current = model
+        path = []
+        for attr in field.source.split('.'):
+            try:
+                model_field = current._meta.get_field(attr)
+            except (FieldDoesNotExist, AttributeError):
+                path = []
+                break
+            if model_field.many_to_many or model_field.one_to_many:
+                path = []
+                break
+            path.append(attr)
+            if not model_field.is_relation:
+                break
+            current = model_field.related_model
+        if path:
+            lookups.add('__'.join(path))
+    return lookups
+
+
+class SparseQuerysetMixin:
+    """
+    View mixin that restricts list/detail querysets to the serialized columns.
+
+    The ordering columns are always kept, since keyset pagination reads
+    them from every row to build cursors.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in ('GET', 'HEAD'):
+            return queryset
+        model = queryset.model
+        lookups = get_only_fields(self.get_serializer(), model)
+        for ordering in queryset.query.order_by:
+            name = ordering.lstrip('-')
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue  # annotation
+            if isinstance(field, models.Field) and field.concrete:
+                lookups.add(name)
+        # A relation cannot be both deferred and select_related, so only
+        # join the relations the response still reads from
+        relations = set()
+        for lookup in lookups:
+            name = lookup.split('__')[0]
+            if model._meta.get_field(name).is_relation:
+                relations.add(name)
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*lookups)
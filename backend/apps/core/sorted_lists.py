@@ -0,0 +1,105 @@
+"""
+Bounded sorted lists held in the shared cache.
+
+A list is ``{'truncated': bool, 'entries': [[key, item_id], ...]}``: the
+best ``size`` items of a ranking as compact pairs, in the order given by an
+``order(entry)`` sort key. ``truncated`` says whether items were cut off
+below the last entry. The feed index (apps.posts.feed_index) and the karma
+leaderboards (apps.users.leaderboard) are built on it; each supplies its
+own ordering, rebuild query and the current keys of changed items.
+
+Incremental updates run under a short per-list lock that covers only the
+in-memory edit; the database is read before taking it. A writer that finds
+the lock taken waits for it and then applies its change on top of the
+other writer's, so concurrent writers neither lose changes nor force a
+rebuild. Only a writer still locked out after ``LOCK_WAIT`` seconds (a
+stuck or crashed holder) drops the list, leaving the next reader to
+rebuild it from the database.
+
+Since values are read outside the lock, a writer may place a value that a
+later commit has already replaced, after the later writer placed the new
+one. ``reposition()`` therefore reads the values again after its edit and
+repeats it until they agree: the last edit for an item is always followed
+by a read showing it is current.
+"""
+import time
+from bisect import bisect_right
+
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 1.0
+WAIT_STEP = 0.005
+# Edits by reposition() before giving up on a list whose items keep changing
+MAX_ATTEMPTS = 3
+
+
+def place(data, values, order, size):
+    """
+    Reposition items in the list ``data`` in place.
+
+    ``values`` maps item ids to their current key, or to None to remove the
+    item. The list is cut back to ``size`` entries.
+    """
+    entries = [entry for entry in data['entries'] if entry[1] not in values]
+    orders = [order(entry) for entry in entries]
+    for item_id, key in values.items():
+        if key is None:
+            continue
+        entry = [key, item_id]
+        position = bisect_right(orders, order(entry))
+        if position < len(entries) or not data['truncated']:
+            entries.insert(position, entry)
+            orders.insert(position, order(entry))
+        # Otherwise the item now ranks below the cached window, where
+        # unknown items may sit ahead of it, so it simply drops out
+    if len(entries) > size:
+        entries = entries[:size]
+        data['truncated'] = True
+    data['entries'] = entries
+
+
+def update(key, mutate, timeout):
+    """
+    Apply ``mutate(data)`` to the list cached at ``key`` under its lock.
+
+    Returns whether the list was edited. A list that is not cached is left
+    alone; the next reader builds it with the change included. ``mutate``
+    should not query the database, as every writer of the list waits for it.
+    """
+    lock = f'{key}:lock'
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock, 1, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            # The holder looks stuck; a rebuild beats losing this change
+            cache.delete(key)
+            return False
+        time.sleep(WAIT_STEP)
+    try:
+        data = cache.get(key)
+        if data is None:
+            return False
+        mutate(data)
+        cache.set(key, data, timeout)
+        return True
+    finally:
+        cache.delete(lock)
+
+
+def reposition(key, read_values, order, size, timeout):
+    """
+    Move items of the list cached at ``key`` to their current keys.
+
+    ``read_values()`` returns ``{item_id: key}`` (None to remove the item)
+    from the database; it runs outside the lock, before and after each edit
+    (see the module docstring).
+    """
+    values = read_values()
+    for _ in range(MAX_ATTEMPTS):
+        if not update(key, lambda data: place(data, values, order, size), timeout):
+            return
+        fresh = read_values()
+        if fresh == values:
+            return
+        values = fresh
+    cache.delete(key)
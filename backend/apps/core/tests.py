@@ -0,0 +1,192 @@
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models.query import QuerySet
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.comments.models import Comment
+from apps.communities.models import Community
+from apps.posts.models import Post
+from apps.users.models import User
+from . import sorted_lists, versioning
+from .models import VersionStamp
+from .reconcile import get_id_ranges
+from .upsert import increment_or_create
+
+
+def descending(entry):
+    key, item_id = entry
+    return (-key, -item_id)
+
+
+class SortedListTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_place_orders_moves_and_removes(self):
+        data = {'truncated': False, 'entries': [[5, 1], [3, 2]]}
+        sorted_lists.place(data, {3: 4, 1: 2}, descending, 10)
+        self.assertEqual(data['entries'], [[4, 3], [3, 2], [2, 1]])
+        sorted_lists.place(data, {2: None}, descending, 10)
+        self.assertEqual(data['entries'], [[4, 3], [2, 1]])
+
+    def test_place_cuts_to_size_and_drops_items_below_a_truncated_list(self):
+        data = {'truncated': False, 'entries': [[5, 1], [3, 2]]}
+        sorted_lists.place(data, {3: 4}, descending, 2)
+        self.assertEqual(data, {'truncated': True, 'entries': [[5, 1], [4, 3]]})
+        # Unknown items may rank between the last entry and this one
+        sorted_lists.place(data, {4: 1}, descending, 2)
+        self.assertEqual(data['entries'], [[5, 1], [4, 3]])
+
+    def test_update_waits_for_a_held_lock_instead_of_dropping_the_list(self):
+        cache.set('list', {'truncated': False, 'entries': [[1, 1]]})
+        cache.add('list:lock', 1)
+        release = threading.Timer(0.05, cache.delete, ['list:lock'])
+        release.start()
+        sorted_lists.update(
+            'list', lambda data: sorted_lists.place(data, {2: 2}, descending, 10), None
+        )
+        release.join()
+        self.assertEqual(cache.get('list')['entries'], [[2, 2], [1, 1]])
+        self.assertIsNone(cache.get('list:lock'))
+
+    def test_reposition_reads_outside_the_lock(self):
+        cache.set('list', {'truncated': False, 'entries': [[1, 1]]})
+
+        def read_values():
+            self.assertIsNone(cache.get('list:lock'))
+            return {2: 2}
+
+        sorted_lists.reposition('list', read_values, descending, 10, None)
+        self.assertEqual(cache.get('list')['entries'], [[2, 2], [1, 1]])
+
+    def test_reposition_repeats_an_edit_overtaken_by_a_later_commit(self):
+        cache.set('list', {'truncated': False, 'entries': [[1, 1]]})
+        # The first read is stale by the time it is placed
+        read_values = mock.Mock(side_effect=[{2: 5}, {2: 7}, {2: 7}])
+        sorted_lists.reposition('list', read_values, descending, 10, None)
+        self.assertEqual(cache.get('list')['entries'], [[7, 2], [1, 1]])
+        self.assertEqual(read_values.call_count, 3)
+
+    def test_reposition_leaves_a_missing_list_alone(self):
+        read_values = mock.Mock(return_value={2: 2})
+        sorted_lists.reposition('list', read_values, descending, 10, None)
+        self.assertIsNone(cache.get('list'))
+        self.assertEqual(read_values.call_count, 1)
+
+    def test_update_drops_the_list_when_the_holder_is_stuck(self):
+        cache.set('list', {'truncated': False, 'entries': [[1, 1]]})
+        cache.add('list:lock', 1)
+        with mock.patch.object(sorted_lists, 'LOCK_WAIT', 0.02):
+            sorted_lists.update('list', lambda data: None, None)
+        self.assertIsNone(cache.get('list'))
+
+
+class IncrementOrCreateTests(TestCase):
+
+    def test_creates_then_increments(self):
+        now = timezone.now()
+        increment_or_create(VersionStamp, {'key': 'post:1'}, defaults={'modified_at': now}, version=1)
+        increment_or_create(VersionStamp, {'key': 'post:1'}, defaults={'modified_at': now}, version=2)
+        self.assertEqual(versioning.get_stamp('post:1'), (3, now))
+
+    def test_row_created_concurrently_is_incremented_once(self):
+        VersionStamp.objects.create(key='post:1', version=1, modified_at=timezone.now())
+        update = QuerySet.update
+        calls = []
+
+        def missed_first_update(queryset, **changes):
+            calls.append(changes)
+            # The first update runs before the other writer's row is visible
+            return 0 if len(calls) == 1 else update(queryset, **changes)
+
+        with mock.patch.object(QuerySet, 'update', missed_first_update):
+            versioning.bump('post:1')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(versioning.get_stamp('post:1')[0], 2)
+
+
+class ReconcileCountersTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='pw')
+            for name in ('alice', 'bob')
+        ]
+        community = Community.objects.create(name='Python', slug='python', creator=self.alice)
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', author=self.alice, community=community)
+            for i in range(5)
+        ]
+        self.comment = Comment.objects.create(content='Hi', author=self.alice, post=self.posts[0])
+        Comment.objects.create(content='Gone', author=self.bob, post=self.posts[0]).soft_delete()
+        self.client.force_authenticate(self.bob)
+        for post in self.posts[:3]:
+            self.client.post(f'/api/posts/{post.pk}/vote/', {'vote_type': 'up'}, format='json')
+        self.client.post(f'/api/comments/{self.comment.pk}/vote/', {'vote_type': 'down'}, format='json')
+        self.correct = self.snapshot()
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list('vote_score', 'ups', 'downs', 'comment_count')),
+            list(Comment.objects.order_by('pk').values_list('vote_score', 'ups', 'downs')),
+            list(User.objects.order_by('pk').values_list('karma', flat=True)),
+        )
+
+    def drift(self):
+        Post.objects.filter(pk=self.posts[1].pk).update(vote_score=7, ups=7)
+        Post.objects.filter(pk=self.posts[0].pk).update(comment_count=5)
+        Comment.objects.filter(pk=self.comment.pk).update(vote_score=3)
+        User.objects.filter(pk=self.alice.pk).update(karma=100)
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_counters', '--chunk-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_clean_counters_report_no_drift(self):
+        output = self.reconcile()
+        for name in ('post_votes', 'post_comments', 'comment_votes', 'user_karma'):
+            self.assertIn(f'{name}: scanned', output)
+        self.assertNotIn('pk=', output)
+        self.assertEqual(self.snapshot(), self.correct)
+
+    def test_dry_run_reports_without_fixing(self):
+        self.drift()
+        drifted = self.snapshot()
+        output = self.reconcile('--dry-run')
+        self.assertIn('post_votes: scanned 5, drifted 1 (dry run)', output)
+        self.assertIn('post_comments: scanned 5, drifted 1 (dry run)', output)
+        self.assertIn('comment_votes: scanned 2, drifted 1 (dry run)', output)
+        self.assertIn(f'pk={self.posts[1].pk} (vote_score, ups, downs): stored (7, 7, 0), expected (1, 1, 0)', output)
+        self.assertEqual(self.snapshot(), drifted)
+
+    def test_fixes_drifted_rows(self):
+        self.drift()
+        output = self.reconcile()
+        self.assertIn('post_votes: scanned 5, drifted 1, fixed 1', output)
+        self.assertIn('user_karma: scanned 2, drifted 1, fixed 1', output)
+        self.assertEqual(self.snapshot(), self.correct)
+        self.assertNotIn('pk=', self.reconcile())
+
+    def test_single_counter(self):
+        self.drift()
+        output = self.reconcile('--counter', 'post_comments')
+        self.assertEqual(output.count('scanned'), 1)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).comment_count, 1)
+        self.assertEqual(Post.objects.get(pk=self.posts[1].pk).vote_score, 7)
+
+    def test_id_ranges_cover_the_table(self):
+        ranges = get_id_ranges('post_votes', 3)
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges[0][0], self.posts[0].pk)
+        self.assertEqual(ranges[-1][1], self.posts[-1].pk + 1)
+        for (_, high), (low, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(high, low)
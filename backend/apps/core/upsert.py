@@ -0,0 +1,31 @@
+"""
+Counter rows keyed by a unique lookup.
+
+Rollups and version stamps add to a row that may not exist yet. The update
+comes first, since the row usually exists; on a miss the row is created in
+a savepoint, and if a concurrent writer created it in between, the
+unique constraint fails and the increment is retried as an update. Either
+way the increment is applied exactly once without locking the table.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+def increment_or_create(model, lookup, defaults=None, **deltas):
+    """
+    Add ``deltas`` to the ``model`` row matching ``lookup``, creating it if needed.
+
+    ``lookup`` must cover a unique constraint. ``defaults`` are set as-is
+    on update and create; a created row starts from the deltas themselves.
+    """
+    defaults = defaults or {}
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    changes.update(defaults)
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **defaults, **deltas)
+    except IntegrityError:
+        # Another transaction created the row first
+        model.objects.filter(**lookup).update(**changes)
@@ -13,7 +13,7 @@ class PostAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'community', 'post_type', 'vote_score', 'comment_count', 'created_at']
     list_filter = ['post_type', 'is_pinned', 'is_locked', 'is_nsfw', 'community']
     search_fields = ['title', 'content', 'author__username']
-    readonly_fields = ['vote_score', 'comment_count', 'created_at', 'updated_at']
+    readonly_fields = ['vote_score', 'comment_count', 'hot_rank', 'ups', 'downs', 'wilson_lower_bound', 'controversy', 'created_at', 'updated_at']
     inlines = [PostVoteInline]
 
 
@@ -5,3 +5,6 @@ class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.posts'
     verbose_name = 'Posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
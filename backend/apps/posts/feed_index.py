@@ -0,0 +1,197 @@
+"""
+Precomputed feed index held in the shared cache.
+
+For every (scope, sort) pair - scope being a community slug or
+``GLOBAL_SCOPE`` (``None``) for the global feed - the cache holds the top
+``FEED_INDEX_SIZE`` posts as a sorted list (see apps.core.sorted_lists) of
+compact ``[sort_key, post_id]`` pairs, in the same order as the matching
+``FEED_ORDERINGS`` entry. Feed pages are cut from that list and hydrated
+with a single ``pk__in`` query instead of re-sorting ``Post`` rows in the
+database on every request.
+
+Post creation, deletion, votes and comment count changes update the lists
+incrementally. Each update reads the post's current sort key from the
+database when it runs and checks it again after its edit (see
+sorted_lists.reposition), so callbacks running out of commit order still
+leave the latest value in place.
+"""
+from bisect import bisect_right
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.core import sorted_lists
+from .ranking import FEED_ORDERINGS
+
+# Community scopes are slugs; the global feed is keyed apart from all of them
+GLOBAL_SCOPE = None
+
+
+def get_index_size():
+    return getattr(settings, 'FEED_INDEX_SIZE', 500)
+
+
+def get_index_timeout():
+    return getattr(settings, 'FEED_INDEX_TIMEOUT', 300)
+
+
+def index_key(scope, sort):
+    if scope is GLOBAL_SCOPE:
+        return f'feed-index:global:{sort}'
+    return f'feed-index:c:{scope}:{sort}'
+
+
+def _order(entry):
+    # Descending (key, id), as in FEED_ORDERINGS
+    key, post_id = entry
+    return (-key, -post_id)
+
+
+def _micros(value):
+    # Exact integer microseconds; a float timestamp would lose precision
+    return int(value.timestamp()) * 1_000_000 + value.microsecond
+
+
+def cursor_sort_key(sort, value):
+    """
+    Convert a keyset cursor value into the index's numeric sort key.
+
+    Raises ValueError for a value of the wrong type, so an edited cursor is
+    rejected before it reaches the bisect.
+    """
+    if sort == 'new':
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if not isinstance(value, datetime):
+            raise ValueError('Invalid cursor')
+        return _micros(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError('Invalid cursor')
+    return value
+
+
+def _stored_key(sort, value):
+    return _micros(value) if sort == 'new' else value
+
+
+def _current_key(sort, post_id):
+    """The post's sort key as committed right now, or None if it is gone."""
+    from .models import Post
+
+    field = FEED_ORDERINGS[sort][0].lstrip('-')
+    value = Post.objects.filter(pk=post_id).values_list(field, flat=True).first()
+    return None if value is None else _stored_key(sort, value)
+
+
+def post_scopes(post):
+    return [GLOBAL_SCOPE, post.community.slug]
+
+
+def build_index(scope, sort):
+    """Load the top posts for ``(scope, sort)`` from the database and cache them."""
+    from .models import Post
+
+    size = get_index_size()
+    queryset = Post.objects.all()
+    if scope is not GLOBAL_SCOPE:
+        queryset = queryset.filter(community__slug=scope)
+    field = FEED_ORDERINGS[sort][0].lstrip('-')
+    rows = queryset.order_by(*FEED_ORDERINGS[sort]).values_list(field, 'id')[:size + 1]
+    entries = [[_stored_key(sort, value), post_id] for value, post_id in rows]
+    index = {'truncated': len(entries) > size, 'entries': entries[:size]}
+    cache.set(index_key(scope, sort), index, get_index_timeout())
+    return index
+
+
+def get_index(scope, sort):
+    """Return the cached index for ``(scope, sort)``, building it on a miss."""
+    index = cache.get(index_key(scope, sort))
+    if index is None:
+        index = build_index(scope, sort)
+    return index
+
+
+def invalidate(scope, sort=None):
+    sorts = [sort] if sort else list(FEED_ORDERINGS)
+    cache.delete_many([index_key(scope, s) for s in sorts])
+
+
+def get_page(scope, sort, position, page_size):
+    """
+    Return up to ``page_size + 1`` post ids after the keyset ``position``.
+
+    Returns ``None`` when the index cannot answer exactly, i.e. when the
+    requested page runs past the end of a truncated index; the caller then
+    falls back to the database. Raises ValueError for a malformed position.
+    """
+    target = None
+    if position is not None:
+        if len(position) != 2 or isinstance(position[1], bool) or not isinstance(position[1], int):
+            raise ValueError('Invalid cursor')
+        target = _order([cursor_sort_key(sort, position[0]), position[1]])
+    index = get_index(scope, sort)
+    entries = index['entries']
+    start = 0
+    if target is not None:
+        start = bisect_right([_order(entry) for entry in entries], target)
+    window = entries[start:start + page_size + 1]
+    if len(window) <= page_size and index['truncated']:
+        return None
+    return [post_id for _, post_id in window]
+
+
+def _place(scope, sort, post_id):
+    # Read when the callback runs, not when it was queued: a callback from an
+    # older commit running late must not put back the score it captured
+    sorted_lists.reposition(
+        index_key(scope, sort),
+        lambda: {post_id: _current_key(sort, post_id)},
+        _order,
+        get_index_size(),
+        get_index_timeout(),
+    )
+
+
+def _remove(scope, sort, post_id):
+    sorted_lists.update(
+        index_key(scope, sort),
+        lambda index: sorted_lists.place(index, {post_id: None}, _order, get_index_size()),
+        get_index_timeout(),
+    )
+
+
+def _on_commit(func):
+    # Only touch the shared index once the database change is durable
+    transaction.on_commit(func)
+
+
+def add_post(post):
+    """Insert a newly created post into every sort of its scopes."""
+    def apply():
+        for scope in post_scopes(post):
+            for sort in FEED_ORDERINGS:
+                _place(scope, sort, post.pk)
+    _on_commit(apply)
+
+
+def update_post(post, sorts):
+    """Reposition ``post`` after a change to the sort keys for ``sorts``."""
+    def apply():
+        for scope in post_scopes(post):
+            for sort in sorts:
+                _place(scope, sort, post.pk)
+    _on_commit(apply)
+
+
+def remove_post(post):
+    """Remove a deleted post from every sort of its scopes."""
+    post_id = post.pk
+    scopes = post_scopes(post)
+
+    def apply():
+        for scope in scopes:
+            for sort in FEED_ORDERINGS:
+                _remove(scope, sort, post_id)
+    _on_commit(apply)
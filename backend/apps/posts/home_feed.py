@@ -0,0 +1,116 @@
+"""
+Personalized home feed over a user's joined communities.
+
+``community__in=<joined> ORDER BY -created_at`` has to gather and sort
+every post from every joined community before it can return 20 rows.
+Instead, each joined community is treated as an already-sorted stream read
+off the ``(community, -created_at, -id)`` index, and the streams are
+combined with a k-way merge on a heap. Streams are read in small batches
+and only refilled when they run dry, so the rows touched per page stay
+proportional to the page size rather than to the user's total posts.
+"""
+import heapq
+from math import ceil
+
+from django.db import connection
+
+from apps.core.pagination import keyset_filter, parse_ordering
+
+HOME_ORDERING = ('-created_at', '-id')
+
+
+class CommunityStream:
+    """One community's posts in feed order, read lazily in batches."""
+
+    def __init__(self, community_id, position):
+        self.community_id = community_id
+        self.position = position
+        self.buffer = []
+        self.exhausted = False
+
+    def needs_refill(self):
+        return not self.buffer and not self.exhausted
+
+    def queryset(self, base_queryset, limit):
+        queryset = base_queryset.filter(community_id=self.community_id)
+        if self.position is not None:
+            queryset = queryset.filter(
+                keyset_filter(parse_ordering(HOME_ORDERING), self.position)
+            )
+        return queryset.order_by(*HOME_ORDERING).values_list(
+            'created_at', 'id', 'community_id'
+        )[:limit]
+
+    def extend(self, rows, limit):
+        self.buffer.extend(rows)
+        if len(rows) < limit:
+            self.exhausted = True
+        if rows:
+            self.position = [rows[-1][0], rows[-1][1]]
+
+
+def fetch_batches(streams, base_queryset, limit):
+    """Refill ``streams`` with up to ``limit`` rows each."""
+    querysets = [stream.queryset(base_queryset, limit) for stream in streams]
+    if len(querysets) > 1 and connection.features.supports_slicing_ordering_in_compound:
+        # One round trip: UNION ALL of per-community LIMIT subqueries,
+        # each an index range scan
+        rows = list(querysets[0].union(*querysets[1:], all=True))
+    else:
+        rows = [row for queryset in querysets for row in queryset]
+
+    by_community = {}
+    for row in rows:
+        by_community.setdefault(row[2], []).append(row)
+    for stream in streams:
+        batch = sorted(
+            by_community.get(stream.community_id, []),
+            key=lambda row: (row[0], row[1]),
+            reverse=True,
+        )
+        stream.extend(batch, limit)
+
+
+def merge_home_feed(base_queryset, community_ids, position, count):
+    """
+    Return up to ``count`` post ids from ``community_ids`` after ``position``.
+
+    ``position`` is a ``[created_at, id]`` keyset cursor (or ``None`` for the
+    first page) shared by every stream; results are in ``HOME_ORDERING``.
+    """
+    streams = {
+        community_id: CommunityStream(community_id, position)
+        for community_id in community_ids
+    }
+    if not streams or count <= 0:
+        return []
+
+    # Start with a small slice of every stream; most of them will not
+    # contribute more than a row or two to a single page
+    first_batch = min(count, max(2, ceil(2 * count / len(streams))))
+    fetch_batches(list(streams.values()), base_queryset, first_batch)
+
+    heap = []
+
+    def push(stream):
+        created_at, post_id, community_id = stream.buffer.pop(0)
+        # Exact integer microseconds so the heap agrees with the database
+        micros = int(created_at.timestamp()) * 1_000_000 + created_at.microsecond
+        heapq.heappush(heap, (-micros, -post_id, community_id))
+
+    for stream in streams.values():
+        if stream.buffer:
+            push(stream)
+
+    result = []
+    while heap and len(result) < count:
+        _, neg_id, community_id = heapq.heappop(heap)
+        result.append(-neg_id)
+        stream = streams[community_id]
+        if stream.needs_refill() and len(result) < count:
+            # This stream may still hold the next-best post; read only as
+            # many rows as the page could still use
+            fetch_batches([stream], base_queryset, count - len(result))
+        if stream.buffer:
+            push(stream)
+    return result
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from apps.core.upsert import increment_or_create
+from apps.posts.models import PostVoteRollup
+
+
+class Command(BaseCommand):
+    """
+    Fold hourly vote rollups into daily rows.
+
+    vote_post writes one row per post per hour. Hour and day windows need
+    that resolution, but anything older than --keep-hours only feeds the
+    week/month/year windows, where one row per post per day is enough.
+    Run it on a schedule (e.g. hourly) to keep the rollup table small.
+    """
+
+    help = 'Fold hourly post vote rollups older than the horizon into daily rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-hours', type=int, default=48,
+            help='Keep hourly rows newer than this many hours (default: 48).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of (post, day) groups folded per transaction (default: 1000).'
+        )
+
+    def handle(self, *args, **options):
+        horizon = timezone.now() - timedelta(hours=options['keep_hours'])
+        # Only fold whole days so a daily row never overlaps kept hourly rows
+        horizon = horizon.replace(hour=0, minute=0, second=0, microsecond=0)
+        batch_size = options['batch_size']
+
+        folded = 0
+        while True:
+            groups = list(
+                PostVoteRollup.objects.filter(span='hour', bucket__lt=horizon)
+                .annotate(day=TruncDay('bucket'))
+                .values('post_id', 'day')
+                .annotate(total=Sum('delta'))
+                .order_by('day', 'post_id')[:batch_size]
+            )
+            if not groups:
+                break
+            with transaction.atomic():
+                for group in groups:
+                    increment_or_create(
+                        PostVoteRollup,
+                        {'post_id': group['post_id'], 'bucket': group['day'], 'span': 'day'},
+                        delta=group['total'],
+                    )
+                    PostVoteRollup.objects.filter(
+                        post_id=group['post_id'],
+                        span='hour',
+                        bucket__gte=group['day'],
+                        bucket__lt=group['day'] + timedelta(days=1),
+                    ).delete()
+            folded += len(groups)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Folded {folded} post-day groups of hourly rollups.'
+        ))
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.communities.models import Community
+from apps.core import response_cache
+from apps.posts import feed_index
+from apps.posts.models import Post
+from apps.posts.ranking import hot_rank
+
+
+class Command(BaseCommand):
+    """
+    Recompute the stored hot rank for recent posts.
+
+    vote_post refreshes hot_rank on every vote, so this is a periodic
+    safety net (run it from cron or a scheduler) that repairs any drift
+    inside the window where hot feeds actually look. The cached hot
+    indexes and feed pages of the affected communities are dropped, so
+    feeds are rebuilt from the repaired ranks.
+    """
+
+    help = 'Recompute the stored hot rank for posts created in the recent window.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=7,
+            help='Re-rank posts created in the last N days (default: 7).'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Re-rank every post, ignoring --days.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows written per bulk update (default: 1000).'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Post.objects.only('id', 'community_id', 'vote_score', 'created_at', 'hot_rank')
+        if not options['all']:
+            since = timezone.now() - timedelta(days=options['days'])
+            queryset = queryset.filter(created_at__gte=since)
+
+        checked = updated = 0
+        batch = []
+        community_ids = set()
+        for post in queryset.order_by('pk').iterator(chunk_size=batch_size):
+            checked += 1
+            rank = hot_rank(post.vote_score, post.created_at)
+            if rank != post.hot_rank:
+                post.hot_rank = rank
+                batch.append(post)
+                community_ids.add(post.community_id)
+            if len(batch) >= batch_size:
+                Post.objects.bulk_update(batch, ['hot_rank'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            Post.objects.bulk_update(batch, ['hot_rank'])
+            updated += len(batch)
+
+        if community_ids:
+            slugs = sorted(Community.objects.filter(pk__in=community_ids).values_list('slug', flat=True))
+            for scope in [feed_index.GLOBAL_SCOPE, *slugs]:
+                feed_index.invalidate(scope, 'hot')
+            response_cache.invalidate(*sorted({
+                scope for slug in slugs for scope in response_cache.feed_scopes(slug)
+            }))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Re-ranked {updated} of {checked} posts.'
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_hot_rank(apps, schema_editor):
+    from apps.posts.ranking import hot_rank
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'vote_score', 'created_at').iterator(chunk_size=1000):
+        post.hot_rank = hot_rank(post.vote_score, post.created_at)
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ['hot_rank'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['hot_rank'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0002_initial'),
+        ('posts', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_rank',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['community', '-hot_rank'], name='posts_post_communi_1c9610_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_rank'], name='posts_post_hot_ran_b06e6f_idx'),
+        ),
+        migrations.RunPython(backfill_hot_rank, migrations.RunPython.noop),
+    ]
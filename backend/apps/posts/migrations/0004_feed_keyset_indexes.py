@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0002_initial'),
+        ('posts', '0003_post_hot_rank'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_post_communi_ddf459_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_post_vote_sc_1a4844_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_post_communi_1c9610_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_post_hot_ran_b06e6f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['community', '-created_at', '-id'], name='posts_post_communi_baef87_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='posts_post_created_a7e5d4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['community', '-vote_score', '-id'], name='posts_post_communi_6f5c05_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-vote_score', '-id'], name='posts_post_vote_sc_b0e6a7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['community', '-hot_rank', '-id'], name='posts_post_communi_037a52_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_rank', '-id'], name='posts_post_hot_ran_6920b7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['community', '-comment_count', '-id'], name='posts_post_communi_a71b72_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-comment_count', '-id'], name='posts_post_comment_009db4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='posts_post_author__85d846_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE posts_post ADD COLUMN search_vector tsvector')
+        schema_editor.execute(
+            "UPDATE posts_post SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+        )
+        schema_editor.execute(
+            'CREATE INDEX posts_post_search_vector_gin '
+            'ON posts_post USING GIN (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+            "title, content, tokenize = 'porter unicode61')"
+        )
+        schema_editor.execute(
+            'INSERT INTO posts_post_fts (rowid, title, content) '
+            'SELECT id, title, content FROM posts_post'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS posts_post_search_vector_gin')
+        schema_editor.execute('ALTER TABLE posts_post DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text search storage for posts (see apps.posts.search).
+
+    Kept out of the model state on purpose: the tsvector column and the
+    FTS5 table are vendor specific and only ever touched through raw SQL.
+    """
+
+    dependencies = [
+        ('communities', '0002_initial'),
+        ('posts', '0004_feed_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
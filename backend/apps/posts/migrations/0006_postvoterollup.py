@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostVoteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour or day this row covers')),
+                ('span', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], default='hour', max_length=4)),
+                ('delta', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_rollups', to='posts.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket', 'post'], name='posts_postv_bucket_33ab38_idx')],
+                'unique_together': {('post', 'bucket', 'span')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+
+def backfill_excerpt(apps, schema_editor):
+    from apps.posts.models import make_excerpt
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=1000):
+        post.excerpt = make_excerpt(post.content)
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_postvoterollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.RunPython(backfill_excerpt, migrations.RunPython.noop),
+    ]
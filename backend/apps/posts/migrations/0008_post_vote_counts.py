@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:35
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_vote_counts(apps, schema_editor):
+    from apps.votes.scoring import controversy, wilson_lower_bound
+    Post = apps.get_model('posts', 'Post')
+    voted = Post.objects.annotate(
+        up_count=Count('votes', filter=Q(votes__vote_type='up')),
+        down_count=Count('votes', filter=Q(votes__vote_type='down')),
+    ).filter(Q(up_count__gt=0) | Q(down_count__gt=0)).only('id')
+    fields = ['ups', 'downs', 'wilson_lower_bound', 'controversy']
+    batch = []
+    for obj in voted.iterator(chunk_size=1000):
+        obj.ups, obj.downs = obj.up_count, obj.down_count
+        obj.wilson_lower_bound = wilson_lower_bound(obj.ups, obj.downs)
+        obj.controversy = controversy(obj.ups, obj.downs)
+        batch.append(obj)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='controversy',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='downs',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='ups',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='wilson_lower_bound',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_vote_counts, migrations.RunPython.noop),
+    ]
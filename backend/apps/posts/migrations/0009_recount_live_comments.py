@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:53
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def recount_live_comments(apps, schema_editor):
+    # comment_count now excludes soft-deleted comments
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('comments', 'Comment')
+    live = Comment.objects.filter(post=OuterRef('pk'), is_deleted=False).order_by().values('post').annotate(
+        total=Count('id')
+    ).values('total')
+    soft_deleted = Comment.objects.filter(is_deleted=True).values('post_id')
+    Post.objects.filter(pk__in=soft_deleted).update(
+        comment_count=Coalesce(Subquery(live), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0005_comment_reply_counts'),
+        ('posts', '0008_post_vote_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_live_comments, migrations.RunPython.noop),
+    ]
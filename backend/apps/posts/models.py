@@ -1,5 +1,24 @@
 from django.db import models
+from django.db.models import F
 from django.conf import settings
+from apps.core import response_cache, versioning
+from apps.core.upsert import increment_or_create
+from apps.votes import scoring
+from django.utils import timezone
+from . import feed_index, search
+from .ranking import hot_rank
+
+
+EXCERPT_LENGTH = 280
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    """Collapse whitespace and cut ``content`` at a word boundary."""
+    text = ' '.join(content.split())
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(' ', 1)[0] or text[:length]
+    return cut + '\u2026'
 
 
 class Post(models.Model):
@@ -13,6 +32,8 @@ class Post(models.Model):
     
     title = models.CharField(max_length=300)
     content = models.TextField(blank=True)
+    # Short plain preview of content, returned by list views instead of content
+    excerpt = models.CharField(max_length=300, blank=True, editable=False)
     url = models.URLField(blank=True)
     image = models.ImageField(upload_to='posts/', null=True, blank=True)
     post_type = models.CharField(max_length=10, choices=POST_TYPE_CHOICES, default='text')
@@ -30,6 +51,13 @@ class Post(models.Model):
     
     vote_score = models.IntegerField(default=0, db_index=True)
     comment_count = models.IntegerField(default=0)
+    # Stored "hot" rank so hot feeds are an index range scan, not a sort
+    hot_rank = models.FloatField(default=0, editable=False)
+    # Vote counters kept by the vote views, and the scores derived from them
+    ups = models.PositiveIntegerField(default=0, editable=False)
+    downs = models.PositiveIntegerField(default=0, editable=False)
+    wilson_lower_bound = models.FloatField(default=0, editable=False)
+    controversy = models.FloatField(default=0, editable=False)
     
     is_pinned = models.BooleanField(default=False)
     is_locked = models.BooleanField(default=False)
@@ -41,20 +69,83 @@ class Post(models.Model):
     
     class Meta:
         ordering = ['-is_pinned', '-created_at']
+        # One global and one per-community index for each feed ordering,
+        # each ending in -id so keyset pagination is an index range scan
         indexes = [
-            models.Index(fields=['community', '-created_at']),
-            models.Index(fields=['-vote_score', '-created_at']),
+            models.Index(fields=['community', '-created_at', '-id']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['community', '-vote_score', '-id']),
+            models.Index(fields=['-vote_score', '-id']),
+            models.Index(fields=['community', '-hot_rank', '-id']),
+            models.Index(fields=['-hot_rank', '-id']),
+            models.Index(fields=['community', '-comment_count', '-id']),
+            models.Index(fields=['-comment_count', '-id']),
+            models.Index(fields=['author', '-created_at', '-id']),
         ]
     
+    # Stored columns derived from vote_score/ups/downs by set_vote_ranks()
+    VOTE_RANK_FIELDS = ['hot_rank', 'wilson_lower_bound', 'controversy']
+    
     def __str__(self):
         return self.title
     
-    def update_comment_count(self):
-        """Update the comment count."""
-        from django.db.models import F
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        self.hot_rank = hot_rank(self.vote_score, self.created_at or timezone.now())
+        self.wilson_lower_bound = scoring.wilson_lower_bound(self.ups, self.downs)
+        self.controversy = scoring.controversy(self.ups, self.downs)
+        self.excerpt = make_excerpt(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            if 'vote_score' in update_fields:
+                update_fields = {*update_fields, 'hot_rank'}
+            if {'ups', 'downs'} & set(update_fields):
+                update_fields = {*update_fields, 'wilson_lower_bound', 'controversy'}
+            if 'content' in update_fields:
+                update_fields = {*update_fields, 'excerpt'}
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        if update_fields is None or {'title', 'content'} & set(update_fields):
+            search.index_post(self)
+        if is_new:
+            feed_index.add_post(self)
+        else:
+            versioning.bump(versioning.post_key(self.pk))
+        response_cache.invalidate(*response_cache.feed_scopes(self.community.slug))
+    
+    def set_vote_ranks(self):
+        """Recompute hot rank, Wilson bound and controversy from the vote counters."""
+        self.hot_rank = hot_rank(self.vote_score, self.created_at)
+        self.wilson_lower_bound = scoring.wilson_lower_bound(self.ups, self.downs)
+        self.controversy = scoring.controversy(self.ups, self.downs)
+    
+    def update_vote_ranks(self):
+        """Recompute and store the vote-derived ranks (see VOTE_RANK_FIELDS)."""
+        self.set_vote_ranks()
         Post.objects.filter(pk=self.pk).update(
-            comment_count=self.comments.count()
+            **{field: getattr(self, field) for field in self.VOTE_RANK_FIELDS}
         )
+    
+    def adjust_comment_count(self, delta):
+        """
+        Add ``delta`` to the stored count of live comments with an atomic
+        F() update (no COUNT over the post's comments) and refresh the
+        feed index, version stamp and cached feed pages.
+        """
+        Post.objects.filter(pk=self.pk).update(comment_count=F('comment_count') + delta)
+        self.comment_count = Post.objects.filter(pk=self.pk).values_list('comment_count', flat=True).get()
+        self.comment_count_changed()
+    
+    def update_comment_count(self):
+        """Recount live comments from scratch (repair path; writes use adjust_comment_count)."""
+        self.comment_count = self.comments.filter(is_deleted=False).count()
+        Post.objects.filter(pk=self.pk).update(comment_count=self.comment_count)
+        self.comment_count_changed()
+    
+    def comment_count_changed(self):
+        feed_index.update_post(self, ['comment_count'])
+        versioning.bump(versioning.post_key(self.pk))
+        response_cache.invalidate(*response_cache.feed_scopes(self.community.slug))
 
 
 class PostVote(models.Model):
@@ -95,3 +186,44 @@ class PostVote(models.Model):
     # NOTE: We do NOT override save/delete to update vote_score here
     # Vote score updates are handled atomically in the view layer using F() expressions
     # This prevents race conditions when multiple users vote simultaneously
+
+
+class PostVoteRollup(models.Model):
+    """
+    Net vote-score change per post per time bucket.
+    
+    Written by vote_post as hourly buckets; compact_vote_rollups later folds
+    hourly rows older than a couple of days into daily rows. Windowed "top"
+    sorts (t=hour|day|week|month|year) sum these rows instead of scanning
+    the PostVote table.
+    """
+    
+    SPAN_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='vote_rollups'
+    )
+    bucket = models.DateTimeField(help_text="Start of the hour or day this row covers")
+    span = models.CharField(max_length=4, choices=SPAN_CHOICES, default='hour')
+    delta = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['post', 'bucket', 'span']
+        indexes = [
+            # Window queries are a range scan on bucket grouped by post
+            models.Index(fields=['bucket', 'post']),
+        ]
+    
+    def __str__(self):
+        return f"{self.post_id} {self.delta:+d} ({self.span} of {self.bucket:%Y-%m-%d %H:00})"
+    
+    @classmethod
+    def record(cls, post_id, delta, when=None):
+        """Add ``delta`` to the post's bucket for the current hour."""
+        bucket = (when or timezone.now()).replace(minute=0, second=0, microsecond=0)
+        increment_or_create(cls, {'post_id': post_id, 'bucket': bucket, 'span': 'hour'}, delta=delta)
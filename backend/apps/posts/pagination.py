@@ -0,0 +1,136 @@
+from django.db.models import FloatField
+from rest_framework.exceptions import NotFound
+
+from apps.core.pagination import KeysetPagination, parse_ordering
+from . import feed_index, home_feed, search
+
+
+class FeedIndexPagination(KeysetPagination):
+    """
+    Keyset pagination that serves pages from the cached feed index.
+
+    The view opts in per request through ``get_feed_index_scope()``, which
+    returns ``(scope, sort)`` or ``None`` when the request is filtered in a
+    way the index does not cover. Page ids come from the index and are
+    hydrated with one ``pk__in`` query; anything the index cannot answer
+    exactly (backwards cursors, pages past a truncated index, stale ids)
+    falls through to the regular keyset query. Cursors are identical in
+    both paths, so a client can move between them freely.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        scope = view.get_feed_index_scope() if view is not None else None
+        if scope is not None:
+            page = self.paginate_from_index(queryset, request, *scope)
+            if page is not None:
+                return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_from_index(self, queryset, request, scope, sort):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = parse_ordering(self.get_ordering(queryset))
+        position, reverse = self.decode_cursor(request, queryset)
+        if reverse:
+            return None
+
+        try:
+            ids = feed_index.get_page(scope, sort, position, self.page_size)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if ids is None:
+            return None
+        posts = queryset.order_by().in_bulk(ids)
+        if len(posts) != len(ids):
+            # Index holds posts deleted behind its back (e.g. cascades)
+            feed_index.invalidate(scope, sort)
+            return None
+
+        self.reverse = False
+        self.has_cursor = position is not None
+        self.has_more = len(ids) > self.page_size
+        self.page = [posts[post_id] for post_id in ids[:self.page_size]]
+        return self.page
+
+
+class HomeFeedPagination(KeysetPagination):
+    """
+    Forward-only keyset pagination for the merged home feed.
+
+    Pages are produced by ``home_feed.merge_home_feed`` over the caller's
+    joined communities and hydrated with one ``pk__in`` query. The cursor
+    is the usual ``[created_at, id]`` keyset position.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = parse_ordering(home_feed.HOME_ORDERING)
+        position, _ = self.decode_cursor(request, queryset)
+
+        community_ids = view.get_community_ids()
+        ids = home_feed.merge_home_feed(
+            queryset.order_by(), community_ids, position, self.page_size + 1
+        )
+        posts = queryset.order_by().in_bulk(ids[:self.page_size])
+
+        self.reverse = False
+        self.has_cursor = position is not None
+        self.has_more = len(ids) > self.page_size
+        self.page = [posts[post_id] for post_id in ids[:self.page_size] if post_id in posts]
+        return self.page
+
+    def get_previous_link(self):
+        return None
+
+
+class SearchPagination(KeysetPagination):
+    """
+    Keyset pagination over ranked full-text search results.
+
+    Pages are ordered by ``(search_rank, id)`` descending; the search
+    backend applies the cursor inside the ranked query and the page is
+    hydrated with one ``pk__in`` query.
+    """
+
+    ordering_fields = ('-search_rank', '-id')
+
+    def get_output_field(self, queryset, name):
+        # The rank is computed by the search backend, not annotated here
+        if name == 'search_rank':
+            return FloatField()
+        return super().get_output_field(queryset, name)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = parse_ordering(self.ordering_fields)
+        position, _ = self.decode_cursor(request, queryset)
+
+        query = request.query_params.get('q', '').strip()
+        hits = []
+        if query:
+            hits = search.search_posts(
+                query,
+                community_slug=request.query_params.get('community'),
+                position=position,
+                limit=self.page_size + 1,
+            )
+        posts = queryset.order_by().in_bulk([post_id for _, post_id in hits])
+
+        self.reverse = False
+        self.has_cursor = position is not None
+        self.has_more = len(hits) > self.page_size
+        self.page = []
+        for score, post_id in hits[:self.page_size]:
+            if post_id in posts:
+                post = posts[post_id]
+                post.search_rank = score
+                self.page.append(post)
+        return self.page
+
+    def get_previous_link(self):
+        return None
@@ -0,0 +1,82 @@
+"""
+Ranking helpers for post feeds.
+
+The "hot" rank is the classic log-scaled score plus a linear age term.
+Because the age term grows with creation time instead of shrinking with
+the current time, a post's rank only changes when its score changes, so
+it can be stored on the row and served straight from an index.
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from math import log10
+
+# Reference epoch for the age term (2005-12-08 07:46:43 UTC)
+HOT_RANK_EPOCH = 1134028003
+
+# Seconds of age that are worth one order of magnitude of score (12.5 hours)
+HOT_RANK_DECAY_SECONDS = 45000
+
+
+def hot_rank(score, created_at):
+    """Return the hot rank for a post with the given score and creation time."""
+    order = log10(max(abs(score), 1))
+    if score > 0:
+        sign = 1
+    elif score < 0:
+        sign = -1
+    else:
+        sign = 0
+    seconds = created_at.timestamp() - HOT_RANK_EPOCH
+    return round(sign * order + seconds / HOT_RANK_DECAY_SECONDS, 7)
+
+
+
+def hot_rank_sql(score, created_at):
+    """``hot_rank()`` as a PostgreSQL expression over ``score``/``created_at`` SQL."""
+    return (
+        f'ROUND((SIGN({score})::float8 * LOG(GREATEST(ABS({score}), 1)::float8)'
+        f' + (EXTRACT(EPOCH FROM {created_at}) - {HOT_RANK_EPOCH}) / {HOT_RANK_DECAY_SECONDS})::numeric, 7)::float8'
+    )
+
+
+# Feed sort modes and their orderings. Every ordering ends in the primary
+# key as a unique tie-breaker so keyset pagination is stable, and each one
+# is backed by a matching composite index on Post (global and per community).
+FEED_ORDERINGS = {
+    'new': ('-created_at', '-id'),
+    'top': ('-vote_score', '-id'),
+    'hot': ('-hot_rank', '-id'),
+    'comment_count': ('-comment_count', '-id'),
+}
+
+
+# Time windows for sort=top&t=<window>, served from PostVoteRollup.
+# t=all uses the stored vote_score.
+TOP_WINDOWS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(days=7),
+    'month': timedelta(days=30),
+    'year': timedelta(days=365),
+}
+
+
+def top_window_filter(window, now=None):
+    """
+    Return the ``vote_rollups`` filter for sort=top&t=``window``.
+
+    Hourly rollups are counted from the hour containing the window's start.
+    Rows compact_vote_rollups folded into days start at midnight, so they
+    are counted from the day containing the window's start: that first
+    partial day is included in full instead of being dropped, making a
+    week window cover up to 8 days of compacted history rather than 6.
+    """
+    since = (now or timezone.now()) - TOP_WINDOWS[window]
+    hour_start = since.replace(minute=0, second=0, microsecond=0)
+    day_start = hour_start.replace(hour=0)
+    return (
+        Q(vote_rollups__span='hour', vote_rollups__bucket__gte=hour_start)
+        | Q(vote_rollups__span='day', vote_rollups__bucket__gte=day_start)
+    )
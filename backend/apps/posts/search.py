@@ -0,0 +1,148 @@
+"""
+Full-text search over posts.
+
+``SearchFilter`` turned every search into ``ILIKE '%term%'`` over the
+whole ``Post`` table, which no index can serve. Search now goes through a
+real text index chosen by database vendor:
+
+- PostgreSQL: a ``search_vector`` tsvector column on ``posts_post`` (title
+  weighted above content) with a GIN index, ranked with ``ts_rank``.
+- SQLite (development): an FTS5 shadow table ``posts_post_fts`` keyed by
+  post id, ranked with ``bm25``.
+
+Both are created by migration 0005 outside the Django model state, and are
+kept in sync from ``Post.save`` and apps.posts.signals. Results come back as
+``(score, post_id)`` pairs in descending ``(score, id)`` order, starting
+after an optional keyset position, so ranked results paginate like feeds.
+"""
+import re
+
+from django.db import connection
+
+FTS_TABLE = 'posts_post_fts'
+
+# Relative weight of a title match over a content match
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+
+def _keyset_clause(position):
+    if position is None:
+        return '', []
+    score, post_id = position
+    return 'WHERE score < %s OR (score = %s AND id < %s)', [score, score, post_id]
+
+
+class PostgresSearchBackend:
+    """tsvector column + GIN index, ranked by ts_rank."""
+
+    config = 'english'
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE posts_post SET search_vector = "
+                "setweight(to_tsvector(%s, coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector(%s, coalesce(content, '')), 'B') "
+                "WHERE id = %s",
+                [self.config, self.config, post.pk],
+            )
+
+    def remove_post(self, post_id):
+        # The vector lives on the post row and goes away with it
+        pass
+
+    def search(self, query, community_slug=None, position=None, limit=20):
+        community_sql = ''
+        params = [self.config, query]
+        if community_slug:
+            community_sql = (
+                'AND p.community_id = '
+                '(SELECT id FROM communities_community WHERE slug = %s)'
+            )
+            params.append(community_slug)
+        keyset_sql, keyset_params = _keyset_clause(position)
+        # Cast the float4 rank to float8 so cursor values round-trip exactly
+        sql = (
+            'SELECT score, id FROM ('
+            ' SELECT ts_rank(p.search_vector, q)::float8 AS score, p.id AS id'
+            ' FROM posts_post p, websearch_to_tsquery(%s, %s) q'
+            f' WHERE p.search_vector @@ q {community_sql}'
+            f') ranked {keyset_sql} '
+            'ORDER BY score DESC, id DESC LIMIT %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + keyset_params + [limit])
+            return cursor.fetchall()
+
+
+class SQLiteSearchBackend:
+    """FTS5 shadow table, ranked by bm25."""
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)',
+                [post.pk, post.title, post.content],
+            )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+    def match_expression(self, query):
+        # Quote every term so user input cannot inject FTS5 query syntax
+        terms = re.findall(r'\w+', query)
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def search(self, query, community_slug=None, position=None, limit=20):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        community_sql = ''
+        params = [TITLE_WEIGHT, CONTENT_WEIGHT, expression]
+        if community_slug:
+            community_sql = (
+                'AND p.community_id = '
+                '(SELECT id FROM communities_community WHERE slug = %s)'
+            )
+            params.append(community_slug)
+        keyset_sql, keyset_params = _keyset_clause(position)
+        # bm25 is "lower is better"; negate it so every backend ranks descending
+        sql = (
+            'SELECT score, id FROM ('
+            f' SELECT -bm25({FTS_TABLE}, %s, %s) AS score, p.id AS id'
+            f' FROM {FTS_TABLE} JOIN posts_post p ON p.id = {FTS_TABLE}.rowid'
+            f' WHERE {FTS_TABLE} MATCH %s {community_sql}'
+            f') ranked {keyset_sql} '
+            'ORDER BY score DESC, id DESC LIMIT %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + keyset_params + [limit])
+            return cursor.fetchall()
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend():
+    return BACKENDS[connection.vendor]()
+
+
+def index_post(post):
+    """Add or refresh ``post`` in the search index."""
+    get_search_backend().index_post(post)
+
+
+def remove_post(post_id):
+    """Drop a deleted post from the search index."""
+    get_search_backend().remove_post(post_id)
+
+
+def search_posts(query, community_slug=None, position=None, limit=20):
+    """Return ``(score, post_id)`` pairs for ``query``, best match first."""
+    return get_search_backend().search(query, community_slug, position, limit)
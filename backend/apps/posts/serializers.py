@@ -1,21 +1,28 @@
 from rest_framework import serializers
+from apps.core.serializers import SparseFieldsetsMixin
+from apps.votes.maps import UserVoteMixin, VoteMapListSerializer
 from .models import Post, PostVote
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsetsMixin, UserVoteMixin, serializers.ModelSerializer):
     """Full post serializer with author and community details."""
     
+    vote_model = PostVote
+    vote_target = 'post'
+    
     author = serializers.StringRelatedField(read_only=True)
     community_name = serializers.CharField(source='community.name', read_only=True)
     community_slug = serializers.CharField(source='community.slug', read_only=True)
     user_vote = serializers.SerializerMethodField()
     
+    sparse_only = {'author': ['author__username']}
+    
     class Meta:
         model = Post
         fields = [
             'id', 'title', 'content', 'url', 'image', 'post_type',
             'author', 'community', 'community_name', 'community_slug',
-            'vote_score', 'comment_count', 'user_vote',
+            'vote_score', 'ups', 'downs', 'comment_count', 'user_vote',
             'is_pinned', 'is_locked', 'is_nsfw', 'is_spoiler',
             'created_at', 'updated_at'
         ]
@@ -23,14 +30,7 @@ class PostSerializer(serializers.ModelSerializer):
             'id', 'author', 'vote_score', 'comment_count',
             'created_at', 'updated_at'
         ]
-    
-    def get_user_vote(self, obj):
-        """Get the current user's vote on this post."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            vote = obj.votes.filter(user=request.user).first()
-            return vote.vote_type if vote else None
-        return None
+        list_serializer_class = VoteMapListSerializer
 
 
 class PostCreateSerializer(serializers.ModelSerializer):
@@ -56,8 +56,12 @@ class PostCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PostListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for post lists."""
+class PostListSerializer(SparseFieldsetsMixin, UserVoteMixin, serializers.ModelSerializer):
+    """Lightweight serializer for post lists (excerpt instead of full content)."""
+    
+    vote_model = PostVote
+    vote_target = 'post'
+    sparse_only = {'author': ['author__username']}
     
     author = serializers.StringRelatedField(read_only=True)
     community_name = serializers.CharField(source='community.name', read_only=True)
@@ -67,18 +71,12 @@ class PostListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = [
-            'id', 'title', 'content', 'url', 'image', 'post_type',
+            'id', 'title', 'excerpt', 'url', 'image', 'post_type',
             'author', 'community_name', 'community_slug',
-            'vote_score', 'comment_count', 'user_vote',
+            'vote_score', 'ups', 'downs', 'comment_count', 'user_vote',
             'is_pinned', 'is_nsfw', 'is_spoiler', 'created_at'
         ]
-    
-    def get_user_vote(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            vote = obj.votes.filter(user=request.user).first()
-            return vote.vote_type if vote else None
-        return None
+        list_serializer_class = VoteMapListSerializer
 
 
 class VoteSerializer(serializers.Serializer):
@@ -0,0 +1,32 @@
+"""
+Bookkeeping for deleted posts.
+
+Posts also go away in cascades (a deleted user or community) that never
+call ``Post.delete()``, so the feed index, search index, cached pages and
+version stamps are updated from ``pre_delete``, which the deletion
+collector sends for every post it removes.
+"""
+from django.db import transaction
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from apps.core import response_cache, versioning
+from . import feed_index, search
+from .models import Post
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    post_id = instance.pk
+    feed_index.remove_post(instance)
+    search.remove_post(post_id)
+    # Its comments cascade without CommentQuerySet.delete, so the thread's
+    # cached pages are dropped here
+    response_cache.invalidate(
+        *response_cache.feed_scopes(instance.community.slug), response_cache.thread_scope(post_id)
+    )
+    # Conditional GETs answer from the stamps alone, so move them on or
+    # old ETags would keep getting 304 for a post that is gone
+    transaction.on_commit(
+        lambda: versioning.bump(versioning.post_key(post_id), versioning.thread_key(post_id))
+    )
@@ -0,0 +1,491 @@
+import base64
+import importlib
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.communities.models import Community, CommunityMembership
+from apps.core.serializers import get_only_fields
+from apps.users.models import User
+from . import feed_index, home_feed, search
+from .models import EXCERPT_LENGTH, Post, PostVote, PostVoteRollup, make_excerpt
+from .ranking import TOP_WINDOWS, hot_rank, top_window_filter
+from .serializers import PostListSerializer
+
+
+def make_cursor(position):
+    data = json.dumps({'p': position}).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+class FeedCursorTests(APITestCase):
+    """Edited or malformed cursors are rejected with 404, never a 500."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        for i in range(3):
+            Post.objects.create(title=f'Post {i}', author=self.user, community=self.community)
+
+    def test_valid_cursor_pages_forward(self):
+        response = self.client.get('/api/posts/user/alice/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_wrongly_typed_cursor_values(self):
+        cursor = make_cursor(['a', 1])
+        for url, params in [
+            ('/api/posts/user/alice/', {}),
+            ('/api/posts/', {'sort': 'top', 't': 'day'}),
+            ('/api/posts/', {'author': 'alice', 'sort': 'top'}),
+        ]:
+            response = self.client.get(url, {**params, 'cursor': cursor})
+            self.assertEqual(response.status_code, 404, (url, params))
+
+    def test_null_and_nested_cursor_values(self):
+        for position in ([None, None], [[1], {'a': 1}], [True, 1]):
+            response = self.client.get('/api/posts/user/alice/', {'cursor': make_cursor(position)})
+            self.assertEqual(response.status_code, 404, position)
+
+    def test_malformed_cursor(self):
+        for cursor in ('garbage', make_cursor([1]), make_cursor('x')):
+            response = self.client.get('/api/posts/user/alice/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class FeedIndexTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='All', slug='all', creator=self.user)
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', author=self.user, community=self.community)
+            for i in range(3)
+        ]
+
+    def test_community_named_all_does_not_share_the_global_index(self):
+        self.client.get('/api/posts/', {'sort': 'top'})
+        self.assertIsNotNone(cache.get(feed_index.index_key(feed_index.GLOBAL_SCOPE, 'top')))
+        other = Community.objects.create(name='Other', slug='other', creator=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Elsewhere', author=self.user, community=other)
+
+        response = self.client.get('/api/posts/', {'sort': 'top', 'community': 'all'})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(cache.get(feed_index.index_key(feed_index.GLOBAL_SCOPE, 'top')))
+        response = self.client.get('/api/posts/', {'sort': 'top'})
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_late_callback_does_not_restore_a_stale_score(self):
+        feed_index.build_index(feed_index.GLOBAL_SCOPE, 'top')
+        post = self.posts[0]
+        stale = Post.objects.get(pk=post.pk)
+        Post.objects.filter(pk=post.pk).update(vote_score=5)
+        # The callback of an older vote runs after the newer one committed
+        with self.captureOnCommitCallbacks(execute=True):
+            feed_index.update_post(stale, ['top'])
+        entries = feed_index.get_index(feed_index.GLOBAL_SCOPE, 'top')['entries']
+        self.assertEqual(entries[0], [5, post.pk])
+
+    def test_index_cursor_with_wrong_types(self):
+        for position in (['a', 1], [None, None], [1, 'x']):
+            response = self.client.get('/api/posts/', {'sort': 'top', 'cursor': make_cursor(position)})
+            self.assertEqual(response.status_code, 404, position)
+            with self.assertRaises(ValueError):
+                feed_index.get_page(feed_index.GLOBAL_SCOPE, 'top', position, 20)
+
+
+class TopWindowTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        self.post = Post.objects.create(title='Old news', author=self.user, community=self.community)
+
+    def test_week_includes_the_compacted_day_containing_its_start(self):
+        now = timezone.now()
+        since = now - TOP_WINDOWS['week']
+        day = since.replace(hour=0, minute=0, second=0, microsecond=0)
+        PostVoteRollup.objects.create(post=self.post, bucket=day, span='day', delta=3)
+        # Daily rows older than the window's first day stay out
+        PostVoteRollup.objects.create(post=self.post, bucket=day - timedelta(days=1), span='day', delta=100)
+
+        response = self.client.get('/api/posts/', {'sort': 'top', 't': 'week'})
+        self.assertEqual([post['id'] for post in response.data['results']], [self.post.pk])
+        self.assertEqual(
+            Post.objects.filter(top_window_filter('week', now)).aggregate(total=Sum('vote_rollups__delta'))['total'],
+            3,
+        )
+
+    def test_hour_window_counts_hourly_rows_only_inside_it(self):
+        now = timezone.now()
+        PostVoteRollup.record(self.post.pk, 2, when=now)
+        PostVoteRollup.record(self.post.pk, 7, when=now - timedelta(hours=3))
+        total = Post.objects.filter(top_window_filter('hour', now)).aggregate(
+            total=Sum('vote_rollups__delta')
+        )['total']
+        self.assertEqual(total, 2)
+
+    def test_compaction_folds_old_hours_into_daily_rows(self):
+        day = (timezone.now() - timedelta(days=5)).replace(hour=0, minute=0, second=0, microsecond=0)
+        PostVoteRollup.record(self.post.pk, 2, when=day + timedelta(hours=3))
+        PostVoteRollup.record(self.post.pk, 3, when=day + timedelta(hours=7))
+        PostVoteRollup.objects.create(post=self.post, bucket=day, span='day', delta=1)
+        PostVoteRollup.record(self.post.pk, 4)
+
+        call_command('compact_vote_rollups', stdout=StringIO())
+
+        self.assertEqual(PostVoteRollup.objects.get(span='day').delta, 6)
+        self.assertEqual(PostVoteRollup.objects.get(span='hour').delta, 4)
+        self.assertEqual(
+            Post.objects.filter(top_window_filter('month')).aggregate(total=Sum('vote_rollups__delta'))['total'],
+            10,
+        )
+
+
+class DeletedPostRevalidationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        self.post = Post.objects.create(title='Hello', author=self.user, community=self.community)
+
+    def test_stale_etag_revalidates_to_404(self):
+        url = f'/api/posts/{self.post.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(url).status_code, 204)
+        self.client.force_authenticate(None)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_stale_thread_etag_revalidates_to_404(self):
+        url = f'/api/comments/post/{self.post.pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_cached_thread_is_dropped_with_the_post(self):
+        from apps.comments.models import Comment
+
+        Comment.objects.create(content='First', author=self.user, post=self.post)
+        url = f'/api/comments/post/{self.post.pk}/'
+        self.assertEqual(len(self.client.get(url).data['results']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_posts_removed_with_their_author_leave_the_feed(self):
+        feed_index.build_index(feed_index.GLOBAL_SCOPE, 'new')
+        url = f'/api/posts/{self.post.pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        entries = feed_index.get_index(feed_index.GLOBAL_SCOPE, 'new')['entries']
+        self.assertNotIn(self.post.pk, [post_id for key, post_id in entries])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+
+class PostSearchTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.user)
+
+    def post(self, title, content=''):
+        return Post.objects.create(title=title, content=content, author=self.user, community=self.community)
+
+    def hits(self, query):
+        return [post_id for _, post_id in search.search_posts(query)]
+
+    def test_index_follows_create_edit_and_delete(self):
+        post = self.post('Generators explained', 'Lazy iteration in Python')
+        self.assertEqual(self.hits('generators'), [post.pk])
+        self.assertEqual(self.hits('lazy'), [post.pk])
+
+        post.title = 'Coroutines explained'
+        post.save()
+        self.assertEqual(self.hits('generators'), [])
+        self.assertEqual(self.hits('coroutines'), [post.pk])
+
+        post.delete()
+        self.assertEqual(self.hits('coroutines'), [])
+
+    def test_ranked_keyset_paging(self):
+        best = self.post('Django Django', 'Django tips')
+        title = self.post('Django tips')
+        body = self.post('Tips', 'Some words on django')
+        self.post('Unrelated', 'Nothing to see')
+        expected = self.hits('django')
+        self.assertEqual(expected[0], best.pk)
+        self.assertEqual(set(expected), {best.pk, title.pk, body.pk})
+
+        response = self.client.get('/api/posts/search/', {'q': 'django', 'page_size': 2})
+        seen = [post['id'] for post in response.data['results']]
+        self.assertEqual(len(seen), 2)
+        response = self.client.get(response.data['next'])
+        seen += [post['id'] for post in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(seen, expected)
+
+    def test_feed_rejects_removed_filter_params(self):
+        self.post('Django tips')
+        for params in ({'search': 'django'}, {'ordering': '-created_at'}):
+            response = self.client.get('/api/posts/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.data)
+
+
+class HotRankTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        now = timezone.now()
+        self.old, self.new = [
+            Post.objects.create(title=title, author=self.user, community=self.community)
+            for title in ('Old', 'New')
+        ]
+        Post.objects.filter(pk=self.old.pk).update(created_at=now - timedelta(hours=1))
+
+    def hot_feed(self):
+        # Parsed from the body: repeated anonymous pages come from the response cache
+        return [post['id'] for post in self.client.get('/api/posts/', {'sort': 'hot'}).json()['results']]
+
+    def test_votes_store_the_hot_rank(self):
+        voter = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        self.client.force_authenticate(voter)
+        self.client.post(f'/api/posts/{self.new.pk}/vote/', {'vote_type': 'up'}, format='json')
+        self.new.refresh_from_db()
+        self.assertEqual(self.new.hot_rank, hot_rank(1, self.new.created_at))
+
+    def test_rerank_repairs_ranks_and_the_cached_hot_feed(self):
+        self.assertEqual(self.hot_feed(), [self.new.pk, self.old.pk])
+        # A score written without its rank: ten upvotes outweigh an hour of age
+        Post.objects.filter(pk=self.old.pk).update(vote_score=10)
+        self.assertEqual(self.hot_feed(), [self.new.pk, self.old.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rerank_hot_posts', stdout=StringIO())
+
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.hot_rank, hot_rank(10, self.old.created_at))
+        self.assertEqual(self.hot_feed(), [self.old.pk, self.new.pk])
+
+
+class VoteMapQueryTests(APITestCase):
+    """The caller's votes are loaded once per page, not once per post."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', author=self.user, community=self.community)
+            for i in range(6)
+        ]
+        for i, post in enumerate(self.posts):
+            PostVote.objects.create(user=self.user, post=post, vote_type='up' if i % 2 else 'down')
+        # A real token: credentialed requests bypass the anonymous response cache
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def feed_page(self, page_size):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/posts/', {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        vote_queries = [q for q in queries if PostVote._meta.db_table in q['sql']]
+        return response.data['results'], len(queries), len(vote_queries)
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        self.feed_page(1)  # builds the feed index
+        small, small_count, small_votes = self.feed_page(2)
+        large, large_count, large_votes = self.feed_page(6)
+        self.assertEqual((len(small), len(large)), (2, 6))
+        self.assertEqual(small_votes, 1)
+        self.assertEqual(large_votes, 1)
+        self.assertEqual(small_count, large_count)
+
+    def test_page_reports_each_vote(self):
+        results, _, _ = self.feed_page(6)
+        expected = {post.pk: 'up' if i % 2 else 'down' for i, post in enumerate(self.posts)}
+        self.assertEqual({post['id']: post['user_vote'] for post in results}, expected)
+        PostVote.objects.filter(post=self.posts[0]).delete()
+        results, _, _ = self.feed_page(6)
+        self.assertIsNone(next(p['user_vote'] for p in results if p['id'] == self.posts[0].pk))
+
+
+class HomeFeedTests(APITestCase):
+    """The merged home feed matches a plain ``community__in`` scan."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.joined = [
+            Community.objects.create(name=name, slug=name.lower(), creator=self.user)
+            for name in ('Python', 'Django', 'Rust')
+        ]
+        self.other = Community.objects.create(name='Go', slug='go', creator=self.user)
+        for community in self.joined:
+            CommunityMembership.objects.create(user=self.user, community=community)
+
+        now = timezone.now()
+        # Skewed streams: most posts in one community, shared timestamps across them
+        layout = [0] * 6 + [1, 2, 1, 0, 2, 3, 3]
+        for i, index in enumerate(layout):
+            community = (self.joined + [self.other])[index]
+            post = Post.objects.create(title=f'Post {i}', author=self.user, community=community)
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(minutes=i // 2))
+        self.client.force_authenticate(self.user)
+
+    def expected(self):
+        return list(Post.objects.filter(community__in=self.joined).order_by(
+            *home_feed.HOME_ORDERING
+        ).values_list('id', flat=True))
+
+    def test_pages_follow_feed_order_across_communities(self):
+        seen = []
+        response = self.client.get('/api/posts/home/', {'page_size': 3})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen.extend(post['id'] for post in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, self.expected())
+
+    def test_merge_matches_the_scan_for_any_page_size(self):
+        expected = self.expected()
+        for count in (1, 2, 5, len(expected) + 1):
+            ids = home_feed.merge_home_feed(
+                Post.objects.all(), [c.pk for c in self.joined], None, count
+            )
+            self.assertEqual(ids, expected[:count], count)
+
+    def test_merge_resumes_after_a_cursor(self):
+        expected = self.expected()
+        cursor_post = Post.objects.get(pk=expected[4])
+        ids = home_feed.merge_home_feed(
+            Post.objects.all(), [c.pk for c in self.joined],
+            [cursor_post.created_at, cursor_post.pk], 20
+        )
+        self.assertEqual(ids, expected[5:])
+
+    def test_no_joined_communities(self):
+        CommunityMembership.objects.filter(user=self.user).delete()
+        response = self.client.get('/api/posts/home/')
+        self.assertEqual(response.data['results'], [])
+
+
+class SparseFieldsetTests(APITestCase):
+    """``?fields=``/``?omit=`` trim both the response and the selected columns."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.user)
+        self.post = Post.objects.create(
+            title='Hello', content='word ' * 100, author=self.user, community=self.community
+        )
+
+    def get_posts(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/posts/user/alice/', params)
+        self.assertEqual(response.status_code, 200)
+        post_sql = next(
+            q['sql'] for q in queries
+            if q['sql'].startswith(f'SELECT "{Post._meta.db_table}"."id"')
+        )
+        return response.data['results'][0], post_sql
+
+    def test_fields_selects_only_the_requested_columns(self):
+        post, sql = self.get_posts(fields='id,title,author')
+        self.assertEqual(set(post), {'id', 'title', 'author'})
+        self.assertEqual(post['author'], 'alice')
+        self.assertNotIn('"content"', sql)
+        self.assertNotIn('"excerpt"', sql)
+        self.assertNotIn('"users_user"."email"', sql)
+        self.assertNotIn('communities_community', sql)
+
+    def test_omit_drops_fields_and_unknown_names_are_ignored(self):
+        post, sql = self.get_posts(omit='excerpt,community_name,bogus')
+        self.assertNotIn('excerpt', post)
+        self.assertNotIn('community_name', post)
+        self.assertIn('community_slug', post)
+        self.assertNotIn('"excerpt"', sql)
+        post, _ = self.get_posts(fields='id,bogus')
+        self.assertEqual(set(post), {'id'})
+
+    def test_list_reads_the_excerpt_not_the_content(self):
+        post, sql = self.get_posts()
+        self.assertNotIn('content', post)
+        self.assertNotIn('"posts_post"."content"', sql)
+        self.assertEqual(post['excerpt'], make_excerpt(self.post.content))
+
+    def test_only_columns_follow_serializer_sources(self):
+        serializer = PostListSerializer()
+        self.assertEqual(get_only_fields(serializer, Post), {
+            'id', 'title', 'excerpt', 'url', 'image', 'post_type', 'author__username',
+            'community__name', 'community__slug', 'vote_score', 'ups', 'downs',
+            'comment_count', 'is_pinned', 'is_nsfw', 'is_spoiler', 'created_at',
+        })
+
+    def test_writes_ignore_the_fieldset(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(
+            f'/api/posts/{self.post.pk}/?fields=id', {'title': 'Renamed'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Renamed')
+
+
+class ExcerptTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.user)
+
+    def test_make_excerpt_cuts_at_a_word_boundary(self):
+        self.assertEqual(make_excerpt('  short \n text '), 'short text')
+        excerpt = make_excerpt('word ' * 100)
+        self.assertLessEqual(len(excerpt), EXCERPT_LENGTH + 1)
+        self.assertTrue(excerpt.endswith('word\u2026'))
+        self.assertEqual(make_excerpt('x' * 400), 'x' * EXCERPT_LENGTH + '\u2026')
+
+    def test_excerpt_follows_content_updates(self):
+        post = Post.objects.create(title='Hello', content='first', author=self.user, community=self.community)
+        self.assertEqual(post.excerpt, 'first')
+        post.content = 'second'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'second')
+
+    def test_migration_backfills_existing_posts(self):
+        post = Post.objects.create(title='Hello', content='old  body', author=self.user, community=self.community)
+        Post.objects.filter(pk=post.pk).update(excerpt='')
+        migration = importlib.import_module('apps.posts.migrations.0007_post_excerpt')
+        migration.backfill_excerpt(django_apps, None)
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'old body')
@@ -5,6 +5,8 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.PostListCreateView.as_view(), name='post-list'),
+    path('home/', views.HomeFeedView.as_view(), name='home-feed'),
+    path('search/', views.PostSearchView.as_view(), name='post-search'),
     path('<int:pk>/', views.PostDetailView.as_view(), name='post-detail'),
     path('<int:pk>/vote/', views.vote_post, name='vote-post'),
     path('user/<str:username>/', views.UserPostsView.as_view(), name='user-posts'),
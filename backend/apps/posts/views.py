@@ -1,9 +1,17 @@
-from rest_framework import generics, permissions, status, filters
+from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.db import transaction
-from django.db.models import Q, F
-from .models import Post, PostVote
+from django.db.models import Q, Sum
+from apps.core import response_cache, versioning
+from apps.core.pagination import KeysetPagination
+from apps.core.serializers import SparseQuerysetMixin
+from apps.votes import buffer as vote_buffer, engine as vote_engine
+from .models import Post, PostVoteRollup
+from .pagination import FeedIndexPagination, HomeFeedPagination, SearchPagination
+from . import feed_index
+from .ranking import FEED_ORDERINGS, TOP_WINDOWS, top_window_filter
 from .serializers import (
     PostSerializer,
     PostCreateSerializer,
@@ -12,13 +20,25 @@ from .serializers import (
 )
 
 
-class PostListCreateView(generics.ListCreateAPIView):
-    """List all posts or create a new post."""
+class PostListCreateView(response_cache.AnonymousResponseCacheMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
+    """List all posts or create a new post. Anonymous pages are cached."""
     
-    filter_backends = [filters.OrderingFilter, filters.SearchFilter]
-    ordering_fields = ['created_at', 'vote_score', 'comment_count']
-    ordering = ['-created_at']
-    search_fields = ['title', 'content']
+    pagination_class = FeedIndexPagination
+    # Parameters of the former SearchFilter/OrderingFilter: rejected, not
+    # silently ignored, so old clients do not get the unfiltered feed
+    unsupported_params = {
+        'search': 'Use /api/posts/search/?q= for full-text search.',
+        'ordering': 'Use sort= (new, top, hot or comment_count).',
+    }
+    
+    def list(self, request, *args, **kwargs):
+        errors = {
+            param: [message] for param, message in self.unsupported_params.items()
+            if param in request.query_params
+        }
+        if errors:
+            raise ValidationError(errors)
+        return super().list(request, *args, **kwargs)
     
     def get_queryset(self):
         queryset = Post.objects.select_related('author', 'community')
@@ -33,17 +53,36 @@ class PostListCreateView(generics.ListCreateAPIView):
         if author:
             queryset = queryset.filter(author__username=author)
         
-        # Sort option
+        # Sort option: new, top, hot (stored hot rank) or comment_count.
+        # Each ordering is tie-broken by id and backed by a composite index.
         sort = self.request.query_params.get('sort', 'new')
-        if sort == 'hot':
-            # Simple hot algorithm: score weighted by recency
-            queryset = queryset.order_by('-vote_score', '-created_at')
-        elif sort == 'top':
-            queryset = queryset.order_by('-vote_score')
-        else:  # 'new'
-            queryset = queryset.order_by('-created_at')
-        
-        return queryset
+        window = self.get_top_window()
+        if sort == 'top' and window:
+            # Windowed top: sum the vote rollups inside the window
+            return queryset.filter(top_window_filter(window)).annotate(
+                window_score=Sum('vote_rollups__delta')
+            ).order_by('-window_score', '-id')
+        ordering = FEED_ORDERINGS.get(sort, FEED_ORDERINGS['new'])
+        return queryset.order_by(*ordering)
+    
+    def get_top_window(self):
+        """Return the ``t`` window for sort=top, or None for all-time."""
+        window = self.request.query_params.get('t', 'all')
+        return window if window in TOP_WINDOWS else None
+    
+    def get_feed_index_scope(self):
+        """Return the feed index ``(scope, sort)`` serving this request, if any."""
+        params = self.request.query_params
+        sort = params.get('sort', 'new')
+        if sort not in FEED_ORDERINGS:
+            sort = 'new'
+        if params.get('author') or (sort == 'top' and self.get_top_window()):
+            return None
+        return params.get('community') or feed_index.GLOBAL_SCOPE, sort
+    
+    def get_response_cache_scopes(self, request, **kwargs):
+        community_slug = request.GET.get('community')
+        return [f'feed:{community_slug}' if community_slug else 'feed:all']
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -56,8 +95,8 @@ class PostListCreateView(generics.ListCreateAPIView):
         return [permissions.AllowAny()]
 
 
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
-    """Get, update, or delete a post."""
+class PostDetailView(versioning.ConditionalGetMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
+    """Get, update, or delete a post. GETs honour ETag / If-Modified-Since."""
     
     queryset = Post.objects.select_related('author', 'community')
     serializer_class = PostSerializer
@@ -67,6 +106,9 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
     
+    def get_version_key(self):
+        return versioning.post_key(self.kwargs['pk'])
+    
     def perform_update(self, serializer):
         if serializer.instance.author != self.request.user:
             from rest_framework.exceptions import PermissionDenied
@@ -85,7 +127,10 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
 def vote_post(request, pk):
     """
     Upvote or downvote a post with ATOMIC transaction to prevent race conditions.
-    Uses select_for_update to lock the vote row during the transaction.
+    The vote row and the score are written by the vote engine (see
+    apps.votes.engine): single-statement upserts with RETURNING on PostgreSQL.
+    With VOTE_WRITE_BEHIND the post row is not touched: the score change is
+    buffered (see apps.votes.buffer) and a provisional score is returned.
     """
     from apps.users.models import KarmaTransaction
     
@@ -95,106 +140,91 @@ def vote_post(request, pk):
     
     vote_type = serializer.validated_data['vote_type']
     
-    # Use atomic transaction to prevent race conditions
-    with transaction.atomic():
-        try:
-            # Lock the post row to prevent concurrent modifications
-            post = Post.objects.select_for_update().get(pk=pk)
-        except Post.DoesNotExist:
-            return Response(
-                {'error': 'Post not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Try to get existing vote with lock
-        existing_vote = PostVote.objects.select_for_update().filter(
-            user=request.user, 
-            post=post
-        ).first()
-        
-        if existing_vote:
-            if existing_vote.vote_type == vote_type:
-                # Same vote - remove it (toggle off)
-                old_vote_type = existing_vote.vote_type
-                existing_vote.delete()
-                
-                # Update vote score atomically
-                if old_vote_type == 'up':
-                    Post.objects.filter(pk=pk).update(vote_score=F('vote_score') - 1)
-                    # Log karma transaction
-                    KarmaTransaction.log_karma_change(
-                        user=post.author,
-                        delta=-1,
-                        reason='post_upvote_removed',
-                        post=post
-                    )
-                else:
-                    Post.objects.filter(pk=pk).update(vote_score=F('vote_score') + 1)
-                    KarmaTransaction.log_karma_change(
-                        user=post.author,
-                        delta=1,
-                        reason='post_downvote_removed',
-                        post=post
-                    )
-                
-                post.refresh_from_db()
-                return Response({'message': 'Vote removed', 'vote_score': post.vote_score})
-            else:
-                # Different vote - update it (swing of 2: remove old + add new)
-                old_vote_type = existing_vote.vote_type
-                existing_vote.vote_type = vote_type
-                existing_vote.save()
-                
-                if vote_type == 'up':  # Changed from down to up
-                    Post.objects.filter(pk=pk).update(vote_score=F('vote_score') + 2)
-                    KarmaTransaction.log_karma_change(
-                        user=post.author,
-                        delta=2,  # +1 remove downvote, +1 add upvote
-                        reason='post_upvote',
-                        post=post
-                    )
-                else:  # Changed from up to down
-                    Post.objects.filter(pk=pk).update(vote_score=F('vote_score') - 2)
-                    KarmaTransaction.log_karma_change(
-                        user=post.author,
-                        delta=-2,  # -1 remove upvote, -1 add downvote
-                        reason='post_downvote',
-                        post=post
-                    )
-                
-                post.refresh_from_db()
-                return Response({'message': 'Vote updated', 'vote_score': post.vote_score})
-        else:
-            # New vote - create with atomic update
-            PostVote.objects.create(user=request.user, post=post, vote_type=vote_type)
+    try:
+        with transaction.atomic():
+            outcome = vote_engine.cast_vote('post', request.user, pk, vote_type)
+            
+            if vote_buffer.is_enabled():
+                # Write-behind: the flusher applies score, karma and derived state
+                post = Post.objects.get(pk=pk)
+                vote_score = vote_buffer.record_vote('post', post, outcome)
+                return Response({'message': outcome.message, 'vote_score': vote_score, 'provisional': True})
             
-            if vote_type == 'up':
-                Post.objects.filter(pk=pk).update(vote_score=F('vote_score') + 1)
-                KarmaTransaction.log_karma_change(
-                    user=post.author,
-                    delta=1,
-                    reason='post_upvote',
-                    post=post
-                )
-            else:
-                Post.objects.filter(pk=pk).update(vote_score=F('vote_score') - 1)
-                KarmaTransaction.log_karma_change(
-                    user=post.author,
-                    delta=-1,
-                    reason='post_downvote',
-                    post=post
-                )
+            # Update vote score atomically and log the author's karma change
+            post = vote_engine.apply_score('post', pk, outcome)
+            PostVoteRollup.record(post.pk, outcome.delta)
+            KarmaTransaction.log_karma_change(
+                user=post.author_id,
+                delta=outcome.delta,
+                reason=outcome.reason,
+                post=post
+            )
             
-            post.refresh_from_db()
-            return Response({'message': 'Vote recorded', 'vote_score': post.vote_score})
+            # Ranks were stored by apply_score; keep the cached feed index in step
+            feed_index.update_post(post, ['top', 'hot'])
+            versioning.bump(versioning.post_key(post.pk))
+            response_cache.invalidate(*response_cache.feed_scopes(post.community.slug))
+            return Response({'message': outcome.message, 'vote_score': post.vote_score})
+    except Post.DoesNotExist:
+        return Response(
+            {'error': 'Post not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except vote_engine.VoteConflict:
+        return Response(
+            {'error': 'Vote already recorded'},
+            status=status.HTTP_409_CONFLICT
+        )
 
 
-class UserPostsView(generics.ListAPIView):
+class UserPostsView(SparseQuerysetMixin, generics.ListAPIView):
     """List all posts by a specific user."""
     
     serializer_class = PostListSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         username = self.kwargs.get('username')
-        return Post.objects.filter(author__username=username).select_related('author', 'community')
+        return Post.objects.filter(author__username=username).select_related(
+            'author', 'community'
+        ).order_by(*FEED_ORDERINGS['new'])
+
+
+class HomeFeedView(SparseQuerysetMixin, generics.ListAPIView):
+    """
+    Personalized feed: newest posts from the communities the user joined.
+    
+    Built by a k-way merge of per-community streams (see home_feed), so a
+    user in hundreds of communities does not scan all of their posts.
+    """
+    
+    serializer_class = PostListSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HomeFeedPagination
+    
+    def get_queryset(self):
+        return Post.objects.select_related('author', 'community')
+    
+    def get_community_ids(self):
+        from apps.communities.models import CommunityMembership
+        return list(CommunityMembership.objects.filter(
+            user=self.request.user
+        ).values_list('community_id', flat=True))
+
+
+class PostSearchView(SparseQuerysetMixin, generics.ListAPIView):
+    """
+    Ranked full-text search over post titles and content.
+    
+    Query params: q (search terms), community (optional slug scope),
+    cursor (keyset continuation). Served from the search index (see
+    apps.posts.search) instead of ILIKE scans.
+    """
+    
+    serializer_class = PostListSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = SearchPagination
+    
+    def get_queryset(self):
+        return Post.objects.select_related('author', 'community')
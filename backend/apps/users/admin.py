@@ -1,6 +1,19 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, KarmaTransaction
+from .karma import get_many_karma_24h
+from .models import User, KarmaTransaction, KarmaDailySummary
+
+
+class UserChangeList(ChangeList):
+    """Loads 24h karma for the whole changelist page in one pass."""
+    
+    def get_results(self, request):
+        super().get_results(request)
+        self.result_list = list(self.result_list)
+        karma_24h = get_many_karma_24h([user.pk for user in self.result_list])
+        for user in self.result_list:
+            user.karma_24h = karma_24h[user.pk]
 
 
 @admin.register(User)
@@ -16,7 +29,12 @@ class UserAdmin(BaseUserAdmin):
     
     readonly_fields = ['karma', 'created_at', 'updated_at']
     
+    def get_changelist(self, request, **kwargs):
+        return UserChangeList
+    
     def get_karma_24h_display(self, obj):
+        if hasattr(obj, 'karma_24h'):
+            return obj.karma_24h
         return obj.get_karma_24h()
     get_karma_24h_display.short_description = '24h Karma'
 
@@ -40,3 +58,19 @@ class KarmaTransactionAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         # Transactions are immutable - can't be deleted
         return False
+
+
+@admin.register(KarmaDailySummary)
+class KarmaDailySummaryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'day', 'delta', 'transaction_count']
+    list_filter = ['day']
+    search_fields = ['user__username']
+    readonly_fields = ['user', 'day', 'delta', 'transaction_count']
+    ordering = ['-day']
+    
+    def has_add_permission(self, request):
+        # Summaries are written by compact_karma_ledger only
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
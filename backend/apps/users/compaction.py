@@ -0,0 +1,98 @@
+"""
+Compaction of the KarmaTransaction ledger.
+
+Ledger rows older than ``KARMA_LEDGER_RETENTION_DAYS`` (counted back to a
+UTC midnight) are folded into one ``KarmaDailySummary`` row per user and
+day, then deleted. Each batch folds and deletes in the same transaction,
+so summaries plus the remaining ledger always equal the full history:
+``get_total_karma`` and reconciliation stay exact, and windowed queries
+(the 24h and community leaderboards) only read rows inside the horizon.
+Hourly karma rollups past the horizon are no longer read by anything and
+are pruned the same way.
+
+Rows are taken in primary key order in bounded batches, skipping rows
+locked by a concurrent compaction where the database supports it, so the
+job can run alongside live traffic.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Leaderboard windows (up to 7 days, see apps.users.karma) read raw
+# ledger rows at their far edge
+MIN_RETENTION_DAYS = 8
+
+
+def get_retention_days():
+    return max(MIN_RETENTION_DAYS, getattr(settings, 'KARMA_LEDGER_RETENTION_DAYS', 30))
+
+
+def get_cutoff(days=None, now=None):
+    """Return the UTC midnight before which ledger rows are compacted."""
+    days = max(MIN_RETENTION_DAYS, days if days is not None else get_retention_days())
+    day = ((now or timezone.now()) - timedelta(days=days)).astimezone(dt_timezone.utc).date()
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def compact_batch(cutoff, batch_size=5000):
+    """Fold up to ``batch_size`` ledger rows older than ``cutoff``; return how many."""
+    from .models import KarmaDailySummary, KarmaTransaction
+
+    with transaction.atomic():
+        rows = list(
+            KarmaTransaction.objects.select_for_update(skip_locked=True)
+            .filter(created_at__lt=cutoff)
+            .order_by('id')
+            .values_list('id', 'user_id', 'delta', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return 0
+        days = defaultdict(lambda: [0, 0])
+        for _, user_id, delta, created_at in rows:
+            summary = days[user_id, created_at.astimezone(dt_timezone.utc).date()]
+            summary[0] += delta
+            summary[1] += 1
+        for (user_id, day), (delta, count) in sorted(days.items()):
+            KarmaDailySummary.record(user_id, day, delta, count)
+        KarmaTransaction.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def prune_buckets_batch(cutoff, batch_size=5000):
+    """Delete up to ``batch_size`` hourly karma rollups older than ``cutoff``."""
+    from .models import CommunityKarmaBucket, KarmaHourlyBucket
+
+    pruned = 0
+    with transaction.atomic():
+        for model in (KarmaHourlyBucket, CommunityKarmaBucket):
+            ids = list(
+                model.objects.filter(hour__lt=cutoff).order_by('id')
+                .values_list('id', flat=True)[:batch_size - pruned]
+            )
+            if ids:
+                model.objects.filter(pk__in=ids).delete()
+            pruned += len(ids)
+            if pruned >= batch_size:
+                break
+    return pruned
+
+
+def _drain(step, cutoff, batch_size):
+    total = 0
+    while True:
+        done = step(cutoff, batch_size)
+        total += done
+        if done < batch_size:
+            return total
+
+
+def compact(cutoff=None, batch_size=5000):
+    """Compact the ledger and prune rollups up to ``cutoff``; return ``(compacted, pruned)``."""
+    cutoff = cutoff or get_cutoff()
+    return (
+        _drain(compact_batch, cutoff, batch_size),
+        _drain(prune_buckets_batch, cutoff, batch_size),
+    )
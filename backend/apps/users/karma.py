@@ -0,0 +1,142 @@
+"""
+Rolling 24h karma from hourly rollups plus an exact ledger edge.
+
+The window ``[now - 24h, now)`` is split at clock hours:
+
+- whole hours inside the window are summed from ``KarmaHourlyBucket``
+  (at most 24 rows per user);
+- the partial hour at the start and the current partial hour are summed
+  from the raw ``KarmaTransaction`` ledger, using its created_at index.
+
+Buckets for whole hours equal the ledger exactly, so the total matches
+summing the raw ledger over the whole window. The rows touched are bounded
+by the window instead of by total vote volume. Community leaderboards use
+the same split over ``CommunityKarmaBucket`` and the ledger's community.
+
+Per-user totals are also cached for ``KARMA_24H_CACHE_TIMEOUT`` seconds
+(``get_karma_24h``/``get_many_karma_24h``). New karma is added to a cached
+total once its transaction commits; karma leaving the window is picked up
+when the entry expires, which bounds how stale a total can be.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+WINDOW = timedelta(hours=24)
+HOUR = timedelta(hours=1)
+
+# Windows served by the community leaderboards
+COMMUNITY_WINDOWS = {
+    '24h': WINDOW,
+    '7d': timedelta(days=7),
+}
+
+
+def window_bounds(now=None, window=WINDOW):
+    """
+    Return ``(start, first_full_hour, current_hour, now)`` for a window ending now.
+
+    Buckets cover ``[first_full_hour, current_hour)``; the ledger covers
+    ``[start, first_full_hour)`` and ``[current_hour, now)``.
+    """
+    from .models import KarmaHourlyBucket
+
+    now = now or timezone.now()
+    start = now - window
+    first_full_hour = KarmaHourlyBucket.hour_of(start)
+    if first_full_hour < start:
+        first_full_hour += HOUR
+    current_hour = KarmaHourlyBucket.hour_of(now)
+    return start, first_full_hour, current_hour, now
+
+
+def _window_totals(buckets, ledger, window, now):
+    """Sum ``{user_id: delta}`` over hourly ``buckets`` and the ``ledger`` edges of the window."""
+    start, first_full_hour, current_hour, now = window_bounds(now, window)
+    buckets = buckets.filter(hour__gte=first_full_hour, hour__lt=current_hour)
+    ledger = ledger.filter(
+        Q(created_at__gte=start, created_at__lt=first_full_hour)
+        | Q(created_at__gte=current_hour, created_at__lt=now)
+    )
+    totals = defaultdict(int)
+    for queryset in (buckets, ledger):
+        rows = queryset.order_by().values('user_id').annotate(total=Sum('delta'))
+        for row in rows.values_list('user_id', 'total'):
+            totals[row[0]] += row[1] or 0
+    return dict(totals)
+
+
+def karma_24h_totals(user_ids=None, now=None):
+    """Return ``{user_id: karma in the last 24h}`` for users with activity."""
+    from .models import KarmaHourlyBucket, KarmaTransaction
+
+    buckets = KarmaHourlyBucket.objects.all()
+    ledger = KarmaTransaction.objects.all()
+    if user_ids is not None:
+        buckets = buckets.filter(user_id__in=user_ids)
+        ledger = ledger.filter(user_id__in=user_ids)
+    return _window_totals(buckets, ledger, WINDOW, now)
+
+
+def community_karma_totals(community_id, window, now=None):
+    """
+    Return ``{user_id: karma earned in the community}`` over ``window``.
+
+    Reads the community's hourly rollups and its own slice of the ledger
+    edges, so the cost follows the community's activity, not the ledger size.
+    """
+    from .models import CommunityKarmaBucket, KarmaTransaction
+
+    return _window_totals(
+        CommunityKarmaBucket.objects.filter(community_id=community_id),
+        KarmaTransaction.objects.filter(community_id=community_id),
+        window,
+        now,
+    )
+
+
+def get_cache_timeout():
+    return getattr(settings, 'KARMA_24H_CACHE_TIMEOUT', 60)
+
+
+def _cache_key(user_id):
+    return f'karma-24h:{user_id}'
+
+
+def get_many_karma_24h(user_ids):
+    """Return ``{user_id: karma in the last 24h}``, computing cache misses in one pass."""
+    keys = {_cache_key(user_id): user_id for user_id in set(user_ids)}
+    cached = cache.get_many(keys)
+    result = {keys[key]: value for key, value in cached.items()}
+    missing = [user_id for key, user_id in keys.items() if key not in cached]
+    if missing:
+        totals = karma_24h_totals(missing)
+        fresh = {user_id: totals.get(user_id, 0) for user_id in missing}
+        cache.set_many({_cache_key(user_id): value for user_id, value in fresh.items()}, get_cache_timeout())
+        result.update(fresh)
+    return result
+
+
+def get_karma_24h(user_id):
+    return get_many_karma_24h([user_id])[user_id]
+
+
+def karma_24h_changed(deltas):
+    """Add ``{user_id: delta}`` to cached totals once the current transaction commits."""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    def apply():
+        for user_id, delta in deltas.items():
+            try:
+                cache.incr(_cache_key(user_id), delta)
+            except ValueError:
+                # Not cached; the next read computes it
+                pass
+    transaction.on_commit(apply)
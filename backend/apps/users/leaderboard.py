@@ -0,0 +1,116 @@
+"""
+Top-K karma leaderboards held in the shared cache.
+
+Two boards are kept, ``'all_time'`` (``User.karma``) and ``'24h'`` (rolling
+24h karma, see apps.users.karma). Each is a list of the top
+``LEADERBOARD_SIZE`` users as a sorted list (see apps.core.sorted_lists)
+of compact ``[karma, user_id]`` pairs in descending karma order, ties by
+ascending user id. Leaderboard requests slice that list and hydrate the
+users with one ``pk__in`` query, so they cost O(K) instead of sorting
+every user.
+
+Karma changes update the boards incrementally: after commit, the changed
+users' current values are read in one query and repositioned under the
+board's lock, which is held only for the in-memory edit, so concurrent
+voters neither serialize on the database read nor drop the board. A missing board is rebuilt from the database: the all-time
+board from the index on ``User.karma``, the 24h board from the hourly
+rollups. Karma also leaves the 24h window as time passes, so the 24h
+board expires after ``LEADERBOARD_24H_TIMEOUT`` seconds and is rebuilt
+with the expired hours evicted.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.core import sorted_lists
+
+BOARDS = ('all_time', '24h')
+
+
+def get_board_size():
+    return getattr(settings, 'LEADERBOARD_SIZE', 200)
+
+
+def get_board_timeout(board):
+    if board == '24h':
+        return getattr(settings, 'LEADERBOARD_24H_TIMEOUT', 60)
+    return getattr(settings, 'LEADERBOARD_TIMEOUT', 3600)
+
+
+def board_key(board):
+    return f'leaderboard:{board}'
+
+
+def _order(entry):
+    karma, user_id = entry
+    return (-karma, user_id)
+
+
+def _current_values(board, user_ids=None):
+    """``{user_id: karma}`` for ``board``; all users with karma if ``user_ids`` is None."""
+    from .karma import karma_24h_totals
+    from .models import User
+
+    if board == '24h':
+        totals = karma_24h_totals(user_ids)
+        if user_ids is not None:
+            totals = {user_id: totals.get(user_id, 0) for user_id in user_ids}
+        return totals
+    return dict(User.objects.filter(pk__in=user_ids).values_list('id', 'karma'))
+
+
+def build_board(board):
+    """Load the top users for ``board`` from the database and cache them."""
+    from .models import User
+
+    size = get_board_size()
+    if board == '24h':
+        entries = sorted(
+            ([karma, user_id] for user_id, karma in _current_values(board).items()),
+            key=_order,
+        )[:size + 1]
+    else:
+        rows = User.objects.order_by('-karma', 'id').values_list('karma', 'id')[:size + 1]
+        entries = [list(row) for row in rows]
+    data = {'truncated': len(entries) > size, 'entries': entries[:size]}
+    cache.set(board_key(board), data, get_board_timeout(board))
+    return data
+
+
+def get_board(board):
+    """Return the cached board, building it on a miss."""
+    data = cache.get(board_key(board))
+    if data is None:
+        data = build_board(board)
+    return data
+
+
+def get_top(board, limit):
+    """Return the top ``limit`` ``(karma, user_id)`` pairs of ``board``."""
+    data = get_board(board)
+    if len(data['entries']) < limit and data['truncated']:
+        # Entries dropped out below the cut; only the database knows who follows
+        data = build_board(board)
+    return [tuple(entry) for entry in data['entries'][:limit]]
+
+
+def _update(board, user_ids):
+    sorted_lists.reposition(
+        board_key(board),
+        lambda: _current_values(board, user_ids),
+        _order,
+        get_board_size(),
+        get_board_timeout(board),
+    )
+
+
+def karma_changed(user_ids, boards=BOARDS):
+    """Reposition ``user_ids`` on ``boards`` once the current transaction commits."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+
+    def apply():
+        for board in boards:
+            _update(board, user_ids)
+    transaction.on_commit(apply)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from apps.users import compaction
+
+
+class Command(BaseCommand):
+    """
+    Fold old KarmaTransaction rows into per-user daily summaries.
+
+    Run it daily from a scheduler. Rows older than the retention horizon
+    (KARMA_LEDGER_RETENTION_DAYS, or --days) are summarised and deleted in
+    batches of --batch-size, one transaction per batch.
+    """
+
+    help = 'Compact karma ledger rows past the retention horizon into daily summaries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Keep raw rows for this many days (default: KARMA_LEDGER_RETENTION_DAYS, minimum 8).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of ledger rows compacted per transaction (default: 5000).'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many rows would be compacted.'
+        )
+
+    def handle(self, *args, **options):
+        from apps.users.models import CommunityKarmaBucket, KarmaHourlyBucket, KarmaTransaction
+
+        cutoff = compaction.get_cutoff(options['days'])
+        if options['dry_run']:
+            rows = KarmaTransaction.objects.filter(created_at__lt=cutoff).count()
+            buckets = (
+                KarmaHourlyBucket.objects.filter(hour__lt=cutoff).count()
+                + CommunityKarmaBucket.objects.filter(hour__lt=cutoff).count()
+            )
+            self.stdout.write(
+                f'Would compact {rows} ledger rows and prune {buckets} hourly rollups '
+                f'before {cutoff.isoformat()}.'
+            )
+            return
+
+        compacted, pruned = compaction.compact(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {compacted} ledger rows and pruned {pruned} hourly rollups '
+            f'before {cutoff.isoformat()}.'
+        ))
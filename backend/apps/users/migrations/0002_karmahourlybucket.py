@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:41
+
+import django.db.models.deletion
+from django.conf import settings
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncHour
+
+
+def _hourly(queryset, user_field):
+    rows = queryset.annotate(bucket=TruncHour('created_at', tzinfo=timezone.utc)).values(
+        user_field, 'bucket'
+    ).annotate(total=Sum('delta')).order_by().values_list(user_field, 'bucket', 'total')
+    return {(user_id, hour): total for user_id, hour, total in rows}
+
+
+def backfill_karma_buckets(apps, schema_editor):
+    KarmaTransaction = apps.get_model('users', 'KarmaTransaction')
+    KarmaHourlyBucket = apps.get_model('users', 'KarmaHourlyBucket')
+    VoteDelta = apps.get_model('votes', 'VoteDelta')
+    totals = _hourly(KarmaTransaction.objects.all(), 'user_id')
+    # Buffered votes reach their bucket when flushed
+    for key, delta in _hourly(VoteDelta.objects.all(), 'author_id').items():
+        totals[key] = totals.get(key, 0) - delta
+    KarmaHourlyBucket.objects.bulk_create(
+        [
+            KarmaHourlyBucket(user_id=user_id, hour=hour, delta=delta)
+            for (user_id, hour), delta in sorted(totals.items())
+            if delta
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('votes', '0003_votedelta_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KarmaHourlyBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the clock hour this row covers')),
+                ('delta', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='karma_buckets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour', 'user'], name='users_karma_hour_a14d12_idx')],
+                'unique_together': {('user', 'hour')},
+            },
+        ),
+        migrations.RunPython(backfill_karma_buckets, migrations.RunPython.noop),
+    ]
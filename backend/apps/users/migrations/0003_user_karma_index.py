@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_karmahourlybucket'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='karma',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
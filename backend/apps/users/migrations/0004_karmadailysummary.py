@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_karma_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KarmaDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('delta', models.IntegerField(default=0)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='karma_daily_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day'],
+                'unique_together': {('user', 'day')},
+            },
+        ),
+    ]
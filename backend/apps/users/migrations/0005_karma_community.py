@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:46
+
+from datetime import timezone
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import TruncHour
+
+
+def _hourly(queryset, community_field, user_field):
+    rows = queryset.filter(**{f'{community_field}__isnull': False}).annotate(
+        bucket=TruncHour('created_at', tzinfo=timezone.utc)
+    ).values(community_field, user_field, 'bucket').annotate(total=Sum('delta')).order_by().values_list(
+        community_field, user_field, 'bucket', 'total'
+    )
+    return {(community_id, user_id, hour): total for community_id, user_id, hour, total in rows}
+
+
+def backfill_karma_communities(apps, schema_editor):
+    KarmaTransaction = apps.get_model('users', 'KarmaTransaction')
+    CommunityKarmaBucket = apps.get_model('users', 'CommunityKarmaBucket')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('comments', 'Comment')
+    VoteDelta = apps.get_model('votes', 'VoteDelta')
+
+    KarmaTransaction.objects.filter(post__isnull=False).update(community_id=Subquery(
+        Post.objects.filter(pk=OuterRef('post_id')).values('community_id')[:1]
+    ))
+    KarmaTransaction.objects.filter(post__isnull=True, comment__isnull=False).update(community_id=Subquery(
+        Comment.objects.filter(pk=OuterRef('comment_id')).values('post__community_id')[:1]
+    ))
+
+    totals = _hourly(KarmaTransaction.objects.all(), 'community_id', 'user_id')
+    # Buffered votes reach their buckets when flushed
+    pending = VoteDelta.objects.filter(post__isnull=False)
+    for key, delta in _hourly(pending, 'post__community_id', 'author_id').items():
+        totals[key] = totals.get(key, 0) - delta
+    pending = VoteDelta.objects.filter(comment__isnull=False)
+    for key, delta in _hourly(pending, 'comment__post__community_id', 'author_id').items():
+        totals[key] = totals.get(key, 0) - delta
+    CommunityKarmaBucket.objects.bulk_create(
+        [
+            CommunityKarmaBucket(community_id=community_id, user_id=user_id, hour=hour, delta=delta)
+            for (community_id, user_id, hour), delta in sorted(totals.items())
+            if delta
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_comment_vote_counts'),
+        ('communities', '0002_initial'),
+        ('posts', '0008_post_vote_counts'),
+        ('users', '0004_karmadailysummary'),
+        ('votes', '0003_votedelta_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunityKarmaBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the clock hour this row covers')),
+                ('delta', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='karmatransaction',
+            name='community',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='karma_transactions', to='communities.community'),
+        ),
+        migrations.AddIndex(
+            model_name='karmatransaction',
+            index=models.Index(fields=['community', 'created_at'], name='users_karma_communi_6cc1fc_idx'),
+        ),
+        migrations.AddField(
+            model_name='communitykarmabucket',
+            name='community',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='karma_buckets', to='communities.community'),
+        ),
+        migrations.AddField(
+            model_name='communitykarmabucket',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='community_karma_buckets', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='communitykarmabucket',
+            index=models.Index(fields=['community', 'hour', 'user'], name='users_commu_communi_326719_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='communitykarmabucket',
+            unique_together={('community', 'user', 'hour')},
+        ),
+        migrations.RunPython(backfill_karma_communities, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
-from datetime import timedelta
+
+from apps.core.upsert import increment_or_create
+from . import karma as rolling_karma, leaderboard
 
 
 class User(AbstractUser):
@@ -12,7 +14,8 @@ class User(AbstractUser):
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
     # NOTE: This karma field is for display/caching only. 
     # For 24h leaderboard, use get_karma_24h() which calculates from KarmaTransaction
-    karma = models.IntegerField(default=0)
+    # Indexed so the all-time leaderboard can be rebuilt without a full sort
+    karma = models.IntegerField(default=0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -29,24 +32,21 @@ class User(AbstractUser):
         """
         Calculate karma earned in the last 24 hours dynamically.
         This is used for the leaderboard - NOT stored as a simple integer.
+        Whole hours come from KarmaHourlyBucket, the edges from the ledger;
+        the total is cached briefly (see users.karma).
         """
-        from django.db.models import Sum
-        yesterday = timezone.now() - timedelta(hours=24)
-        
-        result = KarmaTransaction.objects.filter(
-            user=self,
-            created_at__gte=yesterday
-        ).aggregate(total=Sum('delta'))
-        
-        return result['total'] or 0
+        return rolling_karma.get_karma_24h(self.pk)
     
     def get_total_karma(self):
-        """Calculate total karma from all transactions."""
+        """Calculate total karma from all transactions, compacted days included."""
         from django.db.models import Sum
         result = KarmaTransaction.objects.filter(user=self).aggregate(
             total=Sum('delta')
         )
-        return result['total'] or 0
+        compacted = KarmaDailySummary.objects.filter(user=self).aggregate(
+            total=Sum('delta')
+        )
+        return (result['total'] or 0) + (compacted['total'] or 0)
     
     def update_karma_cache(self):
         """Update the cached karma field from transactions."""
@@ -59,6 +59,8 @@ class KarmaTransaction(models.Model):
     Immutable log of all karma changes.
     Used for dynamic 24h leaderboard calculations instead of storing
     daily karma as a simple integer field.
+    Rows older than KARMA_LEDGER_RETENTION_DAYS are compacted into
+    KarmaDailySummary.
     """
     
     REASON_CHOICES = [
@@ -96,6 +98,14 @@ class KarmaTransaction(models.Model):
         null=True,
         blank=True
     )
+    # Community of the post or comment, kept when those are deleted
+    community = models.ForeignKey(
+        'communities.Community',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='karma_transactions'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
@@ -104,22 +114,196 @@ class KarmaTransaction(models.Model):
         indexes = [
             # Composite index for efficient 24h leaderboard queries
             models.Index(fields=['user', 'created_at']),
+            # Edge hours of community leaderboard windows
+            models.Index(fields=['community', 'created_at']),
         ]
     
     def __str__(self):
         return f"{self.user.username}: {self.delta:+d} karma ({self.reason})"
     
+    @staticmethod
+    def community_of(post=None, comment=None):
+        """Return the community id karma from ``post`` or ``comment`` counts towards."""
+        if post is not None:
+            return post.community_id
+        if comment is not None:
+            return comment.post.community_id
+        return None
+    
     @classmethod
-    def log_karma_change(cls, user, delta, reason, post=None, comment=None):
-        """Create a karma transaction and update user's cached karma."""
+    def log_karma_change(cls, user, delta, reason, post=None, comment=None, update_cache=True):
+        """
+        Create a karma transaction and update user's cached karma.
+        ``user`` may be a User or its primary key. The hourly rollups are
+        always written with the ledger row, so whole hours match it exactly.
+        With update_cache=False the cached field and the leaderboards are
+        left to the caller (write-behind voting folds them in later, see
+        apps.votes.buffer).
+        """
+        user_id = getattr(user, 'pk', user)
         transaction = cls.objects.create(
-            user=user,
+            user_id=user_id,
             delta=delta,
             reason=reason,
             post=post,
-            comment=comment
+            comment=comment,
+            community_id=cls.community_of(post, comment)
         )
+        KarmaHourlyBucket.record(user_id, delta, transaction.created_at)
+        if transaction.community_id:
+            CommunityKarmaBucket.record(
+                transaction.community_id, user_id, delta, transaction.created_at
+            )
         # Update cached karma field
-        user.karma = models.F('karma') + delta
-        user.save(update_fields=['karma'])
+        if update_cache:
+            User.objects.filter(pk=user_id).update(karma=models.F('karma') + delta)
+            leaderboard.karma_changed([user_id])
+        rolling_karma.karma_24h_changed({user_id: delta})
         return transaction
+    
+    @classmethod
+    def bulk_log_karma_changes(cls, transactions, update_cache=True):
+        """
+        Insert unsaved KarmaTransaction objects with one bulk_create and
+        apply their hourly rollups and cached karma with one UPDATE per
+        (user, hour), per (community, user, hour) and per user, in id order.
+        ``update_cache`` is as for ``log_karma_change``.
+        """
+        for row in transactions:
+            if row.community_id is None:
+                row.community_id = cls.community_of(row.post, row.comment)
+        created = cls.objects.bulk_create(transactions)
+        totals = {}
+        buckets = {}
+        community_buckets = {}
+        for row in created:
+            totals[row.user_id] = totals.get(row.user_id, 0) + row.delta
+            hour = KarmaHourlyBucket.hour_of(row.created_at)
+            buckets[row.user_id, hour] = buckets.get((row.user_id, hour), 0) + row.delta
+            if row.community_id:
+                key = (row.community_id, row.user_id, hour)
+                community_buckets[key] = community_buckets.get(key, 0) + row.delta
+        for (user_id, hour), delta in sorted(buckets.items()):
+            KarmaHourlyBucket.record(user_id, delta, hour)
+        for (community_id, user_id, hour), delta in sorted(community_buckets.items()):
+            CommunityKarmaBucket.record(community_id, user_id, delta, hour)
+        if update_cache:
+            for user_id in sorted(totals):
+                if totals[user_id]:
+                    User.objects.filter(pk=user_id).update(karma=models.F('karma') + totals[user_id])
+            leaderboard.karma_changed(totals)
+        rolling_karma.karma_24h_changed(totals)
+        return created
+
+
+class KarmaHourlyBucket(models.Model):
+    """
+    Net karma change per user per clock hour, rolled up from KarmaTransaction.
+    
+    Written in the same transaction as the ledger rows it sums, so full
+    hours here always match the ledger exactly. The 24h leaderboard adds
+    up at most 24 buckets per user and reads the raw ledger only for the
+    two partial hours at the edges of the window (see apps.users.karma).
+    """
+    
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='karma_buckets'
+    )
+    hour = models.DateTimeField(help_text="Start of the clock hour this row covers")
+    delta = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['user', 'hour']
+        indexes = [
+            # Leaderboard windows are a range scan on hour grouped by user
+            models.Index(fields=['hour', 'user']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.delta:+d} ({self.hour:%Y-%m-%d %H:00})"
+    
+    @staticmethod
+    def hour_of(when):
+        return when.replace(minute=0, second=0, microsecond=0)
+    
+    @classmethod
+    def record(cls, user_id, delta, when=None):
+        """Add ``delta`` to the user's bucket for the hour containing ``when``."""
+        lookup = {'user_id': user_id, 'hour': cls.hour_of(when or timezone.now())}
+        increment_or_create(cls, lookup, delta=delta)
+
+
+class CommunityKarmaBucket(models.Model):
+    """
+    Net karma per user per clock hour within one community.
+    
+    Maintained alongside KarmaHourlyBucket from the ledger rows' community,
+    so community leaderboards get the same exact whole-hour/edge split as
+    the global 24h board without scanning other communities' karma.
+    """
+    
+    community = models.ForeignKey(
+        'communities.Community',
+        on_delete=models.CASCADE,
+        related_name='karma_buckets'
+    )
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='community_karma_buckets'
+    )
+    hour = models.DateTimeField(help_text="Start of the clock hour this row covers")
+    delta = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['community', 'user', 'hour']
+        indexes = [
+            # Leaderboard windows scan one community's hours grouped by user
+            models.Index(fields=['community', 'hour', 'user']),
+        ]
+    
+    def __str__(self):
+        return f"{self.community_id}/{self.user_id} {self.delta:+d} ({self.hour:%Y-%m-%d %H:00})"
+    
+    @classmethod
+    def record(cls, community_id, user_id, delta, when=None):
+        """Add ``delta`` to the user's bucket in ``community_id`` for the hour containing ``when``."""
+        lookup = {
+            'community_id': community_id,
+            'user_id': user_id,
+            'hour': KarmaHourlyBucket.hour_of(when or timezone.now()),
+        }
+        increment_or_create(cls, lookup, delta=delta)
+
+
+class KarmaDailySummary(models.Model):
+    """
+    Net karma per user per UTC day for ledger rows past the retention horizon.
+    
+    ``compact_karma_ledger`` folds old KarmaTransaction rows in here and
+    deletes them in the same transaction, so summaries plus the remaining
+    ledger always add up to the full history (see apps.users.compaction).
+    """
+    
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='karma_daily_summaries'
+    )
+    day = models.DateField()
+    delta = models.IntegerField(default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['user', 'day']
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"{self.user_id} {self.delta:+d} ({self.day})"
+    
+    @classmethod
+    def record(cls, user_id, day, delta, count):
+        """Add ``delta`` and ``count`` folded transactions to the user's summary for ``day``."""
+        increment_or_create(cls, {'user_id': user_id, 'day': day}, delta=delta, transaction_count=count)
@@ -1,11 +1,24 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from apps.core.serializers import SparseFieldsetsMixin
+from .karma import get_many_karma_24h
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class Karma24hListSerializer(serializers.ListSerializer):
+    """List serializer that loads 24h karma for every user on the page at once."""
+    
+    def to_representation(self, data):
+        if not isinstance(data, list):
+            data = list(data.all() if hasattr(data, 'all') else data)
+        if 'karma_24h' in self.child.fields:
+            self.child.context['karma_24h'] = get_many_karma_24h([user.pk for user in data])
+        return super().to_representation(data)
+
+
+class UserSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer for user profile data."""
     
     karma_24h = serializers.SerializerMethodField()
@@ -14,9 +27,13 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'bio', 'avatar', 'karma', 'karma_24h', 'created_at']
         read_only_fields = ['id', 'karma', 'karma_24h', 'created_at']
+        list_serializer_class = Karma24hListSerializer
     
     def get_karma_24h(self, obj):
-        """Get karma earned in the last 24 hours (dynamic calculation)."""
+        """Get karma earned in the last 24 hours (cached rolling total)."""
+        karma_map = self.context.get('karma_24h', {})
+        if obj.pk in karma_map:
+            return karma_map[obj.pk]
         return obj.get_karma_24h()
 
 
@@ -0,0 +1,172 @@
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from rest_framework.test import APITestCase
+
+from apps.communities.models import Community
+from apps.posts.models import Post
+from . import karma, leaderboard
+from .models import KarmaHourlyBucket, KarmaTransaction, User
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='pw')
+            for i in range(3)
+        ]
+        for karma, user in zip([30, 20, 10], self.users):
+            User.objects.filter(pk=user.pk).update(karma=karma)
+
+    def test_concurrent_update_keeps_the_board(self):
+        leaderboard.build_board('all_time')
+        User.objects.filter(pk=self.users[2].pk).update(karma=50)
+        key = leaderboard.board_key('all_time')
+        cache.add(f'{key}:lock', 1)
+        release = threading.Timer(0.05, cache.delete, [f'{key}:lock'])
+        release.start()
+        with self.captureOnCommitCallbacks(execute=True):
+            leaderboard.karma_changed([self.users[2].pk], ['all_time'])
+        release.join()
+        self.assertEqual(cache.get(key)['entries'][0], [50, self.users[2].pk])
+        self.assertEqual(
+            leaderboard.get_top('all_time', 3),
+            [(50, self.users[2].pk), (30, self.users[0].pk), (20, self.users[1].pk)],
+        )
+
+
+class RollingKarmaTests(TestCase):
+    """Hourly buckets plus ledger edges add up to the raw ledger over the window."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='pw')
+            for name in ('alice', 'bob')
+        ]
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.alice)
+        self.post = Post.objects.create(title='Hello', author=self.alice, community=self.community)
+        self.now = datetime(2026, 10, 17, 12, 30, tzinfo=dt_timezone.utc)
+        # Around both edges of the window, inside whole hours and after "now"
+        offsets = [
+            (self.alice, timedelta(hours=24, minutes=20), 5),   # same clock hour as the start, before it
+            (self.alice, timedelta(hours=23, minutes=50), 1),   # same clock hour as the start, inside
+            (self.alice, timedelta(hours=24), 2),               # exactly at the start
+            (self.bob, timedelta(hours=12), -1),
+            (self.alice, timedelta(hours=3, minutes=1), 3),
+            (self.alice, timedelta(minutes=25), 4),             # current partial hour
+            (self.bob, timedelta(minutes=-10), 8),              # after now
+        ]
+        for user, offset, delta in offsets:
+            self.log(user, delta, self.now - offset)
+
+    def log(self, user, delta, when):
+        with mock.patch('django.utils.timezone.now', return_value=when):
+            KarmaTransaction.log_karma_change(user, delta, 'post_upvote', post=self.post)
+
+    def ledger_sum(self, start, end, **filters):
+        totals = {}
+        for user_id, delta in KarmaTransaction.objects.filter(
+            created_at__gte=start, created_at__lt=end, **filters
+        ).values_list('user_id', 'delta'):
+            totals[user_id] = totals.get(user_id, 0) + delta
+        return totals
+
+    def test_window_bounds_split_at_clock_hours(self):
+        start, first_full_hour, current_hour, now = karma.window_bounds(self.now)
+        self.assertEqual(start, self.now - timedelta(hours=24))
+        self.assertEqual(first_full_hour, datetime(2026, 10, 16, 13, tzinfo=dt_timezone.utc))
+        self.assertEqual(current_hour, datetime(2026, 10, 17, 12, tzinfo=dt_timezone.utc))
+        on_the_hour = datetime(2026, 10, 17, 12, tzinfo=dt_timezone.utc)
+        start, first_full_hour, current_hour, _ = karma.window_bounds(on_the_hour)
+        self.assertEqual(first_full_hour, start)
+        self.assertEqual(current_hour, on_the_hour)
+
+    def test_totals_match_the_raw_ledger(self):
+        expected = self.ledger_sum(self.now - karma.WINDOW, self.now)
+        self.assertEqual(expected, {self.alice.pk: 10, self.bob.pk: -1})
+        self.assertEqual(karma.karma_24h_totals(now=self.now), expected)
+        self.assertEqual(karma.karma_24h_totals([self.bob.pk], now=self.now), {self.bob.pk: -1})
+        # Every hour and minute boundary agrees with the ledger
+        for minutes in range(0, 26 * 60, 17):
+            now = self.now - timedelta(hours=1) + timedelta(minutes=minutes)
+            expected = self.ledger_sum(now - karma.WINDOW, now)
+            totals = karma.karma_24h_totals(now=now)
+            # Users whose window nets to zero may be listed either way
+            self.assertEqual(
+                {k: v for k, v in totals.items() if v}, {k: v for k, v in expected.items() if v}, now
+            )
+
+    def test_community_totals_match_the_raw_ledger(self):
+        for name, window in karma.COMMUNITY_WINDOWS.items():
+            expected = self.ledger_sum(self.now - window, self.now, community=self.community)
+            self.assertEqual(karma.community_karma_totals(self.community.pk, window, self.now), expected, name)
+
+    def test_buckets_hold_each_clock_hour(self):
+        hour = datetime(2026, 10, 16, 12, tzinfo=dt_timezone.utc)
+        bucket = KarmaHourlyBucket.objects.get(user=self.alice, hour=hour)
+        self.assertEqual(bucket.delta, 5 + 1 + 2)
+
+
+class CachedKarma24hTests(APITestCase):
+    """Rolling totals are cached and follow new karma once it commits."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='pw')
+            for name in ('alice', 'bob')
+        ]
+        community = Community.objects.create(name='Python', slug='python', creator=self.alice)
+        self.post = Post.objects.create(title='Hello', author=self.alice, community=community)
+
+    def test_total_is_computed_once(self):
+        KarmaTransaction.log_karma_change(self.alice, 2, 'post_upvote')
+        with self.assertNumQueries(2):
+            self.assertEqual(karma.get_karma_24h(self.alice.pk), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(karma.get_karma_24h(self.alice.pk), 2)
+        # Misses for several users are computed together
+        cache.clear()
+        with self.assertNumQueries(2):
+            totals = karma.get_many_karma_24h([self.alice.pk, self.bob.pk])
+        self.assertEqual(totals, {self.alice.pk: 2, self.bob.pk: 0})
+
+    def test_cached_total_follows_committed_karma(self):
+        self.assertEqual(karma.get_karma_24h(self.alice.pk), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            KarmaTransaction.log_karma_change(self.alice, 3, 'post_upvote')
+            # Not visible before the commit
+            self.assertEqual(cache.get(karma._cache_key(self.alice.pk)), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(karma.get_karma_24h(self.alice.pk), 3)
+
+    def test_rolled_back_karma_is_not_added(self):
+        self.assertEqual(karma.get_karma_24h(self.alice.pk), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    KarmaTransaction.log_karma_change(self.alice, 3, 'post_upvote')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(karma.get_karma_24h(self.alice.pk), 0)
+
+    def test_uncached_users_stay_uncached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            KarmaTransaction.log_karma_change(self.bob, 1, 'post_upvote')
+        self.assertIsNone(cache.get(karma._cache_key(self.bob.pk)))
+        self.assertEqual(karma.get_karma_24h(self.bob.pk), 1)
+
+    def test_profile_shows_karma_from_a_vote(self):
+        self.assertEqual(self.client.get('/api/users/alice/').data['karma_24h'], 0)
+        self.client.force_authenticate(self.bob)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/posts/{self.post.pk}/vote/', {'vote_type': 'up'}, format='json')
+        self.assertEqual(self.client.get('/api/users/alice/').data['karma_24h'], 1)
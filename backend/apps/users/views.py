@@ -3,16 +3,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes as perms
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
 from django.utils import timezone
-from datetime import timedelta
 from .serializers import (
     UserSerializer,
     UserRegistrationSerializer,
     UserProfileUpdateSerializer,
     LeaderboardSerializer,
 )
-from .models import KarmaTransaction
+from . import leaderboard
 
 User = get_user_model()
 
@@ -55,7 +53,7 @@ class CurrentUserView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(request.user, context={'request': request})
         return Response(serializer.data)
 
 
@@ -72,32 +70,27 @@ def leaderboard_24h(request):
     - Accurately reflects karma earned in exactly the last 24 hours
     - Prevents gaming by storing immutable transaction history
     - Handles timezone correctly
+    - Served from the cached top-K board (see users.leaderboard), which is
+      rebuilt from hourly rollups plus the ledger's partial edge hours
     """
-    yesterday = timezone.now() - timedelta(hours=24)
     limit = int(request.query_params.get('limit', 10))
     limit = min(limit, 100)  # Cap at 100
     
-    # Aggregate karma from transactions in the last 24 hours
-    # Uses a single efficient query with GROUP BY
-    leaderboard = KarmaTransaction.objects.filter(
-        created_at__gte=yesterday
-    ).values(
-        'user__id',
-        'user__username',
-        'user__avatar',
-    ).annotate(
-        karma_24h=Sum('delta')
-    ).order_by('-karma_24h')[:limit]
+    top = leaderboard.get_top('24h', limit)
+    users = User.objects.only('id', 'username', 'avatar').in_bulk([user_id for _, user_id in top])
     
     # Format response
     result = []
-    for rank, entry in enumerate(leaderboard, 1):
+    # Users deleted since the board was cached are skipped
+    top = [entry for entry in top if entry[1] in users]
+    for rank, (karma_24h, user_id) in enumerate(top, 1):
+        user = users[user_id]
         result.append({
             'rank': rank,
-            'user_id': entry['user__id'],
-            'username': entry['user__username'],
-            'avatar': entry['user__avatar'],
-            'karma_24h': entry['karma_24h'] or 0,
+            'user_id': user_id,
+            'username': user.username,
+            'avatar': user.avatar.name or None,
+            'karma_24h': karma_24h,
         })
     
     return Response({
@@ -110,20 +103,24 @@ def leaderboard_24h(request):
 @api_view(['GET'])
 @perms([permissions.AllowAny])
 def leaderboard_all_time(request):
-    """Get the all-time karma leaderboard (uses cached karma field for efficiency)."""
+    """Get the all-time karma leaderboard (served from the cached top-K board)."""
     limit = int(request.query_params.get('limit', 10))
     limit = min(limit, 100)
     
-    users = User.objects.order_by('-karma')[:limit]
+    top = leaderboard.get_top('all_time', limit)
+    users = User.objects.only('id', 'username', 'avatar').in_bulk([user_id for _, user_id in top])
     
     result = []
-    for rank, user in enumerate(users, 1):
+    # Users deleted since the board was cached are skipped
+    top = [entry for entry in top if entry[1] in users]
+    for rank, (karma, user_id) in enumerate(top, 1):
+        user = users[user_id]
         result.append({
             'rank': rank,
             'user_id': user.id,
             'username': user.username,
             'avatar': user.avatar.url if user.avatar else None,
-            'karma': user.karma,
+            'karma': karma,
         })
     
     return Response({
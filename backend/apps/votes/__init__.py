@@ -0,0 +1,2 @@
+# Votes App
+default_app_config = 'apps.votes.apps.VotesConfig'
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class VotesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.votes'
+    verbose_name = 'Votes'
@@ -0,0 +1,230 @@
+"""
+Batch voting: many ``{kind, id, vote_type}`` votes in one transaction.
+
+Items are applied in request order with the same toggle/switch rules as
+the single vote views (see apps.votes.engine), so voting the same way
+twice in one batch removes the vote again. The database work is grouped:
+
+- Voted rows are locked in a fixed order (posts, then comments, each by
+  primary key), so two overlapping batches cannot deadlock.
+- Vote rows are written per kind with one bulk insert for new votes, one
+  UPDATE per vote type for switched votes and one bulk delete.
+- Scores and counters get one UPDATE per kind, using a CASE over the ids.
+- Karma ledger rows are written with one bulk_create.
+
+Existing vote rows are locked before the batch reads them, but a new vote
+row can still be inserted by a concurrent request. Such an object is
+reported with a conflict error, like the 409 of the single vote views, and
+none of the batch's items for it are applied.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import buffer, engine
+
+# Kinds in lock order
+KINDS = ('post', 'comment')
+
+
+def _grouped(changes, index):
+    """``CASE id WHEN ... THEN <change> END`` for one column of ``changes``."""
+    return Case(
+        *[When(pk=object_id, then=Value(change[index])) for object_id, change in changes.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _lock_votes(vote_model, kind, user, ids):
+    """Lock and return ``user``'s existing votes on ``ids`` as ``{object_id: vote}``."""
+    return {
+        getattr(vote, f'{kind}_id'): vote
+        for vote in vote_model.objects.select_for_update().filter(
+            user=user, **{f'{kind}_id__in': ids}
+        ).order_by(f'{kind}_id')
+    }
+
+
+def _insert_votes(vote_model, kind, user, new_votes):
+    """
+    Insert ``{object_id: vote_type}`` as new vote rows; return the object
+    ids whose row a concurrent request inserted first. The bulk insert is
+    only split into one savepoint per row when it hits such a conflict.
+    """
+    def build(object_id, vote_type):
+        return vote_model(user=user, vote_type=vote_type, **{f'{kind}_id': object_id})
+
+    try:
+        with transaction.atomic():
+            vote_model.objects.bulk_create([build(*pair) for pair in sorted(new_votes.items())])
+        return set()
+    except IntegrityError:
+        pass
+    conflicts = set()
+    for object_id, vote_type in sorted(new_votes.items()):
+        try:
+            with transaction.atomic():
+                build(object_id, vote_type).save(force_insert=True)
+        except IntegrityError:
+            conflicts.add(object_id)
+    return conflicts
+
+
+def apply_vote_batch(user, items):
+    """
+    Apply ``items`` (dicts with ``kind``, ``id``, ``vote_type``) for ``user``.
+
+    Returns one result dict per item, in order. A missing target, or one
+    voted on concurrently by the same user, gets an ``error`` and does not
+    affect the other items.
+    """
+    from apps.users.models import KarmaTransaction
+
+    results = [None] * len(items)
+    indexes_by_kind = defaultdict(list)
+    for index, item in enumerate(items):
+        indexes_by_kind[item['kind']].append(index)
+
+    karma = []
+    # (object, outcome, karma row) per applied item, for the write-behind buffer
+    entries = defaultdict(list)
+    applied = {}
+    with transaction.atomic():
+        for kind in KINDS:
+            indexes = indexes_by_kind.get(kind)
+            if not indexes:
+                continue
+            model, vote_model, live_filters = engine.get_target(kind)
+            ids = sorted({items[index]['id'] for index in indexes})
+
+            targets = model.objects.filter(pk__in=ids, **live_filters).order_by('pk')
+            if kind == 'post':
+                targets = targets.select_related('community')
+            else:
+                # Karma rows record the comment's community
+                targets = targets.select_related('post')
+            if not buffer.is_enabled():
+                targets = targets.select_for_update(of=('self',))
+            targets = {obj.pk: obj for obj in targets}
+            votes = _lock_votes(vote_model, kind, user, ids)
+
+            original = {object_id: vote.vote_type for object_id, vote in votes.items()}
+            current = dict(original)
+            # (result, outcome) per applied item of each object, in order
+            outcomes = defaultdict(list)
+            for index in indexes:
+                item = items[index]
+                object_id, vote_type = item['id'], item['vote_type']
+                result = {'kind': kind, 'id': object_id, 'vote_type': vote_type}
+                results[index] = result
+                if object_id not in targets:
+                    result['error'] = f'{kind.capitalize()} not found'
+                    continue
+                previous = current.get(object_id)
+                outcome = engine.describe(kind, vote_type, previous)
+                current[object_id] = None if previous == vote_type else vote_type
+                outcomes[object_id].append((result, outcome))
+
+            removed = [
+                votes[object_id].pk for object_id, vote_type in current.items()
+                if vote_type is None and original.get(object_id)
+            ]
+            if removed:
+                vote_model.objects.filter(pk__in=removed).delete()
+            switched = defaultdict(list)
+            for object_id, vote_type in current.items():
+                if vote_type is not None and original.get(object_id) not in (None, vote_type):
+                    switched[vote_type].append(votes[object_id].pk)
+            for vote_type, vote_ids in sorted(switched.items()):
+                vote_model.objects.filter(pk__in=vote_ids).update(vote_type=vote_type)
+            conflicts = _insert_votes(vote_model, kind, user, {
+                object_id: vote_type for object_id, vote_type in current.items()
+                if vote_type is not None and original.get(object_id) is None
+            })
+
+            changes = defaultdict(lambda: [0, 0, 0])
+            for object_id, applied_items in outcomes.items():
+                for result, outcome in applied_items:
+                    if object_id in conflicts:
+                        result['error'] = 'Vote already recorded'
+                        continue
+                    change = changes[object_id]
+                    change[0] += outcome.delta
+                    change[1] += outcome.ups
+                    change[2] += outcome.downs
+                    karma.append(KarmaTransaction(
+                        user_id=targets[object_id].author_id,
+                        delta=outcome.delta,
+                        reason=outcome.reason,
+                        **{kind: targets[object_id]}
+                    ))
+                    entries[kind].append((targets[object_id], outcome, karma[-1]))
+                    result['message'] = outcome.message
+
+            changes = {object_id: change for object_id, change in changes.items() if any(change)}
+            applied[kind] = (model, targets, changes)
+
+        # Ledger rows first: buffered deltas take their timestamps
+        KarmaTransaction.bulk_log_karma_changes(karma, update_cache=not buffer.is_enabled())
+
+        scores = {}
+        for kind, (model, targets, changes) in applied.items():
+            if not changes:
+                continue
+            if buffer.is_enabled():
+                provisional = buffer.record_changes(kind, entries[kind])
+                scores.update({(kind, object_id): score for object_id, score in provisional.items()})
+                continue
+            model.objects.filter(pk__in=changes).update(
+                vote_score=F('vote_score') + _grouped(changes, 0),
+                ups=F('ups') + _grouped(changes, 1),
+                downs=F('downs') + _grouped(changes, 2),
+            )
+            updated = model.objects.in_bulk(list(changes))
+            for obj in updated.values():
+                obj.set_vote_ranks()
+            model.objects.bulk_update(updated.values(), model.VOTE_RANK_FIELDS)
+            for object_id, obj in updated.items():
+                scores[kind, object_id] = obj.vote_score
+                # Carry the fresh values onto the objects used below
+                targets[object_id].vote_score = obj.vote_score
+                for field in model.VOTE_RANK_FIELDS:
+                    setattr(targets[object_id], field, getattr(obj, field))
+
+        if not buffer.is_enabled():
+            _refresh_derived_state(applied)
+
+    for result in results:
+        if 'error' in result:
+            continue
+        key = (result['kind'], result['id'])
+        _, targets, _ = applied[result['kind']]
+        result['vote_score'] = scores.get(key, targets[result['id']].vote_score)
+        if buffer.is_enabled():
+            result['provisional'] = True
+    return results
+
+
+def _refresh_derived_state(applied):
+    """Rollups, feed index, version stamps and response cache for voted objects."""
+    from apps.core import response_cache, versioning
+    from apps.posts import feed_index
+    from apps.posts.models import PostVoteRollup
+
+    if 'post' in applied:
+        _, targets, changes = applied['post']
+        scopes = set()
+        for post_id in sorted(changes):
+            post = targets[post_id]
+            PostVoteRollup.record(post_id, changes[post_id][0])
+            feed_index.update_post(post, ['top', 'hot'])
+            scopes.update(response_cache.feed_scopes(post.community.slug))
+        versioning.bump(*[versioning.post_key(post_id) for post_id in sorted(changes)])
+        response_cache.invalidate(*sorted(scopes))
+    if 'comment' in applied:
+        _, targets, changes = applied['comment']
+        thread_ids = sorted({targets[comment_id].post_id for comment_id in changes})
+        versioning.bump(*[versioning.thread_key(post_id) for post_id in thread_ids])
+        response_cache.invalidate(*[response_cache.thread_scope(post_id) for post_id in thread_ids])
@@ -0,0 +1,235 @@
+"""
+Write-behind vote aggregation.
+
+Synchronous voting updates ``Post.vote_score`` (or ``Comment.vote_score``)
+and the author's ``User.karma`` in the voting transaction. On a viral post
+every voter then queues behind the same two row locks. With
+``settings.VOTE_WRITE_BEHIND`` enabled, the vote views still write the vote
+row, the ``KarmaTransaction`` ledger row and its hourly karma rollups
+synchronously, so whole-hour rollups keep matching the ledger (see
+apps.users.karma). Score and cached karma changes are appended to
+``VoteDelta`` instead.
+
+``flush()`` (run by the ``flush_vote_deltas`` command) drains the buffer in
+batches. For each batch it sums the deltas and issues one UPDATE per post,
+comment and author, then refreshes the derived state the synchronous path
+maintains: vote ranks, post vote rollups, feed index, leaderboards,
+version stamps and the response cache. Deltas whose post or comment was
+deleted before the flush still credit the author's karma.
+
+Until a flush lands, responses report a provisional score. That is the
+stored score plus the pending deltas, tracked per object in a cache
+counter so reading it never touches the buffer table. The voted post's (or
+comment thread's) version stamp is bumped as soon as the vote commits, since
+the voter's ``user_vote`` has changed even though the score has not.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import VoteDelta
+
+
+def is_enabled():
+    return getattr(settings, 'VOTE_WRITE_BEHIND', False)
+
+
+def _pending_key(target, object_id):
+    return f'vote-pending:{target}:{object_id}'
+
+
+def _add_pending(target, object_id, delta):
+    key = _pending_key(target, object_id)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def get_pending(target, object_id):
+    """Return the buffered, not yet flushed score change of an object."""
+    return cache.get(_pending_key(target, object_id), 0)
+
+
+def _bump_stamps(target, objects):
+    """Bump the version stamps showing ``objects`` once the vote commits."""
+    from apps.core import versioning
+
+    if target == 'post':
+        keys = [versioning.post_key(obj.pk) for obj in objects]
+    else:
+        keys = [versioning.thread_key(obj.post_id) for obj in objects]
+    keys = sorted(set(keys))
+    transaction.on_commit(lambda: versioning.bump(*keys))
+
+
+def record_vote(target, obj, outcome):
+    """
+    Buffer a vote's score and karma change; return the provisional score.
+
+    ``target`` is ``'post'`` or ``'comment'``, ``obj`` the voted object and
+    ``outcome`` the ``VoteOutcome`` from the vote engine.
+    Must run inside the vote's transaction so the buffered row commits or
+    rolls back with the vote itself.
+    """
+    from apps.users.models import KarmaTransaction
+
+    karma = KarmaTransaction.log_karma_change(
+        user=obj.author_id,
+        delta=outcome.delta,
+        reason=outcome.reason,
+        update_cache=False,
+        **{target: obj}
+    )
+    VoteDelta.objects.create(
+        author_id=obj.author_id,
+        delta=outcome.delta,
+        ups=outcome.ups,
+        downs=outcome.downs,
+        created_at=karma.created_at,
+        **{target: obj}
+    )
+
+    provisional = obj.vote_score + get_pending(target, obj.pk) + outcome.delta
+    transaction.on_commit(lambda: _add_pending(target, obj.pk, outcome.delta))
+    _bump_stamps(target, [obj])
+    return provisional
+
+
+def record_changes(target, entries):
+    """
+    Buffer a batch of votes on ``target`` objects; return provisional scores.
+
+    ``entries`` are ``(obj, outcome, karma)`` triples, ``karma`` being the
+    vote's saved KarmaTransaction (written by the caller). Changes are
+    summed into one VoteDelta row per object and ledger hour.
+    """
+    from apps.users.models import KarmaHourlyBucket
+
+    grouped = {}
+    for obj, outcome, karma in entries:
+        key = (obj.pk, KarmaHourlyBucket.hour_of(karma.created_at))
+        if key not in grouped:
+            grouped[key] = VoteDelta(
+                author_id=obj.author_id, delta=0, ups=0, downs=0,
+                created_at=karma.created_at, **{target: obj}
+            )
+        delta = grouped[key]
+        delta.delta += outcome.delta
+        delta.ups += outcome.ups
+        delta.downs += outcome.downs
+    VoteDelta.objects.bulk_create(grouped.values())
+
+    objects = {obj.pk: obj for obj, _, _ in entries}
+    changes = defaultdict(int)
+    for delta in grouped.values():
+        changes[getattr(delta, f'{target}_id')] += delta.delta
+    provisional = {
+        object_id: objects[object_id].vote_score + get_pending(target, object_id) + change
+        for object_id, change in changes.items()
+    }
+
+    def add_pending():
+        for object_id, change in changes.items():
+            _add_pending(target, object_id, change)
+    transaction.on_commit(add_pending)
+    _bump_stamps(target, objects.values())
+    return provisional
+
+
+def flush(batch_size=1000):
+    """
+    Apply up to ``batch_size`` buffered deltas; return how many were applied.
+
+    Concurrent flushers skip each other's rows where the database supports
+    ``SKIP LOCKED``. Objects and authors are updated in primary key order
+    so two flushers never wait on each other in opposite orders.
+    """
+    from apps.comments.models import Comment
+    from apps.core import response_cache, versioning
+    from apps.posts import feed_index
+    from apps.posts.models import Post, PostVoteRollup
+    from apps.users import leaderboard
+    from apps.users.models import User
+
+    with transaction.atomic():
+        rows = list(
+            VoteDelta.objects.select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list(
+                'id', 'post_id', 'comment_id', 'author_id', 'delta', 'ups', 'downs', 'created_at'
+            )[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        # (score, ups, downs) change per object
+        post_changes = defaultdict(lambda: [0, 0, 0])
+        comment_changes = defaultdict(lambda: [0, 0, 0])
+        author_deltas = defaultdict(int)
+        rollups = defaultdict(int)
+        for _, post_id, comment_id, author_id, delta, ups, downs, created_at in rows:
+            author_deltas[author_id] += delta
+            if post_id:
+                changes = post_changes[post_id]
+                rollups[post_id, created_at.replace(minute=0, second=0, microsecond=0)] += delta
+            elif comment_id:
+                changes = comment_changes[comment_id]
+            else:
+                # The object is gone; only the author's karma is still owed
+                continue
+            changes[0] += delta
+            changes[1] += ups
+            changes[2] += downs
+
+        for model, object_changes in ((Post, post_changes), (Comment, comment_changes)):
+            for object_id in sorted(object_changes):
+                delta, ups, downs = object_changes[object_id]
+                model.objects.filter(pk=object_id).update(
+                    vote_score=F('vote_score') + delta,
+                    ups=F('ups') + ups,
+                    downs=F('downs') + downs,
+                )
+        for author_id in sorted(author_deltas):
+            User.objects.filter(pk=author_id).update(karma=F('karma') + author_deltas[author_id])
+        leaderboard.karma_changed(author_deltas)
+        for (post_id, bucket), delta in sorted(rollups.items()):
+            PostVoteRollup.record(post_id, delta, when=bucket)
+
+        for post in Post.objects.filter(pk__in=post_changes).select_related('community'):
+            post.update_vote_ranks()
+            feed_index.update_post(post, ['top', 'hot'])
+            versioning.bump(versioning.post_key(post.pk))
+            response_cache.invalidate(*response_cache.feed_scopes(post.community.slug))
+        thread_ids = set()
+        for comment in Comment.objects.filter(pk__in=comment_changes):
+            comment.update_vote_ranks()
+            thread_ids.add(comment.post_id)
+        for post_id in sorted(thread_ids):
+            versioning.bump(versioning.thread_key(post_id))
+            response_cache.invalidate(response_cache.thread_scope(post_id))
+
+        VoteDelta.objects.filter(pk__in=[row[0] for row in rows]).delete()
+
+        def settle_pending():
+            for post_id, changes in post_changes.items():
+                _add_pending('post', post_id, -changes[0])
+            for comment_id, changes in comment_changes.items():
+                _add_pending('comment', comment_id, -changes[0])
+        transaction.on_commit(settle_pending)
+
+    return len(rows)
+
+
+def flush_all(batch_size=1000):
+    """Drain the whole buffer; return the number of deltas applied."""
+    total = 0
+    while True:
+        applied = flush(batch_size)
+        total += applied
+        if applied < batch_size:
+            return total
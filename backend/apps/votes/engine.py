@@ -0,0 +1,238 @@
+"""
+Vote engine shared by vote_post and vote_comment.
+
+Casting a vote has two steps:
+
+- ``toggle()`` applies the toggle/switch rules to the vote row and returns
+  the caller's previous vote (``None`` if there was none). Voting the same
+  way again removes the vote, voting the other way switches it, and a
+  first vote creates it.
+- ``apply_score()`` adds the resulting delta to the object's ``vote_score``
+  and ``ups``/``downs`` counters, stores the ranks derived from them
+  (``VOTE_RANK_FIELDS``) and returns the updated object, a post with its
+  community loaded.
+
+On PostgreSQL each step is a single statement. ``toggle()`` runs
+``DELETE ... RETURNING`` for a repeated vote, otherwise
+``INSERT ... ON CONFLICT DO UPDATE ... RETURNING``. ``apply_score()`` runs
+one ``UPDATE ... FROM community ... RETURNING`` that also computes the hot
+rank, Wilson bound and controversy in SQL (see apps.votes.scoring), so the
+hot row is written once and there is no lock-then-read round trip, no
+``refresh_from_db()`` and no second UPDATE for the ranks. Other databases
+(SQLite in development) use the portable ORM implementation with the same
+semantics.
+"""
+from typing import NamedTuple
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import scoring
+
+VOTE_VALUES = {'up': 1, 'down': -1}
+
+
+class VoteConflict(Exception):
+    """An identical vote by the same user was committed concurrently."""
+
+
+class VoteOutcome(NamedTuple):
+    delta: int
+    ups: int
+    downs: int
+    reason: str
+    message: str
+
+
+def count_changes(vote_type, previous):
+    """Return the ``(ups, downs)`` counter changes for a cast vote."""
+    ups = downs = 0
+    if previous == 'up':
+        ups -= 1
+    elif previous == 'down':
+        downs -= 1
+    if previous != vote_type:
+        if vote_type == 'up':
+            ups += 1
+        else:
+            downs += 1
+    return ups, downs
+
+
+def describe(target, vote_type, previous):
+    """Return the score and counter changes, karma reason and message for a cast vote."""
+    value = VOTE_VALUES[vote_type]
+    ups, downs = count_changes(vote_type, previous)
+    if previous == vote_type:
+        # Same vote - remove it (toggle off)
+        return VoteOutcome(-value, ups, downs, f'{target}_{vote_type}vote_removed', 'Vote removed')
+    if previous is not None:
+        # Different vote - swing of 2: remove old + add new
+        return VoteOutcome(2 * value, ups, downs, f'{target}_{vote_type}vote', 'Vote updated')
+    return VoteOutcome(value, ups, downs, f'{target}_{vote_type}vote', 'Vote recorded')
+
+
+def get_target(target):
+    """Return ``(model, vote_model, live_filters)`` for ``'post'``/``'comment'``."""
+    if target == 'post':
+        from apps.posts.models import Post, PostVote
+        return Post, PostVote, {}
+    from apps.comments.models import Comment, CommentVote
+    return Comment, CommentVote, {'is_deleted': False}
+
+
+def rank_columns_sql(model, table):
+    """
+    ``{column: SQL}`` computing ``model.VOTE_RANK_FIELDS`` from the counters
+    as changed by ``%(delta)s``/``%(ups)s``/``%(downs)s``. UPDATE reads the
+    old row on the right-hand side, so the new values are spelled out.
+    """
+    from apps.posts.ranking import hot_rank_sql
+
+    ups = f'({table}.ups + %(ups)s)'
+    downs = f'({table}.downs + %(downs)s)'
+    columns = {
+        'wilson_lower_bound': scoring.wilson_lower_bound_sql(ups, downs),
+        'controversy': scoring.controversy_sql(ups, downs),
+    }
+    if 'hot_rank' in model.VOTE_RANK_FIELDS:
+        columns['hot_rank'] = hot_rank_sql(f'({table}.vote_score + %(delta)s)', f'{table}.created_at')
+    return columns
+
+
+class VoteEngine:
+    """Portable ORM implementation."""
+
+    def __init__(self, target):
+        self.target = target
+        self.model, self.vote_model, self.live_filters = get_target(target)
+
+    def toggle(self, user, object_id, vote_type):
+        lookup = {'user': user, f'{self.target}_id': object_id}
+        existing = self.vote_model.objects.select_for_update().filter(**lookup).first()
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    self.vote_model.objects.create(vote_type=vote_type, **lookup)
+            except IntegrityError:
+                raise VoteConflict
+            return None
+        previous = existing.vote_type
+        if previous == vote_type:
+            existing.delete()
+        else:
+            existing.vote_type = vote_type
+            existing.save(update_fields=['vote_type'])
+        return previous
+
+    def apply_score(self, object_id, delta, ups, downs):
+        objects = self.model.objects.filter(pk=object_id, **self.live_filters)
+        changes = {
+            'vote_score': F('vote_score') + delta,
+            'ups': F('ups') + ups,
+            'downs': F('downs') + downs,
+        }
+        if not objects.update(**changes):
+            raise self.model.DoesNotExist
+        if self.target == 'post':
+            objects = objects.select_related('community')
+        obj = objects.get()
+        obj.update_vote_ranks()
+        return obj
+
+
+class PostgresVoteEngine(VoteEngine):
+    """One statement per step using RETURNING."""
+
+    def toggle(self, user, object_id, vote_type):
+        table = self.vote_model._meta.db_table
+        column = self.vote_model._meta.get_field(self.target).column
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} '
+                f'WHERE user_id = %s AND {column} = %s AND vote_type = %s '
+                'RETURNING vote_type',
+                [user.pk, object_id, vote_type],
+            )
+            if cursor.fetchone():
+                return vote_type
+            # xmax is 0 only on a freshly inserted row; the WHERE makes
+            # ON CONFLICT return nothing if the same vote already exists
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, {column}, vote_type, created_at) '
+                'VALUES (%s, %s, %s, %s) '
+                f'ON CONFLICT (user_id, {column}) DO UPDATE SET vote_type = EXCLUDED.vote_type '
+                f'WHERE {table}.vote_type <> EXCLUDED.vote_type '
+                'RETURNING (xmax = 0)',
+                [user.pk, object_id, vote_type, timezone.now()],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise VoteConflict
+        if row[0]:
+            return None
+        return 'down' if vote_type == 'up' else 'up'
+
+    def apply_score(self, object_id, delta, ups, downs):
+        meta = self.model._meta
+        table = meta.db_table
+        params = {'delta': delta, 'ups': ups, 'downs': downs, 'id': object_id}
+        assignments = [
+            f'vote_score = {table}.vote_score + %(delta)s',
+            f'ups = {table}.ups + %(ups)s',
+            f'downs = {table}.downs + %(downs)s',
+        ]
+        assignments += [
+            f'{column} = {sql}' for column, sql in rank_columns_sql(self.model, table).items()
+        ]
+        returning = [f'{table}.{field.column}' for field in meta.concrete_fields]
+        where = [f'{table}.id = %(id)s']
+        for name, value in self.live_filters.items():
+            where.append(f'{table}.{name} = %(live_{name})s')
+            params[f'live_{name}'] = value
+        source = ''
+        if self.target == 'post':
+            # Join the community so callers get its slug without another query
+            community = meta.get_field('community').related_model._meta.db_table
+            source = f' FROM {community}'
+            where.append(f'{community}.id = {table}.community_id')
+            returning.append(f'{community}.slug AS community_slug')
+        updated = list(self.model.objects.raw(
+            f'UPDATE {table} SET {", ".join(assignments)}{source} '
+            f'WHERE {" AND ".join(where)} RETURNING {", ".join(returning)}',
+            params,
+        ))
+        if not updated:
+            raise self.model.DoesNotExist
+        obj = updated[0]
+        if self.target == 'post':
+            # Only the slug is loaded; it is all the vote views read
+            community_model = meta.get_field('community').related_model
+            obj.community = community_model(pk=obj.community_id, slug=obj.community_slug)
+        return obj
+
+
+def get_vote_engine(target):
+    if connection.vendor == 'postgresql':
+        return PostgresVoteEngine(target)
+    return VoteEngine(target)
+
+
+def cast_vote(target, user, object_id, vote_type):
+    """Apply ``user``'s vote to the vote row; return its ``VoteOutcome``."""
+    previous = get_vote_engine(target).toggle(user, object_id, vote_type)
+    return describe(target, vote_type, previous)
+
+
+def apply_score(target, object_id, outcome):
+    """
+    Apply a ``VoteOutcome`` to the object's score, vote counters and the
+    ranks derived from them, and return the updated object.
+
+    Raises the model's ``DoesNotExist`` for a missing (or deleted) object;
+    raised inside the vote's transaction, this also rolls the vote back.
+    """
+    return get_vote_engine(target).apply_score(
+        object_id, outcome.delta, outcome.ups, outcome.downs
+    )
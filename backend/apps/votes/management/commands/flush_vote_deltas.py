@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.votes import buffer
+
+
+class Command(BaseCommand):
+    """
+    Apply buffered write-behind vote deltas.
+
+    Only needed with VOTE_WRITE_BEHIND enabled. Run it once from a
+    scheduler, or keep one (or several) running with --interval; each
+    flush applies one UPDATE per voted object and author in the batch.
+    """
+
+    help = 'Fold buffered vote deltas into post/comment scores and author karma.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of buffered deltas applied per transaction (default: 1000).'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Keep running, flushing every N seconds, instead of draining once.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        interval = options['interval']
+        if interval is None:
+            applied = buffer.flush_all(batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Applied {applied} buffered vote deltas.'))
+            return
+
+        while True:
+            applied = buffer.flush_all(batch_size)
+            if applied:
+                self.stdout.write(f'Applied {applied} buffered vote deltas.')
+            time.sleep(interval)
@@ -0,0 +1,99 @@
+"""
+Per-request vote maps for the ``user_vote`` serializer field.
+
+Looking up the caller's vote with ``obj.votes.filter(user=...)`` costs one
+query per serialized object. Instead, the list serializer collects the ids
+of every object on the page (including prefetched nested replies), loads
+the caller's votes for all of them with a single ``IN`` query, and shares
+the resulting ``{object_id: vote_type}`` map through the serializer context.
+"""
+from rest_framework import serializers
+
+
+def load_vote_map(vote_model, target, user, object_ids):
+    """
+    Return ``{object_id: vote_type}`` for ``user``'s votes on ``object_ids``.
+
+    Objects the user has not voted on map to ``None`` so callers can tell a
+    loaded "no vote" apart from an object that was never looked up.
+    """
+    object_ids = set(object_ids)
+    if not object_ids:
+        return {}
+    vote_map = dict.fromkeys(object_ids)
+    vote_map.update(
+        vote_model.objects.filter(
+            user=user,
+            **{f'{target}_id__in': object_ids}
+        ).values_list(f'{target}_id', 'vote_type')
+    )
+    return vote_map
+
+
+class VoteMapListSerializer(serializers.ListSerializer):
+    """List serializer that loads the caller's votes for the whole page at once."""
+
+    def to_representation(self, data):
+        if not isinstance(data, list):
+            # Evaluate querysets/managers once so the same instances are
+            # used for collecting ids and for serializing
+            data = list(data.all() if hasattr(data, 'all') else data)
+        self.child.load_user_votes(data)
+        return super().to_representation(data)
+
+
+class UserVoteMixin:
+    """
+    Serializer mixin providing ``get_user_vote`` backed by a shared vote map.
+
+    Subclasses set ``vote_model`` (e.g. ``PostVote``), ``vote_target`` (the
+    vote's foreign key to the object, e.g. ``'post'``) and optionally
+    ``vote_children``, the prefetched relation whose objects should be
+    included in the same lookup (e.g. ``'replies'`` for threaded comments).
+    Their ``Meta.list_serializer_class`` should be ``VoteMapListSerializer``.
+    """
+
+    vote_model = None
+    vote_target = None
+    vote_children = None
+
+    @property
+    def vote_map_key(self):
+        return f'{self.vote_target}_votes'
+
+    def get_request_user(self):
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return request.user
+        return None
+
+    def collect_vote_ids(self, instances, ids):
+        for obj in instances:
+            ids.add(obj.pk)
+            if self.vote_children:
+                prefetched = getattr(obj, '_prefetched_objects_cache', {})
+                if self.vote_children in prefetched:
+                    self.collect_vote_ids(prefetched[self.vote_children], ids)
+        return ids
+
+    def load_user_votes(self, instances):
+        """Load votes for ``instances`` that are not already in the shared map."""
+        user = self.get_request_user()
+        if user is None or 'user_vote' not in self.fields:
+            return
+        vote_map = self.context.setdefault(self.vote_map_key, {})
+        missing = self.collect_vote_ids(instances, set()) - vote_map.keys()
+        if missing:
+            vote_map.update(load_vote_map(self.vote_model, self.vote_target, user, missing))
+
+    def get_user_vote(self, obj):
+        """Get the current user's vote on this object."""
+        user = self.get_request_user()
+        if user is None:
+            return None
+        vote_map = self.context.get(self.vote_map_key)
+        if vote_map is None or obj.pk not in vote_map:
+            # Single-object serialization: one indexed lookup
+            self.load_user_votes([obj])
+            vote_map = self.context[self.vote_map_key]
+        return vote_map.get(obj.pk)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='votedelta',
+            name='downs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='votedelta',
+            name='ups',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votes', '0002_votedelta_vote_counts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='votedelta',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0005_comment_reply_counts'),
+        ('posts', '0009_recount_live_comments'),
+        ('votes', '0003_votedelta_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='votedelta',
+            name='comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pending_vote_deltas', to='comments.comment'),
+        ),
+        migrations.AlterField(
+            model_name='votedelta',
+            name='post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pending_vote_deltas', to='posts.post'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import models
+from django.conf import settings
+from django.utils import timezone
+
+
+class VoteDelta(models.Model):
+    """
+    Append-only buffer of pending score and karma changes.
+    
+    In write-behind mode (settings.VOTE_WRITE_BEHIND) the vote views insert
+    one row here instead of updating the hot Post/Comment and User rows.
+    The flush_vote_deltas command folds the buffer in batches: one UPDATE
+    per voted object and per author, then deletes the flushed rows.
+    
+    The karma is owed to the author even if the voted object is deleted
+    before the flush, so the target is only nulled out and the author's
+    share is still applied.
+    """
+    
+    post = models.ForeignKey(
+        'posts.Post',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='pending_vote_deltas'
+    )
+    comment = models.ForeignKey(
+        'comments.Comment',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='pending_vote_deltas'
+    )
+    # Author of the voted object, whose cached karma receives the delta
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='pending_vote_deltas'
+    )
+    delta = models.IntegerField()
+    # Changes to the object's ups/downs counters
+    ups = models.IntegerField(default=0)
+    downs = models.IntegerField(default=0)
+    # Time of the matching KarmaTransaction, so the flusher rolls karma into
+    # the same hourly bucket the ledger row falls in
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        # The flusher drains the buffer in primary key order
+        ordering = ['id']
+    
+    def __str__(self):
+        if self.post_id:
+            target = f"post {self.post_id}"
+        elif self.comment_id:
+            target = f"comment {self.comment_id}"
+        else:
+            target = "deleted target"
+        return f"{target}: {self.delta:+d}"
@@ -0,0 +1,70 @@
+"""
+Vote-count based scores stored on Post and Comment.
+
+Both are functions of the stored ``ups``/``downs`` counters only, so they
+are recomputed whenever a vote changes those counters and served straight
+from an index, with no vote aggregation at read time.
+
+The ``*_sql()`` variants build the same formulas as PostgreSQL expressions
+over SQL operands, so the vote engine can store them in the UPDATE that
+changes the counters (see apps.votes.engine.PostgresVoteEngine).
+"""
+from math import sqrt
+
+# z for an 80% confidence interval
+WILSON_Z = 1.281551565545
+
+
+def wilson_lower_bound(ups, downs, z=WILSON_Z):
+    """
+    Lower bound of the Wilson score interval for the fraction of upvotes.
+
+    Ranks "best" by how confident we are that an item is liked: 10 up and
+    1 down beats 1 up and 0 down, even though the latter has no downvotes.
+    """
+    n = ups + downs
+    if n <= 0:
+        return 0.0
+    phat = ups / n
+    return round(
+        (phat + z * z / (2 * n) - z * sqrt((phat * (1 - phat) + z * z / (4 * n)) / n))
+        / (1 + z * z / n),
+        12,
+    )
+
+
+def controversy(ups, downs):
+    """
+    Many votes, evenly split: magnitude raised to the balance of the split.
+
+    Zero unless an item has both up and downvotes.
+    """
+    if ups <= 0 or downs <= 0:
+        return 0.0
+    magnitude = ups + downs
+    balance = downs / ups if ups > downs else ups / downs
+    return round(magnitude ** balance, 12)
+
+
+def wilson_lower_bound_sql(ups, downs, z=WILSON_Z):
+    """``wilson_lower_bound()`` as a PostgreSQL expression over ``ups``/``downs`` SQL."""
+    n = f'({ups} + {downs})'
+    phat = f'({ups}::float8 / NULLIF({n}, 0))'
+    zz = f'{z * z!r}'
+    return (
+        f'CASE WHEN {n} <= 0 THEN 0 ELSE ROUND(('
+        f'({phat} + {zz} / (2 * {n}) - {z!r} * SQRT(({phat} * (1 - {phat}) + {zz} / (4 * {n})) / {n}))'
+        f' / (1 + {zz} / {n}))::numeric, 12)::float8 END'
+    )
+
+
+def controversy_sql(ups, downs):
+    """``controversy()`` as a PostgreSQL expression over ``ups``/``downs`` SQL."""
+    balance = (
+        f'CASE WHEN {ups} > {downs} THEN {downs}::float8 / {ups} '
+        f'ELSE {ups}::float8 / NULLIF({downs}, 0) END'
+    )
+    return (
+        f'CASE WHEN {ups} <= 0 OR {downs} <= 0 THEN 0 '
+        f'ELSE ROUND(POWER(({ups} + {downs})::float8, {balance})::numeric, 12)::float8 END'
+    )
@@ -0,0 +1,18 @@
+from rest_framework import serializers
+
+# Upper bound on votes per batch request
+MAX_BATCH_SIZE = 100
+
+
+class BatchVoteItemSerializer(serializers.Serializer):
+    """One vote in a batch."""
+    
+    kind = serializers.ChoiceField(choices=['post', 'comment'])
+    id = serializers.IntegerField(min_value=1)
+    vote_type = serializers.ChoiceField(choices=['up', 'down'])
+
+
+class BatchVoteSerializer(serializers.Serializer):
+    """Serializer for batch voting: ``{"votes": [{kind, id, vote_type}, ...]}``."""
+    
+    votes = BatchVoteItemSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_SIZE)
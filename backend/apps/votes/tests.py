@@ -0,0 +1,350 @@
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from apps.comments.models import Comment, CommentVote
+from apps.communities.models import Community
+from apps.core.reconcile import reconcile_range
+from apps.posts.models import Post, PostVote, PostVoteRollup
+from apps.users import karma, leaderboard
+from apps.users.models import CommunityKarmaBucket, KarmaHourlyBucket, KarmaTransaction, User
+from . import batch, buffer, engine
+from .models import VoteDelta
+
+
+class VoteTestMixin:
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='pw')
+        self.voter = User.objects.create_user(username='voter', email='voter@example.com', password='pw')
+        self.community = Community.objects.create(name='Python', slug='python', creator=self.author)
+        self.post = Post.objects.create(title='Hello', author=self.author, community=self.community)
+        self.comment = Comment.objects.create(content='Hi', author=self.author, post=self.post)
+
+
+class VoteSemanticsTests(VoteTestMixin, APITestCase):
+    """First vote, toggle off and switch, through the vote views."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.voter)
+
+    def vote(self, url, vote_type):
+        return self.client.post(url, {'vote_type': vote_type}, format='json')
+
+    def assert_state(self, obj, score, ups, downs):
+        obj.refresh_from_db()
+        self.assertEqual((obj.vote_score, obj.ups, obj.downs), (score, ups, downs))
+
+    def assert_last_karma(self, delta, reason):
+        karma = KarmaTransaction.objects.filter(user=self.author).latest('id')
+        self.assertEqual((karma.delta, karma.reason), (delta, reason))
+
+    def check_semantics(self, target, obj, url, vote_model):
+        response = self.vote(url, 'up')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], 'Vote recorded')
+        self.assertEqual(response.data['vote_score'], 1)
+        self.assert_state(obj, 1, 1, 0)
+        self.assert_last_karma(1, f'{target}_upvote')
+        self.assertEqual(vote_model.objects.get(user=self.voter).vote_type, 'up')
+
+        # Switch: a swing of two
+        response = self.vote(url, 'down')
+        self.assertEqual(response.data['message'], 'Vote updated')
+        self.assertEqual(response.data['vote_score'], -1)
+        self.assert_state(obj, -1, 0, 1)
+        self.assert_last_karma(-2, f'{target}_downvote')
+        self.assertEqual(vote_model.objects.get(user=self.voter).vote_type, 'down')
+
+        # Same vote again: toggle off
+        response = self.vote(url, 'down')
+        self.assertEqual(response.data['message'], 'Vote removed')
+        self.assertEqual(response.data['vote_score'], 0)
+        self.assert_state(obj, 0, 0, 0)
+        self.assert_last_karma(1, f'{target}_downvote_removed')
+        self.assertFalse(vote_model.objects.filter(user=self.voter).exists())
+
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.karma, 0)
+        self.assertEqual(KarmaTransaction.objects.filter(user=self.author).count(), 3)
+
+    def test_vote_stores_the_derived_ranks(self):
+        self.vote(f'/api/posts/{self.post.pk}/vote/', 'up')
+        self.post.refresh_from_db()
+        stored = [getattr(self.post, field) for field in Post.VOTE_RANK_FIELDS]
+        self.post.set_vote_ranks()
+        self.assertEqual(stored, [getattr(self.post, field) for field in Post.VOTE_RANK_FIELDS])
+        self.assertGreater(self.post.wilson_lower_bound, 0)
+
+    def test_post_votes(self):
+        self.check_semantics('post', self.post, f'/api/posts/{self.post.pk}/vote/', PostVote)
+
+    def test_comment_votes(self):
+        self.check_semantics('comment', self.comment, f'/api/comments/{self.comment.pk}/vote/', CommentVote)
+
+    def test_missing_post_is_404_and_rolls_the_vote_back(self):
+        response = self.vote('/api/posts/999999/vote/', 'up')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(PostVote.objects.exists())
+        self.assertFalse(KarmaTransaction.objects.exists())
+
+    def test_deleted_comment_is_404_and_rolls_the_vote_back(self):
+        self.comment.soft_delete()
+        response = self.vote(f'/api/comments/{self.comment.pk}/vote/', 'up')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(CommentVote.objects.exists())
+        self.assertFalse(KarmaTransaction.objects.exists())
+        self.assert_state(self.comment, 0, 0, 0)
+
+    def test_concurrent_identical_vote_is_409(self):
+        with mock.patch.object(engine.VoteEngine, 'toggle', side_effect=engine.VoteConflict):
+            response = self.vote(f'/api/posts/{self.post.pk}/vote/', 'up')
+        self.assertEqual(response.status_code, 409)
+        self.assert_state(self.post, 0, 0, 0)
+        self.assertFalse(KarmaTransaction.objects.exists())
+
+
+class VoteEngineTests(VoteTestMixin, TestCase):
+
+    def test_insert_racing_an_identical_vote_raises_conflict(self):
+        PostVote.objects.create(user=self.voter, post=self.post, vote_type='up')
+        # The row was not there when toggle() looked, but is by the insert
+        with mock.patch.object(QuerySet, 'first', return_value=None):
+            with self.assertRaises(engine.VoteConflict):
+                engine.VoteEngine('post').toggle(self.voter, self.post.pk, 'up')
+        self.assertEqual(PostVote.objects.get(user=self.voter).vote_type, 'up')
+
+
+
+class BatchVoteTests(VoteTestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.voter)
+
+    def batch(self, *votes):
+        response = self.client.post(
+            '/api/votes/batch/',
+            [{'kind': kind, 'id': object_id, 'vote_type': vote_type} for kind, object_id, vote_type in votes],
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def assert_state(self, obj, score, ups, downs):
+        obj.refresh_from_db()
+        self.assertEqual((obj.vote_score, obj.ups, obj.downs), (score, ups, downs))
+
+    def assert_author_karma(self, karma):
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.karma, karma)
+        self.assertEqual(sum(KarmaTransaction.objects.values_list('delta', flat=True)), karma)
+
+    def test_repeated_vote_toggles_off(self):
+        results = self.batch(('post', self.post.pk, 'up'), ('post', self.post.pk, 'up'))
+        self.assertEqual([result['message'] for result in results], ['Vote recorded', 'Vote removed'])
+        self.assertEqual(results[-1]['vote_score'], 0)
+        self.assert_state(self.post, 0, 0, 0)
+        self.assertFalse(PostVote.objects.exists())
+        self.assert_author_karma(0)
+
+    def test_switches_within_one_batch(self):
+        results = self.batch(
+            ('post', self.post.pk, 'up'), ('post', self.post.pk, 'down'), ('post', self.post.pk, 'up'),
+        )
+        self.assertEqual(
+            [result['message'] for result in results], ['Vote recorded', 'Vote updated', 'Vote updated']
+        )
+        self.assert_state(self.post, 1, 1, 0)
+        self.assertEqual(PostVote.objects.get(user=self.voter).vote_type, 'up')
+        self.assert_author_karma(1)
+
+    def test_switch_of_an_existing_vote(self):
+        self.batch(('comment', self.comment.pk, 'up'))
+        results = self.batch(('comment', self.comment.pk, 'down'))
+        self.assertEqual(results[0]['message'], 'Vote updated')
+        self.assert_state(self.comment, -1, 0, 1)
+        self.assertEqual(CommentVote.objects.get(user=self.voter).vote_type, 'down')
+        self.assert_author_karma(-1)
+
+    def test_missing_ids_do_not_affect_other_items(self):
+        results = self.batch(
+            ('post', 999999, 'up'), ('comment', self.comment.pk, 'up'), ('comment', 999999, 'down'),
+        )
+        self.assertEqual(results[0]['error'], 'Post not found')
+        self.assertEqual(results[2]['error'], 'Comment not found')
+        self.assertEqual(results[1]['vote_score'], 1)
+        self.assert_state(self.comment, 1, 1, 0)
+        self.assert_author_karma(1)
+
+    def test_mixed_posts_and_comments(self):
+        results = self.batch(
+            ('comment', self.comment.pk, 'down'), ('post', self.post.pk, 'up'), ('comment', self.comment.pk, 'up'),
+        )
+        self.assertEqual([result['kind'] for result in results], ['comment', 'post', 'comment'])
+        self.assertEqual([result['vote_score'] for result in results], [1, 1, 1])
+        self.assert_state(self.post, 1, 1, 0)
+        self.assert_state(self.comment, 1, 1, 0)
+        self.assert_author_karma(2)
+
+    def test_vote_inserted_concurrently_is_a_conflict(self):
+        PostVote.objects.create(user=self.voter, post=self.post, vote_type='up')
+        # The row was not there when the batch locked the caller's votes
+        with mock.patch.object(batch, '_lock_votes', return_value={}):
+            results = self.batch(('post', self.post.pk, 'up'), ('comment', self.comment.pk, 'up'))
+        self.assertEqual(results[0]['error'], 'Vote already recorded')
+        self.assertNotIn('vote_score', results[0])
+        self.assertEqual(results[1]['vote_score'], 1)
+        self.assert_state(self.post, 0, 0, 0)
+        self.assertEqual(PostVote.objects.get(user=self.voter).vote_type, 'up')
+        self.assert_author_karma(1)
+
+
+@override_settings(VOTE_WRITE_BEHIND=True)
+class WriteBehindTests(VoteTestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.voter)
+
+    def vote(self, url, vote_type='up'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, {'vote_type': vote_type}, format='json')
+
+    def flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return buffer.flush_all()
+
+    def assert_karma_matches_ledger(self):
+        report = reconcile_range('user_karma', self.author.pk, self.author.pk + 1, dry_run=True)
+        self.assertEqual(report['drifted'], 0, report['samples'])
+
+    def test_vote_is_buffered_until_the_flush(self):
+        # Leaderboards are left to the flush, off the voting path
+        with mock.patch.object(leaderboard, 'karma_changed') as karma_changed:
+            response = self.vote(f'/api/posts/{self.post.pk}/vote/')
+        karma_changed.assert_not_called()
+        self.assertEqual((response.data['vote_score'], response.data['provisional']), (1, True))
+        self.assertEqual(PostVote.objects.get(user=self.voter).vote_type, 'up')
+        self.assertEqual(VoteDelta.objects.count(), 1)
+        self.post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.post.vote_score, self.author.karma), (0, 0))
+        self.assertEqual(buffer.get_pending('post', self.post.pk), 1)
+
+        self.assertEqual(self.flush(), 1)
+        self.post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.post.vote_score, self.post.ups, self.post.downs), (1, 1, 0))
+        self.assertEqual(self.author.karma, 1)
+        self.assertEqual(PostVoteRollup.objects.get(post=self.post).delta, 1)
+        self.assertFalse(VoteDelta.objects.exists())
+        self.assertEqual(buffer.get_pending('post', self.post.pk), 0)
+        self.assert_karma_matches_ledger()
+
+    def test_vote_moves_the_etag_before_the_flush(self):
+        for obj_url, vote_url in [
+            (f'/api/posts/{self.post.pk}/', f'/api/posts/{self.post.pk}/vote/'),
+            (f'/api/comments/post/{self.post.pk}/', f'/api/comments/{self.comment.pk}/vote/'),
+        ]:
+            etag = self.client.get(obj_url)['ETag']
+            self.vote(vote_url)
+            response = self.client.get(obj_url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, obj_url)
+            data = response.data.get('results', [response.data])[0]
+            self.assertEqual(data['user_vote'], 'up', obj_url)
+
+        etag = self.client.get(f'/api/posts/{self.post.pk}/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                '/api/votes/batch/', [{'kind': 'post', 'id': self.post.pk, 'vote_type': 'down'}], format='json'
+            )
+        response = self.client.get(f'/api/posts/{self.post.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['user_vote'], 'down')
+
+    def test_karma_buckets_are_written_with_the_ledger_row(self):
+        self.vote(f'/api/comments/{self.comment.pk}/vote/')
+        self.assertEqual(KarmaHourlyBucket.objects.get(user=self.author).delta, 1)
+        self.assertEqual(
+            CommunityKarmaBucket.objects.get(user=self.author, community=self.community).delta, 1
+        )
+        # The 24h total is exact before the flush, even once the hour is whole
+        later = KarmaTransaction.objects.get().created_at + karma.HOUR * 2
+        self.assertEqual(karma.karma_24h_totals([self.author.pk], now=later), {self.author.pk: 1})
+        self.flush()
+        self.assertEqual(KarmaHourlyBucket.objects.get(user=self.author).delta, 1)
+
+    def test_failed_flush_is_retried_without_double_counting(self):
+        self.vote(f'/api/posts/{self.post.pk}/vote/')
+        with mock.patch.object(PostVoteRollup, 'record', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.vote_score, 0)
+        self.assertEqual(VoteDelta.objects.count(), 1)
+
+        self.assertEqual(self.flush(), 1)
+        self.post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.post.vote_score, self.author.karma), (1, 1))
+        self.assertEqual(self.flush(), 0)
+
+    def test_deleted_target_still_credits_the_author(self):
+        self.vote(f'/api/comments/{self.comment.pk}/vote/')
+        self.vote(f'/api/posts/{self.post.pk}/vote/')
+        self.post.delete()
+        self.assertEqual(VoteDelta.objects.filter(post=None, comment=None).count(), 2)
+
+        self.assertEqual(self.flush(), 2)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.karma, 2)
+        self.assertEqual(KarmaHourlyBucket.objects.get(user=self.author).delta, 2)
+        self.assert_karma_matches_ledger()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'RETURNING-based engine needs PostgreSQL')
+class PostgresVoteEngineTests(VoteTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.engine = engine.PostgresVoteEngine('post')
+
+    def test_toggle_and_switch(self):
+        self.assertIsNone(self.engine.toggle(self.voter, self.post.pk, 'up'))
+        self.assertEqual(PostVote.objects.get(user=self.voter).vote_type, 'up')
+        self.assertEqual(self.engine.toggle(self.voter, self.post.pk, 'down'), 'up')
+        self.assertEqual(PostVote.objects.get(user=self.voter).vote_type, 'down')
+        self.assertEqual(self.engine.toggle(self.voter, self.post.pk, 'down'), 'down')
+        self.assertFalse(PostVote.objects.exists())
+
+    def test_apply_score_returns_the_updated_row(self):
+        post = self.engine.apply_score(self.post.pk, 1, 1, 0)
+        self.assertEqual((post.vote_score, post.ups, post.downs), (1, 1, 0))
+        # Switch from up to down
+        post = self.engine.apply_score(self.post.pk, -2, -1, 1)
+        self.assertEqual((post.vote_score, post.ups, post.downs), (-1, 0, 1))
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.vote_score, self.post.ups, self.post.downs), (-1, 0, 1))
+
+    def test_apply_score_stores_ranks_and_loads_the_community(self):
+        PostVote.objects.create(user=self.author, post=self.post, vote_type='down')
+        Post.objects.filter(pk=self.post.pk).update(vote_score=-1, downs=1)
+        with self.assertNumQueries(1):
+            post = self.engine.apply_score(self.post.pk, 1, 1, 0)
+            self.assertEqual(post.community.slug, 'python')
+        stored = {field: getattr(post, field) for field in Post.VOTE_RANK_FIELDS}
+        post.set_vote_ranks()
+        for field, value in stored.items():
+            self.assertAlmostEqual(value, getattr(post, field), places=6, msg=field)
+        self.assertGreater(post.controversy, 0)
+
+    def test_apply_score_skips_deleted_comments(self):
+        self.comment.soft_delete()
+        with self.assertRaises(Comment.DoesNotExist):
+            engine.PostgresVoteEngine('comment').apply_score(self.comment.pk, 1, 1, 0)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'votes'
+
+urlpatterns = [
+    path('batch/', views.batch_vote, name='batch-vote'),
+]
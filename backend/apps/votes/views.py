@@ -0,0 +1,23 @@
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from .batch import apply_vote_batch
+from .serializers import BatchVoteSerializer
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_vote(request):
+    """
+    Apply a list of post/comment votes in one transaction.
+    
+    Accepts ``{"votes": [...]}`` or a bare list of ``{kind, id, vote_type}``
+    items and returns one result per item, in order (see apps.votes.batch).
+    """
+    data = {'votes': request.data} if isinstance(request.data, list) else request.data
+    serializer = BatchVoteSerializer(data=data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = apply_vote_batch(request.user, serializer.validated_data['votes'])
+    return Response({'results': results})
@@ -33,10 +33,12 @@ INSTALLED_APPS = [
     'corsheaders',
     
     # Local apps
+    'apps.core',
     'apps.users',
     'apps.posts',
     'apps.comments',
     'apps.communities',
+    'apps.votes',
 ]
 
 MIDDLEWARE = [
@@ -102,6 +104,26 @@ else:
     }
 
 
+# Cache
+# Use Redis in production (via REDIS_URL), local memory for development and tests
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'community-feed',
+        }
+    }
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -183,3 +205,36 @@ CORS_ALLOW_METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS']
 # CSRF trusted origins for production
 CSRF_TRUSTED_ORIGINS = CORS_ALLOWED_ORIGINS.copy()
 CSRF_TRUSTED_ORIGINS.append('https://*.vercel.app')
+
+
+# Feed index: sorted post id lists per (community or global, sort) kept in the cache
+FEED_INDEX_SIZE = int(os.environ.get('FEED_INDEX_SIZE', 500))
+FEED_INDEX_TIMEOUT = int(os.environ.get('FEED_INDEX_TIMEOUT', 300))
+
+# Karma leaderboards: top users kept in the cache (apps.users.leaderboard); the
+# 24h board is rebuilt after LEADERBOARD_24H_TIMEOUT seconds to drop expired hours
+LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', 200))
+LEADERBOARD_TIMEOUT = int(os.environ.get('LEADERBOARD_TIMEOUT', 3600))
+LEADERBOARD_24H_TIMEOUT = int(os.environ.get('LEADERBOARD_24H_TIMEOUT', 60))
+# Per-user rolling 24h karma totals (apps.users.karma), shown on user profiles
+KARMA_24H_CACHE_TIMEOUT = int(os.environ.get('KARMA_24H_CACHE_TIMEOUT', 60))
+
+# Karma ledger rows older than this many days (minimum 8) are folded into daily
+# summaries by the compact_karma_ledger command (apps.users.compaction)
+KARMA_LEDGER_RETENTION_DAYS = int(os.environ.get('KARMA_LEDGER_RETENTION_DAYS', 30))
+
+# Comment thread windows (apps.comments.tree): replies loaded per comment and
+# levels below each page, and the most comments one thread response may hold;
+# truncated comments carry a cursor for /api/comments/<pk>/children/
+THREAD_CHILD_LIMIT = int(os.environ.get('THREAD_CHILD_LIMIT', 10))
+THREAD_MAX_DEPTH = int(os.environ.get('THREAD_MAX_DEPTH', 10))
+THREAD_NODE_BUDGET = int(os.environ.get('THREAD_NODE_BUDGET', 500))
+
+# Anonymous response cache for feed and thread pages: seconds a page is served
+# fresh, and how much longer a stale copy may be served while one request re-renders it
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 30))
+RESPONSE_CACHE_GRACE = int(os.environ.get('RESPONSE_CACHE_GRACE', 60))
+
+# Write-behind voting: buffer score/karma deltas (apps.votes.buffer) and apply
+# them with the flush_vote_deltas command instead of locking hot rows per vote
+VOTE_WRITE_BEHIND = os.environ.get('VOTE_WRITE_BEHIND', 'False').lower() == 'true'
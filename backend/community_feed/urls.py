@@ -22,6 +22,7 @@ urlpatterns = [
     path('api/posts/', include('apps.posts.urls')),
     path('api/comments/', include('apps.comments.urls')),
     path('api/communities/', include('apps.communities.urls')),
+    path('api/votes/', include('apps.votes.urls')),
 ]
 
 # Serve media files in development
@@ -6,7 +6,7 @@ import { commentsService } from '../services/posts'
 import { useAuth } from '../context/AuthContext'
 import toast from 'react-hot-toast'
 
-export default function CommentThread({ comment, postId, onReplyAdded }) {
+export default function CommentThread({ comment, postId, sort = 'best', onReplyAdded }) {
     const { user, isAuthenticated } = useAuth()
     const [showReplyForm, setShowReplyForm] = useState(false)
     const [replyContent, setReplyContent] = useState('')
@@ -14,6 +14,8 @@ export default function CommentThread({ comment, postId, onReplyAdded }) {
     const [voteScore, setVoteScore] = useState(comment.vote_score)
     const [userVote, setUserVote] = useState(comment.user_vote)
     const [replies, setReplies] = useState(comment.replies || [])
+    const [moreReplies, setMoreReplies] = useState(comment.more_replies || null)
+    const [isLoadingMore, setIsLoadingMore] = useState(false)
 
     const handleVote = async (voteType) => {
         if (!isAuthenticated) {
@@ -53,6 +55,27 @@ export default function CommentThread({ comment, postId, onReplyAdded }) {
         }
     }
 
+    const handleLoadMore = async () => {
+        setIsLoadingMore(true)
+        try {
+            const data = await commentsService.getCommentChildren(comment.id, {
+                sort,
+                cursor: moreReplies.cursor || undefined,
+            })
+            const known = new Set(replies.map((reply) => reply.id))
+            const loaded = data.results.filter((reply) => !known.has(reply.id))
+            setReplies([...replies, ...loaded])
+            const remaining = moreReplies.count - data.results.length
+            setMoreReplies(data.next && remaining > 0
+                ? { count: remaining, cursor: new URL(data.next).searchParams.get('cursor') }
+                : null)
+        } catch (error) {
+            toast.error('Failed to load replies')
+        } finally {
+            setIsLoadingMore(false)
+        }
+    }
+
     const timeAgo = formatDistanceToNow(new Date(comment.created_at), { addSuffix: true })
 
     if (comment.is_deleted) {
@@ -66,6 +89,7 @@ export default function CommentThread({ comment, postId, onReplyAdded }) {
                                 key={reply.id}
                                 comment={reply}
                                 postId={postId}
+                                sort={sort}
                                 onReplyAdded={onReplyAdded}
                             />
                         ))}
@@ -161,11 +185,25 @@ export default function CommentThread({ comment, postId, onReplyAdded }) {
                             key={reply.id}
                             comment={reply}
                             postId={postId}
+                            sort={sort}
                             onReplyAdded={onReplyAdded}
                         />
                     ))}
                 </div>
             )}
+
+            {/* Replies left out of the thread window */}
+            {moreReplies && (
+                <button
+                    onClick={handleLoadMore}
+                    disabled={isLoadingMore}
+                    className="ml-4 mt-2 pl-4 text-xs text-primary-400 hover:text-primary-300 transition-colors"
+                >
+                    {isLoadingMore
+                        ? 'Loading...'
+                        : `Load ${moreReplies.count} more ${moreReplies.count === 1 ? 'reply' : 'replies'}`}
+                </button>
+            )}
         </div>
     )
 }
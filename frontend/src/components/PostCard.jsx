@@ -67,9 +67,9 @@ export default function PostCard({ post, onVoteUpdate }) {
                 </Link>
 
                 {/* Content preview */}
-                {post.post_type === 'text' && post.content && (
+                {post.post_type === 'text' && post.excerpt && (
                     <p className="text-dark-400 text-sm line-clamp-3 mb-3">
-                        {post.content}
+                        {post.excerpt}
                     </p>
                 )}
 
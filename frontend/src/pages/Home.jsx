@@ -3,9 +3,11 @@ import { Link } from 'react-router-dom'
 import PostCard from '../components/PostCard'
 import Loading from '../components/Loading'
 import { postsService, communitiesService } from '../services/posts'
+import { useAuth } from '../context/AuthContext'
 import toast from 'react-hot-toast'
 
 export default function Home() {
+    const { isAuthenticated } = useAuth()
     const [posts, setPosts] = useState([])
     const [communities, setCommunities] = useState([])
     const [loading, setLoading] = useState(true)
@@ -18,7 +20,9 @@ export default function Home() {
     const loadData = async () => {
         try {
             const [postsData, communitiesData] = await Promise.all([
-                postsService.getPosts({ sort: sortBy }),
+                sortBy === 'home'
+                    ? postsService.getHomeFeed()
+                    : postsService.getPosts({ sort: sortBy }),
                 communitiesService.getCommunities(),
             ])
             setPosts(postsData.results || postsData)
@@ -40,7 +44,7 @@ export default function Home() {
             <div className="lg:col-span-2 space-y-4">
                 {/* Sort tabs */}
                 <div className="card flex gap-2 p-2">
-                    {['hot', 'new', 'top'].map((sort) => (
+                    {(isAuthenticated ? ['home', 'hot', 'new', 'top'] : ['hot', 'new', 'top']).map((sort) => (
                         <button
                             key={sort}
                             onClick={() => setSortBy(sort)}
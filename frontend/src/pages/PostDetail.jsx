@@ -225,6 +225,7 @@ export default function PostDetail() {
                                 key={comment.id}
                                 comment={comment}
                                 postId={parseInt(id)}
+                                sort={sortBy}
                                 onReplyAdded={() => setPost({ ...post, comment_count: post.comment_count + 1 })}
                             />
                         ))}
@@ -6,6 +6,11 @@ export const postsService = {
         return response.data
     },
 
+    async getHomeFeed(params = {}) {
+        const response = await api.get('/posts/home/', { params })
+        return response.data
+    },
+
     async getPost(id) {
         const response = await api.get(`/posts/${id}/`)
         return response.data
@@ -42,6 +47,11 @@ export const commentsService = {
         return response.data
     },
 
+    async getCommentChildren(commentId, { sort = 'best', cursor } = {}) {
+        const response = await api.get(`/comments/${commentId}/children/`, { params: { sort, cursor } })
+        return response.data
+    },
+
     async createComment(data) {
         const response = await api.post('/comments/', data)
         return response.data